@@ -15,7 +15,7 @@ load_dotenv(dotenv_path=env_path)
 
 from pydantic import BaseModel, Field
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_openai import ChatOpenAI
+from app.agents.llm_registry import get_llm
 
 from app.schemas.enums import ScriptMode
 
@@ -53,10 +53,8 @@ class CriticResponse(BaseModel):
 class ScriptCritic:
     def __init__(self):
         # Use GPT-4o-mini for fast, reliable validation
-        self.llm = ChatOpenAI(
-            model="openai/gpt-4o-mini",
-            openai_api_key=os.getenv("OPENAI_API_KEY"),
-            openai_api_base="https://openrouter.ai/api/v1",
+        self.llm = get_llm(
+            "openai/gpt-4o-mini",
             temperature=0,
             max_tokens=1500
         )
@@ -129,7 +127,7 @@ class ScriptCritic:
 
         return missing
 
-    def validate(self, draft: str, mode: ScriptMode) -> CriticResponse:
+    async def validate(self, draft: str, mode: ScriptMode) -> CriticResponse:
         """Validate script with comprehensive checks"""
 
         # Pre-check for spam words and caps (fast local check)
@@ -221,7 +219,7 @@ Return ONLY valid JSON:
 
         try:
             chain = prompt | self.llm
-            response = chain.invoke({
+            response = await chain.ainvoke({
                 "draft": draft,
                 "spam": spam_words,
                 "caps": caps_words,
@@ -1,6 +1,9 @@
 """
 LangGraph Workflow - Multi-Angle Viral Script Generation v2.0
-Research → Retrieve → Generate 3 Scripts (parallel) → Validate → Output
+Detect → Research ‖ Retrieve → Generate 3 Scripts (parallel) → Validate → Output
+
+Runs are checkpointed per thread: a generic/ambiguous topic routes to the clarify
+node, which pauses the run (interrupt) until a follow-up request resumes it with the chosen angle.
 
 This version generates 3 viral scripts with 3 different angles,
 each with 5 unique hooks - matching the target output format.
@@ -8,16 +11,20 @@ each with 5 unique hooks - matching the target output format.
 import os
 import asyncio
 import time
+import uuid
+import threading
 from pathlib import Path
-from typing import TypedDict, List, Dict
+from typing import TypedDict, List, Dict, Optional, Tuple
 from dotenv import load_dotenv
 
 # Ensure .env is loaded
 env_path = Path(__file__).resolve().parent.parent.parent / ".env"
 load_dotenv(dotenv_path=env_path)
 
-from langgraph.graph import StateGraph, END
-from langchain_openai import ChatOpenAI
+from langgraph.graph import StateGraph, START, END
+from langgraph.config import get_stream_writer
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.types import interrupt
 from langchain_core.prompts import ChatPromptTemplate
 
 from app.schemas.enums import ScriptMode
@@ -32,7 +39,8 @@ from app.agents.utils import full_clean
 from app.agents.nodes.retriever import retrieve_style_context
 from app.agents.multi_angle_writer import MultiAngleWriter
 from app.agents.script_rag import ScriptRAG
-from app.utils.logger import get_logger
+from app.agents.llm_registry import get_llm
+from app.utils.logger import get_logger, graph_log
 
 # Create module-specific loggers
 research_log = get_logger("Research", "🔍")
@@ -57,6 +65,8 @@ class AgentState(TypedDict, total=False):
     suggested_angles: List[str]  # For generic topics (Type B)
     clarification_questions: List[str]  # For ambiguous topics (Type D)
     topic_type: str  # A, B, C, or D
+    topic_detection: dict  # Stage 0 result for the current topic (detector node)
+    pending_input: dict  # Interrupt payload while the run waits for the user (empty otherwise)
 
     # Research Data (Multi-stage orchestrator)
     research_queries: List[str]
@@ -95,8 +105,87 @@ class AgentState(TypedDict, total=False):
     quality_passes: bool
 
 
+# --- RESEARCH INPUT (HUMAN-IN-THE-LOOP) ---
+def _needs_input_payload(result: Dict) -> Dict:
+    """Interrupt payload for a generic (Type B) or ambiguous (Type D) topic"""
+    if result.get("status") == "needs_specific_angle":
+        return {
+            "input_type": "angle_selection",
+            "message": result.get("message", "") or "This topic is too generic. Please select a specific angle.",
+            "options": result.get("suggested_angles", []),
+            "topic_type": "B",
+        }
+    return {
+        "input_type": "clarification",
+        "message": result.get("message", "") or "This topic is too broad. Please clarify.",
+        "questions": result.get("questions", []),
+        "options": result.get("suggested_angles", []),
+        "topic_type": "D",
+    }
+
+
+def _uses_web_research(state: AgentState) -> bool:
+    """Stage 0 only applies to web research (not skip mode or uploaded documents)"""
+    return not state.get("skip_research", False) and len(state.get("file_content", "") or "") <= 100
+
+
+async def detector_node(state: AgentState):
+    """
+    Stage 0 (DETECT) as its own node. A generic/ambiguous topic saves the interrupt payload
+    in state and routes to clarify, which pauses the run; the answer loops back here.
+    Resuming re-runs only clarify (payload from state), never depends on Stage 0 answering twice.
+    """
+    if not _uses_web_research(state):
+        return {"pending_input": {}}
+
+    topic = state.get("topic", "")
+    try:
+        detection = await ResearchOrchestrator().detect(topic)
+    except Exception as e:
+        # research_node detects again (and falls back if that fails too)
+        research_log.error(f"Topic detection failed: {str(e)[:50]}", exc=e)
+        return {"pending_input": {}}
+
+    result = ResearchOrchestrator.needs_input(topic, detection)
+    if result:
+        research_log.warn(f"Topic needs user input ({result.get('status')}) - pausing run")
+        return {"topic_detection": detection, "pending_input": _needs_input_payload(result)}
+    return {"topic_detection": detection, "pending_input": {}}
+
+
+def route_after_detect(state: AgentState) -> List[str]:
+    """Pause for input, or fan out to research + retrieval once the topic is settled"""
+    if state.get("pending_input"):
+        return ["clarify"]
+    return ["researcher", "retriever"]
+
+
+def clarify_node(state: AgentState):
+    """Pause until the user picks an angle / clarifies, then detect again with their topic"""
+    answer = interrupt(state["pending_input"]) or {}
+    topic = answer.get("topic") or state.get("topic", "")
+    research_log.info(f"Resumed with topic: {topic[:40]}")
+    return {
+        "topic": topic,
+        "user_notes": answer.get("user_notes", state.get("user_notes", "")),
+        "pending_input": {},
+    }
+
+
+async def _research(orchestrator: ResearchOrchestrator, state: AgentState, file_content: str = "") -> Dict:
+    """Orchestrated research for a topic the detector already cleared"""
+    result = await orchestrator.research(
+        state.get("topic", ""), state.get("user_notes", ""), file_content,
+        topic_detection=state.get("topic_detection")
+    )
+    if result.get("status") in ("needs_specific_angle", "needs_clarification"):
+        # Only when the detector node failed and Stage 0 ran here instead
+        raise ValueError(f"Topic still needs user input ({result['status']})")
+    return result
+
+
 # --- NODE 1: MULTI-STAGE RESEARCH ORCHESTRATOR ---
-async def research_node_async(state: AgentState):
+async def research_node(state: AgentState):
     """
     Multi-stage research with topic type detection.
     Stage 0: DETECT - What type of topic is this?
@@ -153,29 +242,7 @@ async def research_node_async(state: AgentState):
 
         orchestrator = ResearchOrchestrator()
         try:
-            result = await orchestrator.research(topic, user_notes, file_content)
-
-            # Check if research needs user input (generic/ambiguous topic)
-            if result.get("status") == "needs_specific_angle":
-                research_log.warn("Generic topic detected - needs angle selection")
-                return {
-                    "research_status": "needs_specific_angle",
-                    "research_message": result.get("message", ""),
-                    "suggested_angles": result.get("suggested_angles", []),
-                    "topic_type": "B",
-                    "research_data": None,
-                }
-
-            if result.get("status") == "needs_clarification":
-                research_log.warn("Ambiguous topic - needs clarification")
-                return {
-                    "research_status": "needs_clarification",
-                    "research_message": result.get("message", ""),
-                    "clarification_questions": result.get("questions", []),
-                    "suggested_angles": result.get("suggested_angles", []),
-                    "topic_type": "D",
-                    "research_data": None,
-                }
+            result = await _research(orchestrator, state, file_content)
 
             research_data = result.get('research_data', '')
 
@@ -191,6 +258,8 @@ async def research_node_async(state: AgentState):
             })
 
             return {
+                "topic": topic,
+                "user_notes": user_notes,
                 "research_status": "complete",
                 "research_data": research_data,
                 "research_queries": ["User content + multi-stage research"],
@@ -206,10 +275,8 @@ async def research_node_async(state: AgentState):
             # Fallback: Try to extract story from file content using LLM
             try:
                 research_log.step("Attempting LLM extraction fallback")
-                llm = ChatOpenAI(
-                    model="anthropic/claude-3.5-sonnet",
-                    openai_api_key=os.getenv("OPENAI_API_KEY"),
-                    openai_api_base="https://openrouter.ai/api/v1",
+                llm = get_llm(
+                    "anthropic/claude-3.5-sonnet",
                     temperature=0.2,
                     max_tokens=3000
                 )
@@ -250,29 +317,7 @@ Document content:
 
     orchestrator = ResearchOrchestrator()
     try:
-        result = await orchestrator.research(topic, user_notes)
-
-        # Check if research needs user input (generic/ambiguous topic)
-        if result.get("status") == "needs_specific_angle":
-            research_log.warn("Generic topic detected - needs angle selection")
-            return {
-                "research_status": "needs_specific_angle",
-                "research_message": result.get("message", ""),
-                "suggested_angles": result.get("suggested_angles", []),
-                "topic_type": "B",
-                "research_data": None,
-            }
-
-        if result.get("status") == "needs_clarification":
-            research_log.warn("Ambiguous topic - needs clarification")
-            return {
-                "research_status": "needs_clarification",
-                "research_message": result.get("message", ""),
-                "clarification_questions": result.get("questions", []),
-                "suggested_angles": result.get("suggested_angles", []),
-                "topic_type": "D",
-                "research_data": None,
-            }
+        result = await _research(orchestrator, state)
 
         # Validate research quality
         checker = ResearchChecker()
@@ -290,6 +335,8 @@ Document content:
             research_log.warn(f"Quality issues: {issues}")
 
         return {
+            "topic": topic,
+            "user_notes": user_notes,
             "research_status": "complete",
             "research_data": result["research_data"],
             "research_queries": ["Multi-stage orchestrated research"],
@@ -306,7 +353,7 @@ Document content:
 
         # Fallback to basic Perplexity research
         researcher = PerplexityResearcher()
-        result = researcher.research(topic, user_notes)
+        result = await researcher.research(topic, user_notes)
         duration = (time.time() - start_time) * 1000
 
         research_log.end("Research (Perplexity fallback)", duration, {
@@ -326,13 +373,14 @@ Document content:
         }
 
 
-def research_node(state: AgentState):
-    """Sync wrapper for async research node."""
-    return asyncio.run(research_node_async(state))
+# --- NODE 2: STYLE RETRIEVER + RAG CONTEXT ---
+def _build_rag_context(topic: str) -> str:
+    """Parse training data and build RAG context (file IO + regex - run in a thread)"""
+    rag = ScriptRAG()
+    return rag.get_full_context_for_topic(topic)
 
 
-# --- NODE 2: STYLE RETRIEVER + RAG CONTEXT ---
-def retrieval_node(state: AgentState):
+async def retrieval_node(state: AgentState):
     """
     Retrieves similar scripts from ChromaDB + RAG context from training data.
     Now includes winning/losing script patterns.
@@ -345,7 +393,7 @@ def retrieval_node(state: AgentState):
 
     # Get ChromaDB style context
     try:
-        context = retrieve_style_context(topic, mode)
+        context = await retrieve_style_context(topic, mode)
         retriever_log.success(f"ChromaDB: {len(context)} chars of style context")
     except Exception as e:
         retriever_log.error(f"ChromaDB failed: {str(e)[:50]}")
@@ -353,8 +401,7 @@ def retrieval_node(state: AgentState):
 
     # Get RAG context from training data (winning/losing scripts)
     try:
-        rag = ScriptRAG()
-        rag_context = rag.get_full_context_for_topic(topic)
+        rag_context = await asyncio.to_thread(_build_rag_context, topic)
         retriever_log.success(f"RAG: {len(rag_context)} chars from training data")
     except Exception as e:
         retriever_log.error(f"RAG failed: {str(e)[:50]}")
@@ -370,7 +417,7 @@ def retrieval_node(state: AgentState):
 
 
 # --- NODE 3: MULTI-ANGLE WRITER (NEW - v2.0) ---
-async def multi_angle_writer_node_async(state: AgentState):
+async def multi_angle_writer_node(state: AgentState):
     """
     Generates 3 viral scripts with different angles.
     Each script has 5 unique hooks.
@@ -382,9 +429,15 @@ async def multi_angle_writer_node_async(state: AgentState):
 
     writer_log.start(f"Multi-angle generation for: {topic[:40]}...")
 
+    # Forward token deltas to the graph's "custom" stream (consumed by /generate_stream)
+    stream_writer = get_stream_writer()
+
+    def on_delta(script_number: int, text: str):
+        stream_writer({"type": "script_delta", "script_number": script_number, "delta": text})
+
     try:
         writer = MultiAngleWriter()
-        result = await writer.generate_all_scripts(topic, research_data)
+        result = await writer.generate_all_scripts(topic, research_data, on_delta=on_delta)
         duration = (time.time() - start_time) * 1000
 
         writer_log.success(f"Generated {len(result['scripts'])} scripts", {
@@ -415,10 +468,8 @@ async def fallback_single_script(state: AgentState):
     writer_log.info("Using single script fallback")
 
     mode = state.get('mode')
-    llm = ChatOpenAI(
-        model="anthropic/claude-sonnet-4",
-        openai_api_key=os.getenv("OPENAI_API_KEY"),
-        openai_api_base="https://openrouter.ai/api/v1",
+    llm = get_llm(
+        "anthropic/claude-sonnet-4",
         temperature=0.8,
         max_tokens=4000
     )
@@ -451,7 +502,7 @@ Generate the script now with 5 hook options.
     chain = prompt | llm
 
     writer_log.step("Calling Claude for single script")
-    response = chain.invoke({
+    response = await chain.ainvoke({
         "topic": state.get("topic", ""),
         "research_data": state.get("research_data", "No research available"),
         "style_context": state.get("style_context", "No style examples available"),
@@ -472,13 +523,8 @@ Generate the script now with 5 hook options.
     }
 
 
-def multi_angle_writer_node(state: AgentState):
-    """Sync wrapper for async multi-angle writer node."""
-    return asyncio.run(multi_angle_writer_node_async(state))
-
-
 # --- NODE 4: CRITIC (validates all 3 scripts) ---
-def critic_node(state: AgentState):
+async def critic_node(state: AgentState):
     """
     Validates all scripts against quality standards.
     For multi-angle mode, validates the combined output.
@@ -501,7 +547,7 @@ def critic_node(state: AgentState):
     content_to_validate = draft if draft else '\n\n'.join(scripts)
 
     critic = ScriptCritic()
-    result = critic.validate(content_to_validate, mode)
+    result = await critic.validate(content_to_validate, mode)
     duration = (time.time() - start_time) * 1000
 
     if result.status == "PASS":
@@ -513,7 +559,7 @@ def critic_node(state: AgentState):
 
 
 # --- NODE 5: SCRIPT CHECKER ---
-def checker_node(state: AgentState):
+async def checker_node(state: AgentState):
     """
     Analyzes hooks, ranks them, and provides optimization suggestions.
     For multi-angle mode, analyzes the first script as representative.
@@ -534,7 +580,7 @@ def checker_node(state: AgentState):
         sample_content = scripts[0] if scripts else content[:4000]
 
         checker = ScriptChecker()
-        result = checker.check(sample_content, mode)
+        result = await checker.check(sample_content, mode)
 
         analysis = checker.format_analysis(result)
         duration = (time.time() - start_time) * 1000
@@ -561,6 +607,19 @@ def checker_node(state: AgentState):
         }
 
 
+# --- JOIN: RESEARCH + RETRIEVAL ---
+def join_node(state: AgentState):
+    """
+    Barrier after the parallel researcher/retriever branches.
+    Only logs - research that needs user input pauses the run before this point.
+    """
+    graph_log.info("Research and retrieval joined", {
+        "research_status": state.get("research_status", "complete"),
+        "style_context_len": len(state.get("style_context", "") or ""),
+    })
+    return {}
+
+
 # --- CONDITIONAL EDGE: CONTINUE OR END ---
 def should_continue(state: AgentState):
     """
@@ -583,23 +642,86 @@ def should_continue(state: AgentState):
 
 
 # --- GRAPH CONSTRUCTION ---
+# All nodes are async and run on the caller's event loop (no worker threads / nested loops)
 workflow = StateGraph(AgentState)
 
 # Add nodes
+workflow.add_node("detector", detector_node)
+workflow.add_node("clarify", clarify_node)
 workflow.add_node("researcher", research_node)
 workflow.add_node("retriever", retrieval_node)
+workflow.add_node("join", join_node)
 workflow.add_node("writer", multi_angle_writer_node)  # Multi-angle writer (v2.0)
 workflow.add_node("critic", critic_node)
 workflow.add_node("checker", checker_node)
 
 # Define the flow
-# researcher -> retriever -> writer (multi-angle) -> critic -> checker -> END
-workflow.set_entry_point("researcher")
-workflow.add_edge("researcher", "retriever")
-workflow.add_edge("retriever", "writer")
+# retriever only needs topic + mode, so it runs alongside research (including skip-research mode)
+# It starts after the detector so a clarified run retrieves for the chosen angle, not the generic topic
+# START -> detector (<-> clarify) -> [researcher || retriever] -> join -> writer (multi-angle) -> critic -> checker -> END
+workflow.add_edge(START, "detector")
+workflow.add_conditional_edges("detector", route_after_detect, ["clarify", "researcher", "retriever"])
+workflow.add_edge("clarify", "detector")
+workflow.add_edge(["researcher", "retriever"], "join")
+workflow.add_edge("join", "writer")
 workflow.add_edge("writer", "critic")
 workflow.add_conditional_edges("critic", should_continue)
 workflow.add_edge("checker", END)
 
+# --- CHECKPOINTING ---
+# In-process checkpointer: a paused run keeps its state (parsed files, style context,
+# completed retrieval) until the follow-up request resumes it or the thread expires.
+GRAPH_THREAD_TTL_SECONDS = int(os.getenv("GRAPH_THREAD_TTL_SECONDS", "3600"))
+
+checkpointer = MemorySaver()
+_thread_started: Dict[str, float] = {}
+_thread_lock = threading.Lock()
+
+
+def _prune_threads():
+    """Drop checkpoints of runs that were never resumed"""
+    cutoff = time.time() - GRAPH_THREAD_TTL_SECONDS
+    with _thread_lock:
+        expired = [tid for tid, started in _thread_started.items() if started < cutoff]
+        for tid in expired:
+            del _thread_started[tid]
+    for tid in expired:
+        checkpointer.delete_thread(tid)
+    if expired:
+        graph_log.debug(f"Pruned {len(expired)} expired graph threads")
+
+
+def thread_config(thread_id: str) -> dict:
+    """Run config for a graph thread"""
+    return {"configurable": {"thread_id": thread_id}}
+
+
+def new_thread() -> str:
+    """Register a new checkpointed run and return its thread id"""
+    _prune_threads()
+    thread_id = uuid.uuid4().hex
+    with _thread_lock:
+        _thread_started[thread_id] = time.time()
+    return thread_id
+
+
+async def get_paused_state(thread_id: str) -> Optional[Dict]:
+    """State of a run waiting for user input, or None if the thread is unknown/finished"""
+    with _thread_lock:
+        if thread_id not in _thread_started:
+            return None
+    snapshot = await app.aget_state(thread_config(thread_id))
+    if not snapshot or not snapshot.next:
+        return None
+    return snapshot.values
+
+
+def release_thread(thread_id: str):
+    """Free a finished run's checkpoints"""
+    with _thread_lock:
+        _thread_started.pop(thread_id, None)
+    checkpointer.delete_thread(thread_id)
+
+
 # Compile
-app = workflow.compile()
+app = workflow.compile(checkpointer=checkpointer)
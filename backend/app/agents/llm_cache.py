@@ -0,0 +1,326 @@
+"""
+LLM Response Cache - Content-addressed cache in front of near-deterministic LLM calls
+Key = model + canonical hash of messages + temperature + max_tokens.
+Two tiers: in-memory LRU, then SQLite on disk (survives restarts).
+Async callers only touch SQLite from worker threads; expired rows are purged at startup
+and then at most every LLM_CACHE_PURGE_INTERVAL seconds.
+"""
+import os
+import json
+import asyncio
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+
+# Ensure .env is loaded
+env_path = Path(__file__).resolve().parent.parent.parent / ".env"
+load_dotenv(dotenv_path=env_path)
+
+from langchain_core.messages import AIMessage, BaseMessage
+
+from app.utils.logger import get_logger
+
+log = get_logger("LLMCache", "🗄️")
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024"))
+LLM_CACHE_DB = os.getenv(
+    "LLM_CACHE_DB",
+    str(Path(__file__).resolve().parent.parent.parent / ".cache" / "llm_cache.sqlite3")
+)
+LLM_CACHE_PURGE_INTERVAL = float(os.getenv("LLM_CACHE_PURGE_INTERVAL", "3600"))  # Seconds between disk purges
+
+# Default TTL (seconds) per call site. 0 = never cache.
+# Override with LLM_CACHE_TTL_<CALL_SITE> (e.g. LLM_CACHE_TTL_DETECT_TOPIC_TYPE=3600)
+# Opt a call site out with LLM_CACHE_DISABLE=retriever_extract,script_checker
+CALL_SITE_TTLS = {
+    "retriever_extract": 7 * 24 * 3600,   # Same stored script + topic -> same notes
+    "detect_topic_type": 6 * 3600,        # Trending status of a topic can change
+    "script_checker": 24 * 3600,
+    # Research orchestrator stages - short staleness window so news stays fresh
+    "research_scan": 1800,
+    "research_select": 1800,
+    "research_deep_dive": 1800,
+    "research_connect": 1800,
+}
+DEFAULT_TTL = 3600
+
+_DISABLED_SITES = {
+    s.strip() for s in os.getenv("LLM_CACHE_DISABLE", "").split(",") if s.strip()
+}
+
+
+def ttl_for(call_site: str) -> int:
+    """Resolve the TTL for a call site (0 if caching is disabled for it)"""
+    if not LLM_CACHE_ENABLED or call_site in _DISABLED_SITES:
+        return 0
+    env_ttl = os.getenv(f"LLM_CACHE_TTL_{call_site.upper()}")
+    if env_ttl is not None:
+        return int(env_ttl)
+    return CALL_SITE_TTLS.get(call_site, DEFAULT_TTL)
+
+
+def _canonical_messages(messages: Any) -> List[Dict[str, Any]]:
+    """Normalize str / BaseMessage / (role, content) inputs to plain dicts"""
+    if isinstance(messages, str):
+        return [{"role": "human", "content": messages}]
+
+    canonical = []
+    for m in messages:
+        if isinstance(m, BaseMessage):
+            canonical.append({"role": m.type, "content": m.content})
+        elif isinstance(m, tuple) and len(m) == 2:
+            canonical.append({"role": m[0], "content": m[1]})
+        else:
+            canonical.append({"role": "human", "content": str(m)})
+    return canonical
+
+
+def make_key(llm: Any, messages: Any) -> str:
+    """Content-addressed key for an LLM call"""
+    payload = {
+        "model": getattr(llm, "model_name", None) or getattr(llm, "model", ""),
+        "messages": _canonical_messages(messages),
+        "temperature": getattr(llm, "temperature", None),
+        "max_tokens": getattr(llm, "max_tokens", None),
+    }
+    canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """Two-tier (memory LRU + SQLite) response cache with per-entry expiry"""
+
+    def __init__(self, max_entries: int = LLM_CACHE_MAX_ENTRIES, db_path: Optional[str] = LLM_CACHE_DB):
+        self.max_entries = max_entries
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()  # Memory tier + stats (never held during disk IO)
+        self._db_lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._db: Optional[sqlite3.Connection] = None
+        self._last_purge = 0.0
+
+        if db_path:
+            try:
+                Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+                self._db = sqlite3.connect(db_path, check_same_thread=False)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute("""
+                    CREATE TABLE IF NOT EXISTS llm_cache (
+                        key TEXT PRIMARY KEY,
+                        call_site TEXT NOT NULL,
+                        content TEXT NOT NULL,
+                        created_at REAL NOT NULL,
+                        expires_at REAL NOT NULL
+                    )
+                """)
+                self._db.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_expires ON llm_cache(expires_at)")
+                self._db.commit()
+            except Exception as e:
+                log.warn(f"Disk tier disabled: {str(e)[:80]}")
+                self._db = None
+        if self._db is not None:
+            purged = self.purge_expired()
+            if purged:
+                log.info(f"Purged {purged} expired entries")
+
+    def _count(self, call_site: str, field: str):
+        site = self._stats.setdefault(call_site, {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0})
+        site[field] += 1
+
+    def _remember(self, key: str, content: str, expires_at: float):
+        self._memory[key] = (content, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _memory_get(self, key: str, call_site: str, now: float) -> Optional[str]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            content, expires_at = entry
+            if expires_at <= now:
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            self._count(call_site, "memory_hits")
+            return content
+
+    def get(self, key: str, call_site: str) -> Optional[str]:
+        now = time.time()
+        content = self._memory_get(key, call_site, now)
+        if content is not None:
+            return content
+
+        if self._db is not None:
+            try:
+                with self._db_lock:
+                    row = self._db.execute(
+                        "SELECT content, expires_at FROM llm_cache WHERE key = ?", (key,)
+                    ).fetchone()
+            except sqlite3.Error as e:
+                log.warn(f"Disk read failed: {str(e)[:80]}")
+                row = None
+            if row and row[1] > now:
+                with self._lock:
+                    self._remember(key, row[0], row[1])
+                    self._count(call_site, "disk_hits")
+                return row[0]
+
+        with self._lock:
+            self._count(call_site, "misses")
+        return None
+
+    def set(self, key: str, call_site: str, content: str, ttl: int):
+        now = time.time()
+        expires_at = now + ttl
+        with self._lock:
+            self._remember(key, content, expires_at)
+            self._count(call_site, "writes")
+        if self._db is None:
+            return
+        try:
+            with self._db_lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, call_site, content, created_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+                    (key, call_site, content, now, expires_at)
+                )
+                self._db.commit()
+        except sqlite3.Error as e:
+            log.warn(f"Disk write failed: {str(e)[:80]}")
+        if now - self._last_purge >= LLM_CACHE_PURGE_INTERVAL:
+            self.purge_expired()
+
+    async def aget(self, key: str, call_site: str) -> Optional[str]:
+        """get() for the event loop - memory hits inline, the disk tier in a worker thread"""
+        content = self._memory_get(key, call_site, time.time())
+        if content is not None:
+            return content
+        if self._db is None:
+            return self.get(key, call_site)  # No IO - just counts the miss
+        return await asyncio.to_thread(self.get, key, call_site)
+
+    async def aset(self, key: str, call_site: str, content: str, ttl: int):
+        """set() for the event loop (disk write in a worker thread)"""
+        if self._db is None:
+            self.set(key, call_site, content, ttl)
+        else:
+            await asyncio.to_thread(self.set, key, call_site, content, ttl)
+
+    def purge_expired(self) -> int:
+        """Drop expired rows from the disk tier"""
+        if self._db is None:
+            return 0
+        self._last_purge = time.time()
+        try:
+            with self._db_lock:
+                cursor = self._db.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (self._last_purge,))
+                self._db.commit()
+                return cursor.rowcount
+        except sqlite3.Error as e:
+            log.warn(f"Disk purge failed: {str(e)[:80]}")
+            return 0
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM llm_cache")
+                self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            by_site = {site: dict(counts) for site, counts in self._stats.items()}
+        hits = sum(s["memory_hits"] + s["disk_hits"] for s in by_site.values())
+        misses = sum(s["misses"] for s in by_site.values())
+        return {
+            "enabled": LLM_CACHE_ENABLED,
+            "memory_entries": len(self._memory),
+            "disk_tier": self._db is not None,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 3) if (hits + misses) else 0.0,
+            "call_sites": by_site,
+        }
+
+
+_llm_cache: Optional[LLMResponseCache] = None
+_init_lock = threading.Lock()
+
+
+def get_llm_cache() -> LLMResponseCache:
+    """Lazy load the process-wide response cache"""
+    global _llm_cache
+    if _llm_cache is None:
+        with _init_lock:
+            if _llm_cache is None:
+                _llm_cache = LLMResponseCache()
+    return _llm_cache
+
+
+def cached_invoke(llm: Any, messages: Any, call_site: str, use_cache: bool = True):
+    """llm.invoke(messages) through the response cache"""
+    ttl = ttl_for(call_site) if use_cache else 0
+    if ttl <= 0:
+        return llm.invoke(messages)
+
+    cache = get_llm_cache()
+    key = make_key(llm, messages)
+    content = cache.get(key, call_site)
+    if content is not None:
+        log.debug(f"Cache hit: {call_site}")
+        return AIMessage(content=content)
+
+    response = llm.invoke(messages)
+    if response.content:
+        cache.set(key, call_site, response.content, ttl)
+    return response
+
+
+async def cached_ainvoke(llm: Any, messages: Any, call_site: str, use_cache: bool = True):
+    """await llm.ainvoke(messages) through the response cache"""
+    ttl = ttl_for(call_site) if use_cache else 0
+    if ttl <= 0:
+        return await llm.ainvoke(messages)
+
+    cache = get_llm_cache()
+    key = make_key(llm, messages)
+    content = await cache.aget(key, call_site)
+    if content is not None:
+        log.debug(f"Cache hit: {call_site}")
+        return AIMessage(content=content)
+
+    response = await llm.ainvoke(messages)
+    if response.content:
+        await cache.aset(key, call_site, response.content, ttl)
+    return response
+
+
+async def cached_acompute(call_site: str, key_parts: Dict[str, Any], compute: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Memoize a JSON-serializable async result by explicit key parts (not by prompt).
+    Used for multi-call pipeline stages whose inputs are known up front.
+    """
+    ttl = ttl_for(call_site)
+    if ttl <= 0:
+        return await compute()
+
+    cache = get_llm_cache()
+    canonical = json.dumps({"call_site": call_site, **key_parts}, sort_keys=True, ensure_ascii=False, default=str)
+    key = hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    cached = await cache.aget(key, call_site)
+    if cached is not None:
+        log.debug(f"Memo hit: {call_site}")
+        return json.loads(cached)
+
+    result = await compute()
+    await cache.aset(key, call_site, json.dumps(result, ensure_ascii=False), ttl)
+    return result
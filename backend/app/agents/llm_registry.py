@@ -0,0 +1,156 @@
+"""
+LLM Client Registry - Process-wide pooled ChatOpenAI clients
+Every agent gets its model from here instead of building a new ChatOpenAI,
+so HTTP connections (and TLS sessions) to OpenRouter are reused across requests.
+"""
+import os
+import asyncio
+import threading
+import weakref
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from dotenv import load_dotenv
+
+# Ensure .env is loaded
+env_path = Path(__file__).resolve().parent.parent.parent / ".env"
+load_dotenv(dotenv_path=env_path)
+
+import httpx
+from langchain_openai import ChatOpenAI
+
+from app.utils.logger import get_logger
+
+log = get_logger("LLM", "🧠")
+
+OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+
+# One timeout policy for every model (long read timeout for 8000-token completions)
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "180"))
+LLM_CONNECT_TIMEOUT_SECONDS = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "10"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("LLM_KEEPALIVE_EXPIRY_SECONDS", "60"))
+
+# Per-model connection limits (writer runs 3 completions per generation)
+DEFAULT_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+MODEL_MAX_CONNECTIONS = {
+    "anthropic/claude-sonnet-4": 30,
+    "anthropic/claude-3.5-sonnet": 20,
+    "perplexity/sonar-pro": 10,
+    "openai/gpt-4o-mini": 20,
+}
+
+LLMKey = Tuple[str, float, int]
+
+_lock = threading.Lock()
+
+# Sync clients are thread-safe and shared by every caller of a model
+_sync_clients: Dict[str, httpx.Client] = {}
+
+# Async pools are bound to the event loop that opened their connections, so
+# clients created inside a running loop are kept per loop (and dropped with it).
+# Clients created outside a loop (module-level singletons) share one bucket.
+_unbound_async_clients: Dict[str, httpx.AsyncClient] = {}
+_unbound_llms: Dict[LLMKey, ChatOpenAI] = {}
+_loop_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, httpx.AsyncClient]]" = weakref.WeakKeyDictionary()
+_loop_llms: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[LLMKey, ChatOpenAI]]" = weakref.WeakKeyDictionary()
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(LLM_TIMEOUT_SECONDS, connect=LLM_CONNECT_TIMEOUT_SECONDS)
+
+
+def _limits(model: str) -> httpx.Limits:
+    max_connections = MODEL_MAX_CONNECTIONS.get(model, DEFAULT_MAX_CONNECTIONS)
+    return httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_connections,
+        keepalive_expiry=LLM_KEEPALIVE_EXPIRY_SECONDS,
+    )
+
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+def _get_sync_client(model: str) -> httpx.Client:
+    client = _sync_clients.get(model)
+    if client is None:
+        client = httpx.Client(limits=_limits(model), timeout=_timeout())
+        _sync_clients[model] = client
+    return client
+
+
+def _get_async_client(model: str, loop: Optional[asyncio.AbstractEventLoop]) -> httpx.AsyncClient:
+    if loop is None:
+        clients = _unbound_async_clients
+    else:
+        clients = _loop_async_clients.setdefault(loop, {})
+    client = clients.get(model)
+    if client is None:
+        client = httpx.AsyncClient(limits=_limits(model), timeout=_timeout())
+        clients[model] = client
+    return client
+
+
+def get_llm(model: str, temperature: float, max_tokens: int) -> ChatOpenAI:
+    """
+    Get the shared ChatOpenAI client for (model, temperature, max_tokens).
+    Clients are created once and reuse keep-alive connection pools per model.
+    """
+    key = (model, float(temperature), int(max_tokens))
+    loop = _running_loop()
+
+    with _lock:
+        llms = _unbound_llms if loop is None else _loop_llms.setdefault(loop, {})
+        llm = llms.get(key)
+        if llm is None:
+            llm = ChatOpenAI(
+                model=model,
+                openai_api_key=os.getenv("OPENAI_API_KEY"),
+                openai_api_base=OPENROUTER_BASE_URL,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                timeout=_timeout(),
+                max_retries=LLM_MAX_RETRIES,
+                http_client=_get_sync_client(model),
+                http_async_client=_get_async_client(model, loop),
+            )
+            llms[key] = llm
+            log.debug(f"Created client: {model}", {"temperature": temperature, "max_tokens": max_tokens})
+        return llm
+
+
+def registry_stats() -> Dict[str, int]:
+    """Number of pooled clients currently held by the registry"""
+    with _lock:
+        return {
+            "llms": len(_unbound_llms) + sum(len(v) for v in _loop_llms.values()),
+            "sync_pools": len(_sync_clients),
+            "async_pools": len(_unbound_async_clients) + sum(len(v) for v in _loop_async_clients.values()),
+        }
+
+
+async def close_all():
+    """Close every pooled connection (called on server shutdown)"""
+    with _lock:
+        sync_clients = list(_sync_clients.values())
+        async_clients = list(_unbound_async_clients.values())
+        loop = _running_loop()
+        if loop is not None and loop in _loop_async_clients:
+            async_clients.extend(_loop_async_clients[loop].values())
+        _sync_clients.clear()
+        _unbound_async_clients.clear()
+        _unbound_llms.clear()
+        _loop_async_clients.clear()
+        _loop_llms.clear()
+
+    for client in sync_clients:
+        client.close()
+    for client in async_clients:
+        try:
+            await client.aclose()
+        except Exception as e:
+            log.warn(f"Async client close failed: {str(e)[:50]}")
@@ -5,7 +5,7 @@ Each script has 5 unique hooks exploring different framings
 import os
 import json
 import asyncio
-from typing import Dict, List, Optional, Tuple, AsyncGenerator
+from typing import Dict, List, Optional, Tuple, AsyncGenerator, Callable
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -13,7 +13,7 @@ from dotenv import load_dotenv
 env_path = Path(__file__).resolve().parent.parent.parent / ".env"
 load_dotenv(dotenv_path=env_path)
 
-from langchain_openai import ChatOpenAI
+from app.agents.llm_registry import get_llm
 from langchain_core.messages import SystemMessage, HumanMessage
 
 from app.agents.script_rag import ScriptRAG
@@ -29,19 +29,15 @@ class MultiAngleWriter:
         self.rag = ScriptRAG()
 
         # Use Claude for writing (best creative output)
-        self.writer_llm = ChatOpenAI(
-            model="anthropic/claude-sonnet-4",
-            openai_api_key=os.getenv("OPENAI_API_KEY"),
-            openai_api_base="https://openrouter.ai/api/v1",
+        self.writer_llm = get_llm(
+            "anthropic/claude-sonnet-4",
             temperature=0.8,  # Higher for creativity
             max_tokens=8000
         )
 
         # Use GPT-4o-mini for angle generation (fast)
-        self.planner_llm = ChatOpenAI(
-            model="openai/gpt-4o-mini",
-            openai_api_key=os.getenv("OPENAI_API_KEY"),
-            openai_api_base="https://openrouter.ai/api/v1",
+        self.planner_llm = get_llm(
+            "openai/gpt-4o-mini",
             temperature=0.7,
             max_tokens=2000
         )
@@ -441,30 +437,45 @@ Write Script #{angle_number} now. Make it COMPLETELY DIFFERENT from the other sc
         angle: Dict,
         research_data: str,
         rag_context: str,
-        angle_number: int
+        angle_number: int,
+        on_delta: Optional[Callable[[int, str], None]] = None
     ) -> str:
-        """Write a single script for one angle"""
+        """
+        Write a single script for one angle.
+        If on_delta is given, tokens are streamed to it as on_delta(angle_number, text).
+        """
         prompt = self._get_script_writing_prompt(
             topic, angle, research_data, rag_context, angle_number
         )
 
-        response = await self.writer_llm.ainvoke([
+        messages = [
             SystemMessage(content="""You are an elite viral Instagram Reels scriptwriter.
 Your scripts achieve millions of views. Follow the formula exactly.
 Write in a conversational, spoken style. No bullet points."""),
             HumanMessage(content=prompt)
-        ])
+        ]
+
+        if on_delta is None:
+            response = await self.writer_llm.ainvoke(messages)
+            return response.content
 
-        return response.content
+        parts = []
+        async for chunk in self.writer_llm.astream(messages):
+            if chunk.content:
+                parts.append(chunk.content)
+                on_delta(angle_number, chunk.content)
+        return "".join(parts)
 
     async def generate_all_scripts(
         self,
         topic: str,
-        research_data: str
+        research_data: str,
+        on_delta: Optional[Callable[[int, str], None]] = None
     ) -> Dict:
         """
         Generate 3 complete scripts with different angles.
         Returns structured output with all scripts and summary.
+        Token deltas of all 3 scripts are forwarded to on_delta as they arrive.
         """
         print(f"[MultiAngleWriter] Starting generation for: {topic}")
 
@@ -478,7 +489,7 @@ Write in a conversational, spoken style. No bullet points."""),
         # Step 2: Write all 3 scripts in parallel
         print("[MultiAngleWriter] Writing 3 scripts in parallel...")
         tasks = [
-            self.write_single_script(topic, angle, research_data, rag_context, i + 1)
+            self.write_single_script(topic, angle, research_data, rag_context, i + 1, on_delta)
             for i, angle in enumerate(angles)
         ]
 
@@ -4,6 +4,7 @@ Retrieves similar script examples from the vector database for style reference.
 Uses AI to extract RELEVANT parts, not just truncated full scripts.
 """
 import os
+import asyncio
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -11,30 +12,22 @@ from dotenv import load_dotenv
 env_path = Path(__file__).resolve().parent.parent.parent.parent / ".env"
 load_dotenv(dotenv_path=env_path)
 
-from langchain_openai import ChatOpenAI
-from app.db.storage import query_similar
+from app.agents.llm_registry import get_llm
+from app.agents.llm_cache import cached_ainvoke
+from app.db.storage import aembed_texts, query_similar_multi
 from app.schemas.enums import ScriptMode, VectorType
 
 
-# Use fast model for extraction
-_extractor_llm = None
+def get_extractor():
+    """Get the shared fast extractor LLM from the registry"""
+    return get_llm(
+        "openai/gpt-4o-mini",
+        temperature=0.1,
+        max_tokens=500
+    )
 
 
-def get_extractor():
-    """Lazy load the extractor LLM"""
-    global _extractor_llm
-    if _extractor_llm is None:
-        _extractor_llm = ChatOpenAI(
-            model="openai/gpt-4o-mini",
-            openai_api_key=os.getenv("OPENAI_API_KEY"),
-            openai_api_base="https://openrouter.ai/api/v1",
-            temperature=0.1,
-            max_tokens=500
-        )
-    return _extractor_llm
-
-
-def extract_relevant_parts(script: str, topic: str) -> str:
+async def extract_relevant_parts(script: str, topic: str) -> str:
     """
     Use AI to extract the RELEVANT parts of a script for the current topic.
     Instead of truncating, intelligently pull out useful elements.
@@ -59,7 +52,7 @@ EXTRACT (in 100-150 words):
 Format as brief notes, not full sentences. Focus on TECHNIQUE, not content."""
 
     try:
-        response = llm.invoke(prompt)
+        response = await cached_ainvoke(llm, prompt, call_site="retriever_extract")
         return response.content.strip()
     except Exception as e:
         print(f"[Retriever] Extraction failed: {e}")
@@ -67,7 +60,7 @@ Format as brief notes, not full sentences. Focus on TECHNIQUE, not content."""
         return script[:400]
 
 
-def retrieve_style_context(topic: str, mode: ScriptMode) -> str:
+async def retrieve_style_context(topic: str, mode: ScriptMode) -> str:
     """
     Retrieves diverse style examples from vector storage.
     Uses AI to extract relevant parts instead of blind truncation.
@@ -78,21 +71,18 @@ def retrieve_style_context(topic: str, mode: ScriptMode) -> str:
     'hook_type' is stored in metadata for future analytics or
     specific 'Rewrite Hook' features.
     """
-    # Query for similar full-text examples
-    full_results = query_similar(
-        query_text=topic,
-        mode=mode,
-        vector_type=VectorType.FULL,
-        limit=4
-    )
-
-    # Query for similar hooks
-    hook_results = query_similar(
+    # Embed on the batching executor (awaited), then the blocking Supabase query in a thread
+    # Similar full-text examples + similar hooks in one round trip
+    query_embedding = (await aembed_texts([topic]))[0].tolist()
+    results = await asyncio.to_thread(
+        query_similar_multi,
         query_text=topic,
         mode=mode,
-        vector_type=VectorType.HOOK,
-        limit=4
+        requests=[(VectorType.FULL, 4), (VectorType.HOOK, 4)],
+        query_embedding=query_embedding
     )
+    full_results = results[VectorType.FULL]
+    hook_results = results[VectorType.HOOK]
 
     # Combine and deduplicate by script_id
     seen_scripts = set()
@@ -106,7 +96,7 @@ def retrieve_style_context(topic: str, mode: ScriptMode) -> str:
             content = result.get("content", "")
             if content:
                 # Use AI to extract relevant parts
-                extracted = extract_relevant_parts(content, topic)
+                extracted = await extract_relevant_parts(content, topic)
                 style_examples.append({
                     "type": "full_script",
                     "content": extracted
@@ -12,7 +12,7 @@ from dotenv import load_dotenv
 env_path = Path(__file__).resolve().parent.parent.parent / ".env"
 load_dotenv(dotenv_path=env_path)
 
-from langchain_openai import ChatOpenAI
+from app.agents.llm_registry import get_llm
 from langchain_core.prompts import ChatPromptTemplate
 
 
@@ -143,15 +143,13 @@ class PerplexityResearcher:
 
     def __init__(self):
         # Use Perplexity sonar-pro through OpenRouter
-        self.llm = ChatOpenAI(
-            model="perplexity/sonar-pro",
-            openai_api_key=os.getenv("OPENAI_API_KEY"),
-            openai_api_base="https://openrouter.ai/api/v1",
+        self.llm = get_llm(
+            "perplexity/sonar-pro",
             temperature=0.2,  # Lower for more factual responses
             max_tokens=8000  # Increased for exhaustive research output
         )
 
-    def search(self, query: str) -> str:
+    async def search(self, query: str) -> str:
         """Execute deep Perplexity search via OpenRouter."""
         prompt = ChatPromptTemplate.from_messages([
             ("system", DEEP_RESEARCH_PROMPT),
@@ -160,22 +158,23 @@ class PerplexityResearcher:
 
         try:
             chain = prompt | self.llm
-            response = chain.invoke({"query": query})
+            response = await chain.ainvoke({"query": query})
             return response.content
         except Exception as e:
             print(f"[Perplexity v7.0] Error: {e}")
             return f"[Research error: {str(e)[:100]}]"
 
-    def research(self, topic: str, user_notes: str = "") -> Dict:
+    async def research(self, topic: str, user_notes: str = "") -> Dict:
         """
         Deep research pipeline v7.0.
         Gathers comprehensive research data for the writer node.
         """
+        notes_section = f"## ADDITIONAL CONTEXT/REQUIREMENTS:\n{user_notes}" if user_notes else ""
         main_query = f"""## TOPIC TO RESEARCH:
 
 {topic}
 
-{f'## ADDITIONAL CONTEXT/REQUIREMENTS:\n{user_notes}' if user_notes else ''}
+{notes_section}
 
 ---
 
@@ -188,7 +187,7 @@ Research this topic thoroughly. Find:
 
 Provide detailed, factual research that a scriptwriter can use to create a viral Instagram Reel."""
 
-        content = self.search(main_query)
+        content = await self.search(main_query)
 
         return {
             "queries": [f"Deep Research v7.0: {topic[:50]}..."],
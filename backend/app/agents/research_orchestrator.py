@@ -5,8 +5,14 @@ Mimics how a human researcher would find viral content
 
 import os
 import re
+import asyncio
 from typing import Dict, List, Optional
-from langchain_openai import ChatOpenAI
+from app.agents.llm_registry import get_llm
+from app.agents.llm_cache import cached_ainvoke, cached_acompute
+
+# Uploaded-document extraction: max chunks in flight and retries per failed chunk
+CHUNK_CONCURRENCY = int(os.getenv("RESEARCH_CHUNK_CONCURRENCY", "4"))
+CHUNK_RETRIES = int(os.getenv("RESEARCH_CHUNK_RETRIES", "2"))
 
 
 class ResearchOrchestrator:
@@ -20,41 +26,32 @@ class ResearchOrchestrator:
     Stage 4: CONNECT - Build narrative flow between facts
     """
 
-    def __init__(self):
-        self.llm = ChatOpenAI(
-            model="perplexity/sonar-pro",
-            openai_api_key=os.getenv("OPENAI_API_KEY"),
-            openai_api_base="https://openrouter.ai/api/v1",
+    def __init__(self, chunk_concurrency: int = CHUNK_CONCURRENCY, chunk_retries: int = CHUNK_RETRIES):
+        self.chunk_concurrency = max(1, chunk_concurrency)
+        self.chunk_retries = max(0, chunk_retries)
+
+        self.llm = get_llm(
+            "perplexity/sonar-pro",
             temperature=0.3,
             max_tokens=8000  # Increased for exhaustive research output
         )
 
-        self.selector_llm = ChatOpenAI(
-            model="anthropic/claude-3.5-sonnet",
-            openai_api_key=os.getenv("OPENAI_API_KEY"),
-            openai_api_base="https://openrouter.ai/api/v1",
+        self.selector_llm = get_llm(
+            "anthropic/claude-3.5-sonnet",
             temperature=0.2,
             max_tokens=6000  # Increased to preserve all research data
         )
 
-    async def research(self, topic: str, user_notes: str = "", file_content: str = "", status_callback=None) -> Dict:
-        """
-        Complete multi-stage research pipeline with topic type detection.
-        Handles both web research and user-provided content (PDF/files).
-        """
-        # If user provided their own content (PDF/file), process it differently
-        if file_content and len(file_content) > 100:
-            print(f"[Research] Processing user-provided content ({len(file_content)} chars)")
-            return await self._process_user_content(topic, file_content, user_notes)
-
-        # Stage 0: DETECT topic type
-        if status_callback:
-            status_callback("Stage 0: Detecting topic type...")
+    async def detect(self, topic: str) -> Dict:
+        """Stage 0 on its own: {"type": A|B|C|D, "suggestions", "questions"} (LLM call cached as detect_topic_type)"""
         print(f"[Research] Stage 0: DETECTING topic type for '{topic}'...")
         topic_detection = await self._stage_detect_topic_type(topic)
-
         print(f"[Research] Topic Type: {topic_detection['type']}")
+        return topic_detection
 
+    @staticmethod
+    def needs_input(topic: str, topic_detection: Dict) -> Optional[Dict]:
+        """The needs-input result for a generic (B) / ambiguous (D) topic, None if research can proceed"""
         # Handle GENERIC topics (Type B)
         if topic_detection["type"] == "B":
             print(f"[Research] Generic topic detected. Returning suggestions...")
@@ -81,6 +78,39 @@ class ResearchOrchestrator:
                 "research_data": None,
                 "selected_angle": None,
             }
+        return None
+
+    async def research(
+        self,
+        topic: str,
+        user_notes: str = "",
+        file_content: str = "",
+        status_callback=None,
+        topic_detection: Optional[Dict] = None
+    ) -> Dict:
+        """
+        Complete multi-stage research pipeline with topic type detection.
+        Handles both web research and user-provided content (PDF/files).
+        Pass topic_detection (from detect) to skip Stage 0.
+        """
+        # If user provided their own content (PDF/file), process it differently
+        if file_content and len(file_content) > 100:
+            print(f"[Research] Processing user-provided content ({len(file_content)} chars)")
+            return await self._process_user_content(topic, file_content, user_notes)
+
+        # Stage outputs are memoized so resubmissions/retries only redo changed stages
+        topic_key = {"topic": self._normalize(topic)}
+        notes_key = {**topic_key, "notes": self._normalize(user_notes)}
+
+        # Stage 0: DETECT topic type
+        if topic_detection is None:
+            if status_callback:
+                status_callback("Stage 0: Detecting topic type...")
+            topic_detection = await self.detect(topic)
+
+        needs_input = self.needs_input(topic, topic_detection)
+        if needs_input:
+            return needs_input
 
         # For Type A (Specific) and Type C (Trending), proceed with full research
         print(f"[Research] Topic type {topic_detection['type']} - Proceeding with research...")
@@ -89,25 +119,38 @@ class ResearchOrchestrator:
         if status_callback:
             status_callback("Stage 1: Scanning for viral angles...")
         print(f"[Research] Stage 1: SCANNING for viral angles on '{topic}'...")
-        scan_result = await self._stage_scan(topic)
+        scan_result = await cached_acompute(
+            "research_scan", topic_key,
+            lambda: self._stage_scan(topic)
+        )
 
         # Stage 2: SELECT best angle
         if status_callback:
             status_callback("Stage 2: Selecting best angle...")
         print(f"[Research] Stage 2: SELECTING most viral angle...")
-        selected_angle = await self._stage_select(topic, scan_result, user_notes)
+        selected_angle = await cached_acompute(
+            "research_select", notes_key,
+            lambda: self._stage_select(topic, scan_result, user_notes)
+        )
+        angle_key = {**notes_key, "angle": self._normalize(selected_angle.get("angle", ""))}
 
         # Stage 3: DEEP DIVE into selected angle
         if status_callback:
             status_callback("Stage 3: Deep diving into selected angle...")
         print(f"[Research] Stage 3: DEEP DIVING into '{selected_angle.get('angle', 'selected angle')}'...")
-        deep_research = await self._stage_deep_dive(selected_angle)
+        deep_research = await cached_acompute(
+            "research_deep_dive", angle_key,
+            lambda: self._stage_deep_dive(selected_angle)
+        )
 
         # Stage 4: CONNECT facts into narrative
         if status_callback:
             status_callback("Stage 4: Connecting facts into narrative...")
         print(f"[Research] Stage 4: CONNECTING facts into narrative...")
-        connected_research = await self._stage_connect(deep_research, selected_angle)
+        connected_research = await cached_acompute(
+            "research_connect", angle_key,
+            lambda: self._stage_connect(deep_research, selected_angle)
+        )
 
         return {
             "status": "complete",
@@ -195,7 +238,7 @@ ANGLE 3: "[India-focused angle with specific company/person]"
 - For Type D: "CLARIFY - Ask user for more details"
 """
 
-        response = await self.selector_llm.ainvoke(detect_prompt)
+        response = await cached_ainvoke(self.selector_llm, detect_prompt, call_site="detect_topic_type")
         return self._parse_topic_type(response.content, topic)
 
     def _parse_topic_type(self, content: str, original_topic: str) -> Dict:
@@ -800,6 +843,11 @@ CRITICAL: Your output should be 2000-3000 words minimum. Do NOT condense the res
         response = await self.selector_llm.ainvoke(connect_prompt)
         return response.content
 
+    @staticmethod
+    def _normalize(text: str) -> str:
+        """Normalize a memo key part (case and whitespace insensitive)"""
+        return " ".join((text or "").lower().split())
+
     def _extract_between(self, text: str, start: str, end: str) -> str:
         """Extract text between two markers."""
         try:
@@ -826,33 +874,25 @@ CRITICAL: Your output should be 2000-3000 words minimum. Do NOT condense the res
                 break
         return queries[:4]  # Max 4 queries
 
-    async def _process_user_content(self, topic: str, content: str, user_notes: str) -> Dict:
+    async def _extract_chunk(
+        self,
+        topic: str,
+        chunk: str,
+        chunk_idx: int,
+        total_chunks: int,
+        user_notes: str,
+        semaphore: asyncio.Semaphore
+    ) -> Optional[str]:
         """
-        Process user-uploaded PDF/file content + do additional Perplexity research.
-        NO LIMITS - extract EVERYTHING from user's document, then add Perplexity on top.
+        Extract every fact from one document chunk.
+        Retried on its own with backoff; returns None if all attempts fail.
         """
-
-        print(f"[Research] Processing user content + Perplexity research for: {topic}")
-        print(f"[Research] Document size: {len(content)} characters")
-
-        # STEP 1: Extract EVERYTHING from user's document - NO LIMITS
-        # Split into chunks if document is very large to process all of it
-        doc_chunks = []
-        chunk_size = 15000  # Process in chunks
-        for i in range(0, len(content), chunk_size):
-            doc_chunks.append(content[i:i + chunk_size])
-
-        print(f"[Research] Processing {len(doc_chunks)} chunk(s) from document")
-
-        all_doc_facts = []
-
-        for chunk_idx, chunk in enumerate(doc_chunks):
-            extract_prompt = f"""
+        extract_prompt = f"""
 You are extracting ALL research data from a user-uploaded document for a viral Instagram Reel.
 
 ## TOPIC: {topic}
 
-## DOCUMENT CONTENT (Part {chunk_idx + 1} of {len(doc_chunks)}):
+## DOCUMENT CONTENT (Part {chunk_idx + 1} of {total_chunks}):
 
 {chunk}
 
@@ -904,9 +944,51 @@ DO NOT summarize. DO NOT condense. List EVERYTHING individually.
 CRITICAL: Your job is to PRESERVE EVERYTHING. No limits. No summarizing. Extract every single data point.
 """
 
-            chunk_response = await self.selector_llm.ainvoke(extract_prompt)
-            all_doc_facts.append(chunk_response.content)
-            print(f"[Research] Extracted {len(chunk_response.content)} chars from chunk {chunk_idx + 1}")
+        for attempt in range(self.chunk_retries + 1):
+            try:
+                async with semaphore:
+                    chunk_response = await self.selector_llm.ainvoke(extract_prompt)
+                print(f"[Research] Extracted {len(chunk_response.content)} chars from chunk {chunk_idx + 1}")
+                return chunk_response.content
+            except Exception as e:
+                print(f"[Research] Chunk {chunk_idx + 1} attempt {attempt + 1} failed: {str(e)[:80]}")
+                if attempt < self.chunk_retries:
+                    await asyncio.sleep(2 ** attempt)
+        return None
+
+    async def _process_user_content(self, topic: str, content: str, user_notes: str) -> Dict:
+        """
+        Process user-uploaded PDF/file content + do additional Perplexity research.
+        NO LIMITS - extract EVERYTHING from user's document, then add Perplexity on top.
+        """
+
+        print(f"[Research] Processing user content + Perplexity research for: {topic}")
+        print(f"[Research] Document size: {len(content)} characters")
+
+        # STEP 1: Extract EVERYTHING from user's document - NO LIMITS
+        # Split into chunks if document is very large to process all of it
+        doc_chunks = []
+        chunk_size = 15000  # Process in chunks
+        for i in range(0, len(content), chunk_size):
+            doc_chunks.append(content[i:i + chunk_size])
+
+        print(f"[Research] Processing {len(doc_chunks)} chunk(s) from document")
+
+        # Extract all chunks concurrently (bounded), merged back in document order
+        semaphore = asyncio.Semaphore(self.chunk_concurrency)
+        tasks = [
+            self._extract_chunk(topic, chunk, chunk_idx, len(doc_chunks), user_notes, semaphore)
+            for chunk_idx, chunk in enumerate(doc_chunks)
+        ]
+        all_doc_facts = await asyncio.gather(*tasks)
+
+        if all(facts is None for facts in all_doc_facts):
+            raise RuntimeError(f"All {len(doc_chunks)} document chunks failed extraction")
+
+        all_doc_facts = [
+            facts if facts is not None else f"[Part {i + 1} of {len(doc_chunks)} could not be extracted]"
+            for i, facts in enumerate(all_doc_facts)
+        ]
 
         # Combine all document extractions
         doc_facts = "\n\n---\n\n".join(all_doc_facts)
@@ -1,18 +1,114 @@
 """
 Script Chat Agent - Handles per-script chat for editing/rewriting
 Uses Claude to either edit specific parts or rewrite entire script based on user request
+Edit modes (SCRIPT_CHAT_EDIT_MODE):
+- patch (default): small edits come back as search/replace blocks applied to the current script;
+  a patch that does not apply is retried once as a full rewrite
+- rewrite: the model always re-emits the whole script
 """
 import os
-from typing import Dict, List, Optional
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 from pathlib import Path
 from dotenv import load_dotenv
 
 env_path = Path(__file__).resolve().parent.parent.parent / ".env"
 load_dotenv(dotenv_path=env_path)
 
-from langchain_openai import ChatOpenAI
+from app.agents.llm_registry import get_llm
+from app.utils.script_patch import PatchError, parse_edit_blocks, apply_edit_blocks
 from langchain_core.messages import SystemMessage, HumanMessage
 
+SCRIPT_CHAT_EDIT_MODE = os.getenv("SCRIPT_CHAT_EDIT_MODE", "patch")  # patch | rewrite
+
+OPEN_TAG = "<UPDATED_SCRIPT>"
+CLOSE_TAG = "</UPDATED_SCRIPT>"
+EDITS_OPEN_TAG = "<EDITS>"
+EDITS_CLOSE_TAG = "</EDITS>"
+
+# Opening tag -> (section name, closing tag)
+SECTIONS = {
+    OPEN_TAG: ("script", CLOSE_TAG),
+    EDITS_OPEN_TAG: ("edits", EDITS_CLOSE_TAG),
+}
+
+
+def _partial_tag_length(text: str, tag: str) -> int:
+    """Length of the longest suffix of text that could be the start of tag"""
+    for size in range(min(len(tag) - 1, len(text)), 0, -1):
+        if tag.startswith(text[-size:]):
+            return size
+    return 0
+
+
+class UpdatedScriptParser:
+    """
+    Incremental splitter for a streamed chat response.
+    feed() returns (kind, text) events as soon as text is known to be on one side of a tag:
+        ("message", text)        chat text before the first section tag
+        ("script_start", "")     <UPDATED_SCRIPT> was seen
+        ("script", text)         script body between the tags (outer whitespace trimmed)
+        ("edits_start", "")      <EDITS> was seen
+        ("edits", text)          raw edit blocks between the tags
+    A tag split across chunks is held back until it completes; text after the section is ignored.
+    """
+
+    def __init__(self):
+        self.state = "message"  # message -> script | edits -> after
+        self._close_tag = ""
+        self._pending = ""
+        self._body_started = False
+
+    def _emit(self, events: List[Tuple[str, str]], text: str):
+        if self.state != "message" and not self._body_started:
+            text = text.lstrip()
+            self._body_started = bool(text)
+        if text:
+            events.append((self.state, text))
+
+    def _next_tag(self) -> Tuple[int, str]:
+        """Earliest complete tag the current state is waiting for: (index, tag), index -1 if none"""
+        tags = list(SECTIONS) if self.state == "message" else [self._close_tag]
+        found = [(self._pending.find(tag), tag) for tag in tags]
+        found = [(idx, tag) for idx, tag in found if idx != -1]
+        return min(found) if found else (-1, "")
+
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        events: List[Tuple[str, str]] = []
+        self._pending += chunk
+        while self.state != "after":
+            idx, tag = self._next_tag()
+            if idx != -1:
+                before, self._pending = self._pending[:idx], self._pending[idx + len(tag):]
+                self._emit(events, before if self.state == "message" else before.rstrip())
+                if self.state == "message":
+                    self.state, self._close_tag = SECTIONS[tag]
+                    events.append((f"{self.state}_start", ""))
+                else:
+                    self.state = "after"
+                continue
+
+            tags = list(SECTIONS) if self.state == "message" else [self._close_tag]
+            held = max(_partial_tag_length(self._pending, tag) for tag in tags)
+            ready = self._pending[:len(self._pending) - held]
+            if self.state != "message":
+                # Trailing whitespace may turn out to precede the closing tag
+                ready = ready.rstrip()
+            self._pending = self._pending[len(ready):]
+            self._emit(events, ready)
+            break
+
+        if self.state == "after":
+            self._pending = ""
+        return events
+
+    def close(self) -> List[Tuple[str, str]]:
+        """Flush held-back text at the end of the stream"""
+        events: List[Tuple[str, str]] = []
+        if self.state != "after":
+            self._emit(events, self._pending if self.state == "message" else self._pending.rstrip())
+        self._pending = ""
+        return events
+
 
 class ScriptChatAgent:
     """
@@ -21,16 +117,15 @@ class ScriptChatAgent:
     """
 
     def __init__(self):
-        self.llm = ChatOpenAI(
-            model="anthropic/claude-sonnet-4",
-            openai_api_key=os.getenv("OPENAI_API_KEY"),
-            openai_api_base="https://openrouter.ai/api/v1",
+        self.llm = get_llm(
+            "anthropic/claude-sonnet-4",
             temperature=0.7,
             max_tokens=4000
         )
+        self.edit_mode = SCRIPT_CHAT_EDIT_MODE
 
     def _get_system_prompt(self) -> str:
-        """System prompt for script editing chat"""
+        """System prompt for script editing chat (full rewrite every turn)"""
         return """You are an expert viral Instagram Reels scriptwriter and editor.
 
 You're helping the user refine their script through chat.
@@ -63,25 +158,59 @@ I've made the hook more shocking and added specific numbers for credibility.
 
 If user asks a question without requesting edits, still include <UPDATED_SCRIPT> tags with the unchanged script."""
 
-    async def chat(
+    def _get_patch_system_prompt(self) -> str:
+        """System prompt for patch mode - targeted edits instead of re-emitting the script"""
+        return """You are an expert viral Instagram Reels scriptwriter and editor.
+
+You're helping the user refine their script through chat.
+
+**CRITICAL OUTPUT FORMAT:**
+Start with a **CHAT MESSAGE** (1-2 sentences max) explaining what you did, then ONE of:
+
+A) **TARGETED EDITS** (preferred for changes to a few lines) - search/replace blocks inside <EDITS> tags:
+---
+I made hook 1 more shocking.
+
+<EDITS>
+<<<<<<< SEARCH
+[exact line(s) copied from the current script]
+=======
+[the new line(s)]
+>>>>>>> REPLACE
+</EDITS>
+---
+
+B) **FULL REWRITE** (only when most of the script changes) - the complete script inside markers:
+<UPDATED_SCRIPT>
+[complete updated script with all hooks and content]
+</UPDATED_SCRIPT>
+
+C) **NO CHANGES** (the user only asked a question) - just the chat message, no tags.
+
+**EDIT BLOCK RULES:**
+- SEARCH must be copied character-for-character from the current script, whole lines only
+- Each SEARCH must match exactly one place - include a neighbouring line if needed to make it unique
+- Use one block per changed region, in script order; keep blocks as small as possible
+- An empty replacement deletes the lines
+
+**SCRIPT RULES:**
+- The chat message should be SHORT (1-2 sentences only)
+- Keep scripts 150-200 words
+- Use short, punchy sentences (8-12 words)
+- Include pattern interrupts ("But here's where it gets interesting...")
+- End with engagement question + value-based CTA
+- No banned words in caps (DESTROYED, PANICKING, etc.)
+- No bullet points in the spoken script"""
+
+    def _build_messages(
         self,
         user_message: str,
         current_script: str,
         chat_history: List[Dict] = None,
-        angle_info: Dict = None
-    ) -> str:
-        """
-        Process a chat message and return the response.
-
-        Args:
-            user_message: The user's request
-            current_script: The current version of the script
-            chat_history: Previous messages in this chat
-            angle_info: Optional angle details (name, focus, hook_style)
-
-        Returns:
-            The assistant's response (explanation + updated script)
-        """
+        angle_info: Dict = None,
+        mode: str = "rewrite"
+    ) -> list:
+        """System prompt, recent history and the current script + request"""
         # Build context
         context_parts = []
 
@@ -95,8 +224,9 @@ If user asks a question without requesting edits, still include <UPDATED_SCRIPT>
         context = "\n".join(context_parts)
 
         # Build messages
+        system_prompt = self._get_patch_system_prompt() if mode == "patch" else self._get_system_prompt()
         messages = [
-            SystemMessage(content=self._get_system_prompt())
+            SystemMessage(content=system_prompt)
         ]
 
         # Add chat history if exists
@@ -110,20 +240,151 @@ If user asks a question without requesting edits, still include <UPDATED_SCRIPT>
         # Add current context and user message
         full_user_message = f"{context}\n\n**USER REQUEST:**\n{user_message}"
         messages.append(HumanMessage(content=full_user_message))
+        return messages
+
+    async def chat(
+        self,
+        user_message: str,
+        current_script: str,
+        chat_history: List[Dict] = None,
+        angle_info: Dict = None
+    ) -> str:
+        """
+        Process a chat message and return the response.
+
+        Args:
+            user_message: The user's request
+            current_script: The current version of the script
+            chat_history: Previous messages in this chat
+            angle_info: Optional angle details (name, focus, hook_style)
+
+        Returns:
+            The assistant's response (explanation + updated script or edit blocks)
+
+        Model errors are raised to the caller.
+        """
+        mode = self.edit_mode
+        messages = self._build_messages(user_message, current_script, chat_history, angle_info, mode)
 
         # Get response
-        try:
+        response = await self.llm.ainvoke(messages)
+        if mode == "patch" and self.patch_error(response.content, current_script):
+            # Edits did not apply - ask again for the whole script
+            messages = self._build_messages(user_message, current_script, chat_history, angle_info, "rewrite")
             response = await self.llm.ainvoke(messages)
-            return response.content
-        except Exception as e:
-            print(f"[ScriptChat] Error: {e}")
-            return f"Sorry, I encountered an error processing your request. Please try again.\n\nError: {str(e)}"
+        return response.content
+
+    def patch_error(self, response: str, current_script: str) -> Optional[str]:
+        """Why the response's edit blocks do not apply to current_script (None if fine or no edits)"""
+        if EDITS_OPEN_TAG not in response:
+            return None
+        try:
+            apply_edit_blocks(current_script, parse_edit_blocks(response.split(EDITS_OPEN_TAG, 1)[1]))
+        except PatchError as e:
+            print(f"[ScriptChat] Patch rejected, falling back to full rewrite: {e}")
+            return str(e)
+        return None
+
+    async def stream_chat(
+        self,
+        user_message: str,
+        current_script: str,
+        chat_history: List[Dict] = None,
+        angle_info: Dict = None
+    ) -> AsyncIterator[Dict]:
+        """
+        Streaming variant of chat() - yields events as tokens arrive:
+            {"type": "message_delta", "delta"}  chat text as it is produced
+            {"type": "message", "message"}      the clean chat message, as soon as the script/edits start
+            {"type": "script_delta", "delta"}   updated script body as it is produced (full rewrites)
+            {"type": "status", "message"}       a patch did not apply and the script is being rewritten
+            {"type": "done", "response", "updated_script", "script_changed"}
+        Edit blocks are not streamed - they are applied once complete and show up in done.
+        The done event uses the same extraction as chat() on the full response.
+        Model errors are raised to the caller.
+        """
+        mode = self.edit_mode
+        messages = self._build_messages(user_message, current_script, chat_history, angle_info, mode)
+        parser = UpdatedScriptParser()
+        parts = []
+        message_sent = False
+
+        def to_events(parsed: List[Tuple[str, str]]) -> List[Dict]:
+            nonlocal message_sent
+            events = []
+            for kind, text in parsed:
+                if kind == "message":
+                    events.append({"type": "message_delta", "delta": text})
+                elif kind in ("script_start", "edits_start"):
+                    message_sent = True
+                    events.append({"type": "message", "message": self.extract_chat_message("".join(parts))})
+                elif kind == "script":
+                    events.append({"type": "script_delta", "delta": text})
+            return events
+
+        async for chunk in self.llm.astream(messages):
+            if not chunk.content:
+                continue
+            parts.append(chunk.content)
+            for event in to_events(parser.feed(chunk.content)):
+                yield event
+        for event in to_events(parser.close()):
+            yield event
+
+        full_response = "".join(parts)
+        chat_message = self.extract_chat_message(full_response)
+        if not message_sent:
+            yield {"type": "message", "message": chat_message}
+
+        if mode == "patch" and self.patch_error(full_response, current_script):
+            yield {"type": "status", "message": "Edit did not apply cleanly - rewriting the full script..."}
+            # Stream the rewrite's script body; its chat message is only used for done
+            messages = self._build_messages(user_message, current_script, chat_history, angle_info, "rewrite")
+            parser = UpdatedScriptParser()
+            parts = []
+            async for chunk in self.llm.astream(messages):
+                if not chunk.content:
+                    continue
+                parts.append(chunk.content)
+                for kind, text in parser.feed(chunk.content):
+                    if kind == "script":
+                        yield {"type": "script_delta", "delta": text}
+            for kind, text in parser.close():
+                if kind == "script":
+                    yield {"type": "script_delta", "delta": text}
+            full_response = "".join(parts)
+            chat_message = self.extract_chat_message(full_response)
+
+        updated_script = self.extract_updated_script(full_response, current_script)
+        yield {
+            "type": "done",
+            "response": chat_message,
+            "updated_script": updated_script,
+            "script_changed": updated_script != current_script
+        }
+
+    def _untagged(self, response: str) -> bool:
+        """Patch-mode reply with neither <EDITS> nor <UPDATED_SCRIPT> - the script is unchanged"""
+        return self.edit_mode == "patch" and OPEN_TAG not in response and EDITS_OPEN_TAG not in response
 
     def extract_updated_script(self, response: str, original_script: str) -> str:
         """
         Extract the updated script from the response.
-        Looks for <UPDATED_SCRIPT> tags first, then falls back to other markers.
+        Applies <EDITS> blocks to the original, else looks for <UPDATED_SCRIPT> tags,
+        then (rewrite mode only) falls back to other markers.
         """
+        # Patch mode: no tags means the user only asked a question
+        if self._untagged(response):
+            return original_script
+
+        # Patch mode: targeted edits against the script the user is looking at
+        if EDITS_OPEN_TAG in response:
+            try:
+                edits = response.split(EDITS_OPEN_TAG, 1)[1]
+                return apply_edit_blocks(original_script, parse_edit_blocks(edits))
+            except PatchError:
+                pass
+
         # First, try to extract from <UPDATED_SCRIPT> tags (preferred format)
         if "<UPDATED_SCRIPT>" in response and "</UPDATED_SCRIPT>" in response:
             start = response.find("<UPDATED_SCRIPT>") + len("<UPDATED_SCRIPT>")
@@ -173,9 +434,14 @@ If user asks a question without requesting edits, still include <UPDATED_SCRIPT>
         Extract just the chat message part (before the script).
         Returns a short, clean message for the chat UI.
         """
-        # If using <UPDATED_SCRIPT> tags, get everything before
-        if "<UPDATED_SCRIPT>" in response:
-            chat_part = response.split("<UPDATED_SCRIPT>")[0].strip()
+        # Patch mode: an untagged reply is all chat message
+        if self._untagged(response):
+            return response.strip()
+
+        # If using <UPDATED_SCRIPT> / <EDITS> tags, get everything before the first one
+        tags = [tag for tag in (OPEN_TAG, EDITS_OPEN_TAG) if tag in response]
+        if tags:
+            chat_part = response[:min(response.find(tag) for tag in tags)].strip()
             # Remove any trailing markers
             chat_part = chat_part.rstrip("-").strip()
             if chat_part:
@@ -15,7 +15,8 @@ env_path = Path(__file__).resolve().parent.parent.parent / ".env"
 load_dotenv(dotenv_path=env_path)
 
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_openai import ChatOpenAI
+from app.agents.llm_registry import get_llm
+from app.agents.llm_cache import cached_ainvoke
 
 from app.schemas.enums import ScriptMode
 
@@ -172,15 +173,13 @@ class ScriptChecker:
 
     def __init__(self):
         # Use GPT-4o-mini for fast, reliable analysis
-        self.llm = ChatOpenAI(
-            model="openai/gpt-4o-mini",
-            openai_api_key=os.getenv("OPENAI_API_KEY"),
-            openai_api_base="https://openrouter.ai/api/v1",
+        self.llm = get_llm(
+            "openai/gpt-4o-mini",
             temperature=0.2,
             max_tokens=4000
         )
 
-    def check(self, draft: str, mode: ScriptMode) -> SimpleCheckerResult:
+    async def check(self, draft: str, mode: ScriptMode) -> SimpleCheckerResult:
         """Analyze and optimize script with v8.0 Hook Optimizer"""
         result = SimpleCheckerResult()
 
@@ -207,8 +206,8 @@ Return ONLY valid JSON. No markdown code blocks. No explanation text."""
         ])
 
         try:
-            chain = prompt | self.llm
-            response = chain.invoke({"draft": draft})
+            messages = prompt.format_messages(draft=draft)
+            response = await cached_ainvoke(self.llm, messages, call_site="script_checker")
             content = response.content.strip()
 
             # Try to parse JSON response
@@ -0,0 +1,118 @@
+"""
+Script Index - Token inverted index with BM25 ranking over training scripts
+Built once per corpus snapshot; lookups only touch postings of the query terms.
+"""
+import re
+import math
+import heapq
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Sequence, Tuple
+
+TOKEN_RE = re.compile(r"[a-z0-9₹]+")
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Title hits outweigh body hits (mirrors the old +10 title / +2 body keyword scoring)
+FIELD_WEIGHTS = {"title": 5.0, "body": 1.0}
+
+# Category boosts: topic trigger words -> title keywords (or India angle) that earn the boost
+CATEGORY_BOOST = 2.5
+CATEGORIES = {
+    "tech": ({"ai", "tech"}, {"ai", "tech", "app", "device", "robot"}),
+    "business": ({"business", "startup"}, {"business", "startup", "company", "founder", "crore"}),
+}
+INDIA_TRIGGERS = {"india"}
+
+# Rankings memoized per topic are this deep (callers ask for 2-5)
+RANK_DEPTH = 10
+MEMO_SIZE = 256
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RE.findall(text.lower())
+
+
+class BM25Index:
+    """Immutable inverted index over (title, body) fields of a script list"""
+
+    def __init__(self, titles: Sequence[str], bodies: Sequence[str], india_flags: Sequence[bool]):
+        self.size = len(titles)
+        self._postings: Dict[str, Dict[str, List[Tuple[int, int]]]] = {}
+        self._lengths: Dict[str, List[int]] = {}
+        self._avg_length: Dict[str, float] = {}
+
+        for field, texts in (("title", titles), ("body", bodies)):
+            postings: Dict[str, List[Tuple[int, int]]] = {}
+            lengths = []
+            for doc_id, text in enumerate(texts):
+                tokens = tokenize(text)
+                lengths.append(len(tokens))
+                counts: Dict[str, int] = {}
+                for token in tokens:
+                    counts[token] = counts.get(token, 0) + 1
+                for token, tf in counts.items():
+                    postings.setdefault(token, []).append((doc_id, tf))
+            self._postings[field] = postings
+            self._lengths[field] = lengths
+            self._avg_length[field] = (sum(lengths) / len(lengths)) if lengths else 0.0
+
+        # Documents eligible for each category boost (precomputed from titles)
+        self._category_docs: Dict[str, FrozenSet[int]] = {}
+        title_tokens = [set(tokenize(t)) for t in titles]
+        for name, (_, keywords) in CATEGORIES.items():
+            self._category_docs[name] = frozenset(i for i, toks in enumerate(title_tokens) if toks & keywords)
+        self._india_docs = frozenset(i for i, flag in enumerate(india_flags) if flag)
+
+        self._ranked = lru_cache(maxsize=MEMO_SIZE)(self._rank)
+
+    def _idf(self, df: int) -> float:
+        return math.log(1 + (self.size - df + 0.5) / (df + 0.5))
+
+    def _rank(self, terms: FrozenSet[str], depth: int) -> Tuple[int, ...]:
+        scores: Dict[int, float] = {}
+
+        for field, weight in FIELD_WEIGHTS.items():
+            postings = self._postings[field]
+            lengths = self._lengths[field]
+            avg_length = self._avg_length[field] or 1.0
+            for term in terms:
+                docs = postings.get(term)
+                if not docs:
+                    continue
+                idf = self._idf(len(docs))
+                for doc_id, tf in docs:
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[doc_id] / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + weight * idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+        boosted = [self._category_docs[name] for name, (triggers, _) in CATEGORIES.items() if terms & triggers]
+        if terms & INDIA_TRIGGERS:
+            boosted.append(self._india_docs)
+        for docs in boosted:
+            for doc_id in docs:
+                scores[doc_id] = scores.get(doc_id, 0.0) + CATEGORY_BOOST
+
+        # Highest score first; ties keep corpus order
+        top = [doc_id for doc_id, _ in heapq.nsmallest(depth, scores.items(), key=lambda kv: (-kv[1], kv[0]))]
+
+        # Unmatched topics still get examples (corpus order), like the old full sort did
+        if len(top) < depth:
+            seen = set(top)
+            for doc_id in range(self.size):
+                if len(top) >= depth:
+                    break
+                if doc_id not in seen:
+                    top.append(doc_id)
+        return tuple(top)
+
+    def search(self, query: str, n: int) -> Tuple[int, ...]:
+        """Indices of the top-n documents for a query (memoized per distinct term set)"""
+        if n <= 0 or not self.size:
+            return ()
+        terms = frozenset(tokenize(query))
+        depth = max(n, RANK_DEPTH)
+        return self._ranked(terms, depth)[:n]
+
+    def cache_info(self):
+        return self._ranked.cache_info()
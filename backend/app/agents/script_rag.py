@@ -11,9 +11,9 @@ from dotenv import load_dotenv
 env_path = Path(__file__).resolve().parent.parent.parent / ".env"
 load_dotenv(dotenv_path=env_path)
 
-from langchain_openai import ChatOpenAI
+from app.agents.llm_registry import get_llm
 
-from app.agents.training_data_loader import TrainingDataLoader, ParsedScript
+from app.agents.training_data_loader import ParsedScript, get_training_corpus
 
 
 class ScriptRAG:
@@ -23,9 +23,8 @@ class ScriptRAG:
     """
 
     def __init__(self):
-        self.loader = TrainingDataLoader()
-        self.winning_scripts: List[ParsedScript] = []
-        self.losing_scripts: List[ParsedScript] = []
+        self.winning_scripts: Tuple[ParsedScript, ...] = ()
+        self.losing_scripts: Tuple[ParsedScript, ...] = ()
         self.winning_patterns: Dict = {}
         self.losing_patterns: Dict = {}
 
@@ -33,64 +32,30 @@ class ScriptRAG:
         self._load_data()
 
         # LLM for similarity matching (when vector DB not available)
-        self.llm = ChatOpenAI(
-            model="openai/gpt-4o-mini",
-            openai_api_key=os.getenv("OPENAI_API_KEY"),
-            openai_api_base="https://openrouter.ai/api/v1",
+        self.llm = get_llm(
+            "openai/gpt-4o-mini",
             temperature=0.1,
             max_tokens=2000
         )
 
     def _load_data(self):
-        """Load all training data"""
-        print("[ScriptRAG] Loading training data...")
-        self.winning_scripts = self.loader.load_winning_scripts()
-        self.losing_scripts = self.loader.load_losing_scripts()
-        self.winning_patterns = self.loader.get_winning_patterns()
-        self.losing_patterns = self.loader.get_losing_patterns()
-        print(f"[ScriptRAG] Loaded {len(self.winning_scripts)} winning, {len(self.losing_scripts)} losing scripts")
+        """Attach the shared training corpus snapshot (parsed once per process, not per object)"""
+        corpus = get_training_corpus()
+        self.winning_scripts = corpus.winning_scripts
+        self.losing_scripts = corpus.losing_scripts
+        self.winning_patterns = corpus.winning_patterns
+        self.losing_patterns = corpus.losing_patterns
+        self.winning_index = corpus.winning_index
 
     def get_similar_winning_scripts(self, topic: str, n: int = 3) -> List[ParsedScript]:
         """
         Find winning scripts most similar to the given topic.
-        Uses keyword matching and category similarity.
+        BM25 over the prebuilt title/body index with category boosts (memoized per topic).
         """
         if not self.winning_scripts:
             return []
 
-        # Simple keyword matching for now
-        topic_lower = topic.lower()
-        topic_words = set(topic_lower.split())
-
-        scored_scripts = []
-        for script in self.winning_scripts:
-            score = 0
-            title_lower = script.title.lower()
-            full_lower = script.full_text.lower()
-
-            # Title match (highest weight)
-            for word in topic_words:
-                if word in title_lower:
-                    score += 10
-                elif word in full_lower:
-                    score += 2
-
-            # Category matching
-            if "ai" in topic_lower or "tech" in topic_lower:
-                if any(k in title_lower for k in ["ai", "tech", "app", "device", "robot"]):
-                    score += 5
-            if "business" in topic_lower or "startup" in topic_lower:
-                if any(k in title_lower for k in ["business", "startup", "company", "founder", "crore"]):
-                    score += 5
-            if "india" in topic_lower:
-                if script.has_india_angle:
-                    score += 5
-
-            scored_scripts.append((script, score))
-
-        # Sort by score and return top n
-        scored_scripts.sort(key=lambda x: x[1], reverse=True)
-        return [s[0] for s in scored_scripts[:n]]
+        return [self.winning_scripts[i] for i in self.winning_index.search(topic, n)]
 
     def get_hook_examples(self, topic: str, n: int = 5) -> List[str]:
         """Get example hooks from similar winning scripts"""
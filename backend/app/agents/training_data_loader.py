@@ -1,20 +1,37 @@
 """
 Training Data Loader - Parses winning and losing scripts for RAG
-Extracts structured data from script files for pattern learning
+Extracts structured data from script files for pattern learning.
+get_training_corpus() returns a process-wide parsed snapshot, rebuilt only when files change.
 """
 import re
-from typing import List, Dict, Tuple
+import threading
+from types import MappingProxyType
+from typing import List, Dict, Mapping, Optional, Tuple
 from pathlib import Path
 from dataclasses import dataclass
 from enum import Enum
 
+from app.agents.script_index import BM25Index
+
+
+DEFAULT_BASE_PATH = Path(__file__).resolve().parent.parent.parent.parent / "reference_docs"
+
+# Precompiled once per process (parsing runs every regex over every script block)
+INDEX_ENTRY_RE = re.compile(r'^\d+\.\s+.+$')
+HOOK_HEADER_RE = re.compile(r'^hook\s*\d+\s*[:\-]?', re.IGNORECASE)
+HOOK_PREFIX_RE = re.compile(r'^hook\s*\d+\s*[:\-]?\s*', re.IGNORECASE)
+HOOK_LINE_RE = re.compile(r'^hook\s*\d+', re.IGNORECASE)
+BODY_RE = re.compile(r'(?:Body\s*[:\-]?\s*|Hook\s*\d+.*?\n\n)(.*)', re.IGNORECASE | re.DOTALL)
+NUMBERS_RE = re.compile(r'\d+(?:\.\d+)?(?:\s*(?:crore|lakh|percent|%|million|billion))?')
+NEWLINES_RE = re.compile(r'\n+')
+
 
 class ScriptCategory(Enum):
     WINNING = "winning"
     LOSING = "losing"
 
 
-@dataclass
+@dataclass(frozen=True)
 class ParsedScript:
     """Structured representation of a parsed script"""
     title: str
@@ -45,13 +62,13 @@ class TrainingDataLoader:
     def __init__(self, base_path: str = None):
         if base_path is None:
             # Look for reference_docs folder in root directory
-            base_path = Path(__file__).resolve().parent.parent.parent.parent / "reference_docs"
+            base_path = DEFAULT_BASE_PATH
         self.base_path = Path(base_path)
 
         # Patterns for extraction
         self.hook_patterns = [
-            r'Hook\s*\d+\s*[:\-]?\s*(.+?)(?=Hook\s*\d+|Body|$)',
-            r'HOOK\s*(?:OPTION\s*)?\d+\s*[:\-]?\s*(.+?)(?=HOOK|Body|$)',
+            re.compile(r'Hook\s*\d+\s*[:\-]?\s*(.+?)(?=Hook\s*\d+|Body|$)', re.IGNORECASE | re.DOTALL),
+            re.compile(r'HOOK\s*(?:OPTION\s*)?\d+\s*[:\-]?\s*(.+?)(?=HOOK|Body|$)', re.IGNORECASE | re.DOTALL),
         ]
 
         self.transition_phrases = [
@@ -66,7 +83,7 @@ class TrainingDataLoader:
             "but then",
         ]
 
-        self.hook_type_patterns = {
+        hook_type_patterns = {
             "shock": [r"beat", r"killed", r"destroyed", r"banned", r"secret", r"hidden"],
             "question": [r"^have you", r"^what if", r"^ever wonder", r"^did you know"],
             "negative": [r"losing", r"fail", r"mistake", r"worst", r"scary", r"terrifying"],
@@ -74,10 +91,26 @@ class TrainingDataLoader:
             "financial": [r"crore", r"lakh", r"₹", r"rupee", r"earn", r"revenue", r"profit"],
             "status": [r"rich", r"elite", r"billionaire", r"ceo", r"founder"],
         }
+        self.hook_type_patterns = {
+            hook_type: [re.compile(p) for p in patterns]
+            for hook_type, patterns in hook_type_patterns.items()
+        }
+
+    @property
+    def winning_file(self) -> Path:
+        return self.base_path / "Winning reels script.txt"
+
+    @property
+    def losing_file(self) -> Path:
+        # Try both with and without .txt extension
+        losing_file = self.base_path / "Losing reels script.txt"
+        if not losing_file.exists():
+            losing_file = self.base_path / "Losing reels script"
+        return losing_file
 
     def load_winning_scripts(self) -> List[ParsedScript]:
         """Load and parse winning scripts"""
-        winning_file = self.base_path / "Winning reels script.txt"
+        winning_file = self.winning_file
         if not winning_file.exists():
             print(f"[TrainingLoader] Winning scripts file not found: {winning_file}")
             return []
@@ -87,10 +120,7 @@ class TrainingDataLoader:
 
     def load_losing_scripts(self) -> List[ParsedScript]:
         """Load and parse losing scripts"""
-        # Try both with and without .txt extension
-        losing_file = self.base_path / "Losing reels script.txt"
-        if not losing_file.exists():
-            losing_file = self.base_path / "Losing reels script"
+        losing_file = self.losing_file
         if not losing_file.exists():
             print(f"[TrainingLoader] Losing scripts file not found: {losing_file}")
             return []
@@ -135,7 +165,7 @@ class TrainingDataLoader:
             stripped = line.strip()
 
             # Skip the numbered index list at the beginning
-            if re.match(r'^\d+\.\s+.+$', stripped) and len(stripped) < 100:
+            if INDEX_ENTRY_RE.match(stripped) and len(stripped) < 100:
                 # This is likely an index entry, skip
                 continue
 
@@ -196,7 +226,7 @@ class TrainingDataLoader:
         has_crazy_part = any(p in block.lower() for p in ["crazy part", "craziest part", "here's the crazy"])
         has_transition_hooks = any(p in block.lower() for p in self.transition_phrases)
         has_india_angle = any(p in block.lower() for p in ["india", "indian", "₹", "crore", "lakh", "rupee"])
-        has_numbers = bool(re.search(r'\d+(?:\.\d+)?(?:\s*(?:crore|lakh|percent|%|million|billion))?', block))
+        has_numbers = bool(NUMBERS_RE.search(block))
         has_quotes = '"' in block and block.count('"') >= 2
 
         word_count = len(block.split())
@@ -234,12 +264,12 @@ class TrainingDataLoader:
 
         # Try different hook patterns
         for pattern in self.hook_patterns:
-            matches = re.findall(pattern, block, re.IGNORECASE | re.DOTALL)
+            matches = pattern.findall(block)
             if matches:
                 for match in matches:
                     hook = match.strip()
                     # Clean up the hook
-                    hook = re.sub(r'\n+', ' ', hook)
+                    hook = NEWLINES_RE.sub(' ', hook)
                     hook = hook.strip()
                     if hook and len(hook) > 10:
                         hooks.append(hook)
@@ -252,10 +282,10 @@ class TrainingDataLoader:
 
             for line in lines:
                 stripped = line.strip()
-                if re.match(r'^hook\s*\d+\s*[:\-]?', stripped, re.IGNORECASE):
+                if HOOK_HEADER_RE.match(stripped):
                     if current_hook:
                         hooks.append(' '.join(current_hook).strip())
-                    current_hook = [re.sub(r'^hook\s*\d+\s*[:\-]?\s*', '', stripped, flags=re.IGNORECASE)]
+                    current_hook = [HOOK_PREFIX_RE.sub('', stripped)]
                     in_hook = True
                 elif stripped.lower().startswith('body') or (in_hook and not stripped):
                     if current_hook:
@@ -270,7 +300,7 @@ class TrainingDataLoader:
     def _extract_body(self, block: str) -> str:
         """Extract body text from script block"""
         # Find where hooks end and body begins
-        body_match = re.search(r'(?:Body\s*[:\-]?\s*|Hook\s*\d+.*?\n\n)(.*)', block, re.IGNORECASE | re.DOTALL)
+        body_match = BODY_RE.search(block)
         if body_match:
             return body_match.group(1).strip()
 
@@ -278,7 +308,7 @@ class TrainingDataLoader:
         lines = block.split('\n')
         body_start = 0
         for i, line in enumerate(lines):
-            if re.match(r'^hook\s*\d+', line.strip(), re.IGNORECASE):
+            if HOOK_LINE_RE.match(line.strip()):
                 body_start = i + 1
 
         if body_start > 0 and body_start < len(lines):
@@ -292,7 +322,7 @@ class TrainingDataLoader:
 
         for hook_type, patterns in self.hook_type_patterns.items():
             for pattern in patterns:
-                if re.search(pattern, hook_lower):
+                if pattern.search(hook_lower):
                     return hook_type
 
         return "general"
@@ -312,9 +342,10 @@ class TrainingDataLoader:
 
         return "follow"
 
-    def get_winning_patterns(self) -> Dict[str, any]:
-        """Analyze winning scripts for common patterns"""
-        winning = self.load_winning_scripts()
+    def get_winning_patterns(self, winning: Optional[List[ParsedScript]] = None) -> Dict[str, any]:
+        """Analyze winning scripts for common patterns (pass already-parsed scripts to skip reloading)"""
+        if winning is None:
+            winning = self.load_winning_scripts()
 
         patterns = {
             "avg_hook_count": 0,
@@ -359,9 +390,10 @@ class TrainingDataLoader:
 
         return patterns
 
-    def get_losing_patterns(self) -> Dict[str, any]:
-        """Analyze losing scripts for patterns to avoid"""
-        losing = self.load_losing_scripts()
+    def get_losing_patterns(self, losing: Optional[List[ParsedScript]] = None) -> Dict[str, any]:
+        """Analyze losing scripts for patterns to avoid (pass already-parsed scripts to skip reloading)"""
+        if losing is None:
+            losing = self.load_losing_scripts()
 
         patterns = {
             "avg_hook_count": 0,
@@ -424,6 +456,73 @@ class TrainingDataLoader:
         return all_scripts
 
 
+# --- SHARED CORPUS SNAPSHOT ---
+@dataclass(frozen=True)
+class TrainingCorpus:
+    """Immutable parsed training data - safe to share across requests/threads"""
+    winning_scripts: Tuple[ParsedScript, ...]
+    losing_scripts: Tuple[ParsedScript, ...]
+    winning_patterns: Mapping[str, any]
+    losing_patterns: Mapping[str, any]
+    winning_index: BM25Index  # BM25 over winning titles/bodies (positions match winning_scripts)
+    signature: Tuple  # (path, mtime_ns, size) of each source file
+
+
+_corpus: Optional[TrainingCorpus] = None
+_corpus_lock = threading.Lock()
+
+
+def _file_signature(loader: TrainingDataLoader) -> Tuple:
+    """Identify the on-disk version of the training files"""
+    signature = []
+    for path in (loader.winning_file, loader.losing_file):
+        try:
+            stat = path.stat()
+            signature.append((str(path), stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            signature.append((str(path), None, None))
+    return tuple(signature)
+
+
+def get_training_corpus(base_path: str = None) -> TrainingCorpus:
+    """
+    Get the process-wide parsed training corpus.
+    Parsed once; rebuilt only when the reference_docs files change (mtime/size).
+    Readers keep whichever snapshot they grabbed - rebuilds swap the reference atomically.
+    """
+    global _corpus
+    loader = TrainingDataLoader(base_path)
+    signature = _file_signature(loader)
+
+    corpus = _corpus
+    if corpus is not None and corpus.signature == signature:
+        return corpus
+
+    with _corpus_lock:
+        # Another thread may have rebuilt while we waited
+        signature = _file_signature(loader)
+        if _corpus is not None and _corpus.signature == signature:
+            return _corpus
+
+        winning = loader.load_winning_scripts()
+        losing = loader.load_losing_scripts()
+        corpus = TrainingCorpus(
+            winning_scripts=tuple(winning),
+            losing_scripts=tuple(losing),
+            winning_patterns=MappingProxyType(loader.get_winning_patterns(winning)),
+            losing_patterns=MappingProxyType(loader.get_losing_patterns(losing)),
+            winning_index=BM25Index(
+                titles=[s.title for s in winning],
+                bodies=[s.full_text for s in winning],
+                india_flags=[s.has_india_angle for s in winning],
+            ),
+            signature=signature,
+        )
+        _corpus = corpus
+        print(f"[TrainingLoader] Corpus snapshot built: {len(winning)} winning, {len(losing)} losing")
+        return corpus
+
+
 # Test the loader
 if __name__ == "__main__":
     loader = TrainingDataLoader()
@@ -1,6 +1,7 @@
 import os
 import time
 import uuid
+import asyncio
 from pathlib import Path
 from datetime import datetime
 from dotenv import load_dotenv
@@ -28,13 +29,18 @@ from typing import List, Optional
 import json
 import PyPDF2
 import io
+from langgraph.types import Command
 
-from app.db.storage import collection, add_script_to_db
-from app.db.session_service import session_service
+from app.db.storage import collection, add_script_to_db, get_embedding_executor, close_embedding_executor
+from app.db.session_service import async_session_service, get_chat_writer, close_chat_writer
 from app.schemas.enums import ScriptMode, HookType
 from app.utils.skeleton_utils import generate_skeleton, extract_hook
-from app.agents.graph import app as agent_app
+from app.agents.graph import app as agent_app, new_thread, thread_config, get_paused_state, release_thread
 from app.agents.script_chat import script_chat_agent
+from app.agents.llm_registry import close_all as close_llm_clients
+from app.agents.llm_cache import get_llm_cache
+from app.db.embedding_cache import get_embedding_cache
+from app.db.session_cache import get_session_cache
 
 
 server = FastAPI(title="ScriptAI Pro Backend")
@@ -64,6 +70,18 @@ server.add_middleware(
 server_log.success("Server initialized successfully")
 
 
+@server.on_event("shutdown")
+async def shutdown():
+    """Close pooled LLM connections, the embedding worker, the chat writer and the session DB pool"""
+    await close_llm_clients()
+    server_log.info("LLM client pools closed")
+    close_embedding_executor()
+    server_log.info("Embedding executor stopped")
+    # Durability: write every queued chat turn before the DB pool goes away
+    await asyncio.to_thread(close_chat_writer)
+    async_session_service.close()
+
+
 # -------- Data Models --------
 class TrainRequest(BaseModel):
     title: str
@@ -82,6 +100,36 @@ def health_check():
     return {"status": "ok", "vectors_stored": count}
 
 
+@server.get("/cache/stats")
+def cache_stats():
+    """LLM response cache hit/miss counters per call site"""
+    return get_llm_cache().stats()
+
+
+@server.get("/cache/embeddings/stats")
+def embedding_cache_stats():
+    """Embedding cache hit/miss counters"""
+    return get_embedding_cache().stats()
+
+
+@server.get("/cache/sessions/stats")
+def session_cache_stats():
+    """Session (chat path) cache hit/miss counters"""
+    return get_session_cache().stats()
+
+
+@server.get("/chat/writer/stats")
+def chat_writer_stats():
+    """Write-behind chat persistence: batches, pending turns, failures"""
+    return get_chat_writer().stats()
+
+
+@server.get("/embeddings/executor/stats")
+def embedding_executor_stats():
+    """Embedding micro-batching: batch sizes, queue wait and encode times"""
+    return get_embedding_executor().stats()
+
+
 @server.post("/train_script")
 def train_script(request: TrainRequest):
     """Train a new script into the vector database"""
@@ -144,23 +192,38 @@ async def generate_stream(
     mode: ScriptMode = Form(...),
     files: List[UploadFile] = File(None),
     skip_research: bool = Form(False),
+    thread_id: str = Form(""),
 ):
-    """Generate viral scripts with streaming response"""
+    """
+    Generate viral scripts with streaming response.
+    Pass the thread_id from a needs_input event to resume that paused run
+    (topic = chosen angle / clarification). Send the files again too: they are ignored
+    when the run resumes, and used if the thread has expired and a new run starts.
+    """
     request_id = str(uuid.uuid4())[:8]
     server_log.set_request_id(request_id)
 
+    paused_state = await get_paused_state(thread_id) if thread_id else None
+    resuming = paused_state is not None
+    if not resuming:
+        if thread_id:
+            server_log.warn(f"Thread {thread_id[:8]} not resumable - starting a new run with the uploaded files")
+        thread_id = new_thread()
+
     server_log.info("=" * 40)
     server_log.start("Script Generation", {
         "request_id": request_id,
         "topic": topic[:50] + "..." if len(topic) > 50 else topic,
         "mode": mode.value,
         "skip_research": skip_research,
-        "files_count": len(files) if files else 0
+        "files_count": len(files) if files else 0,
+        "resuming": resuming
     })
 
     # Read files BEFORE the generator (outside async generator)
+    # A resumed run already holds the parsed file content in its checkpoint - skip the re-sent files
     all_file_text = []
-    if files:
+    if files and not resuming:
         for file in files:
             if file and file.filename:
                 server_log.step(f"Reading file: {file.filename}")
@@ -185,6 +248,7 @@ async def generate_stream(
         angles_list = []
         summary_table = ""
         full_output = ""
+        paused = False
 
         try:
             # Send file reading status if files were provided
@@ -203,20 +267,47 @@ async def generate_stream(
 
             server_log.step("Initializing agent state")
 
-            if skip_research:
+            if resuming:
+                # Resume the clarify node with the user's answer; state (files, style context) is restored
+                graph_input = Command(resume={"topic": topic, "user_notes": user_notes})
+                yield json.dumps({"type": "status", "message": "Resuming research with your selection..."}) + "\n"
+            elif skip_research:
+                graph_input = initial_state
                 yield json.dumps({"type": "status", "message": f"Agent starting ({mode.value})..."}) + "\n"
             else:
+                graph_input = initial_state
                 yield json.dumps({"type": "status", "message": "Stage 0: Detecting topic type..."}) + "\n"
 
             final_draft = ""
             checker_analysis = ""
             optimized_script = ""
 
-            # Stream Graph Events
+            # Stream Graph Events ("custom" carries script token deltas from the writer)
             server_log.step("Starting graph execution")
-            async for step in agent_app.astream(initial_state):
+            async for stream_mode, step in agent_app.astream(
+                graph_input, thread_config(thread_id), stream_mode=["updates", "custom"]
+            ):
+                if stream_mode == "custom":
+                    yield json.dumps(step) + "\n"
+                    continue
+
+                # Research paused for a generic/ambiguous topic - the run stays checkpointed
+                if "__interrupt__" in step:
+                    payload = step["__interrupt__"][0].value
+                    input_type = payload.get("input_type", "angle_selection")
+                    server_log.warn(f"Run paused for {input_type}", {"thread_id": thread_id[:8]})
+                    yield json.dumps({"type": "needs_input", "thread_id": thread_id, **payload}) + "\n"
+                    waiting = "Waiting for angle selection..." if input_type == "angle_selection" else "Waiting for clarification..."
+                    yield json.dumps({"type": "status", "message": waiting}) + "\n"
+                    paused = True
+                    return  # Frontend re-submits with thread_id + selected angle
+
                 for node, output in step.items():
                     node_time = time.time() - start_time
+                    if not output:
+                        # Barrier nodes (join) produce no state updates
+                        server_log.debug(f"Node completed: {node} @ {node_time:.1f}s")
+                        continue
                     server_log.debug(f"Node completed: {node} @ {node_time:.1f}s", {"output_keys": list(output.keys())})
 
                     if node == "researcher":
@@ -224,33 +315,6 @@ async def generate_stream(
                         research_status = output.get("research_status", "complete")
                         server_log.info(f"Research status: {research_status}")
 
-                        # Handle generic topic (needs angle selection)
-                        if research_status == "needs_specific_angle":
-                            server_log.warn("Topic needs angle selection")
-                            yield json.dumps({
-                                "type": "needs_input",
-                                "input_type": "angle_selection",
-                                "message": output.get("research_message", "This topic is too generic. Please select a specific angle."),
-                                "options": output.get("suggested_angles", []),
-                                "topic_type": "B"
-                            }) + "\n"
-                            yield json.dumps({"type": "status", "message": "Waiting for angle selection..."}) + "\n"
-                            return  # Stop here - frontend will re-submit with selected angle
-
-                        # Handle ambiguous topic (needs clarification)
-                        if research_status == "needs_clarification":
-                            server_log.warn("Topic needs clarification")
-                            yield json.dumps({
-                                "type": "needs_input",
-                                "input_type": "clarification",
-                                "message": output.get("research_message", "This topic is too broad. Please clarify."),
-                                "questions": output.get("clarification_questions", []),
-                                "options": output.get("suggested_angles", []),
-                                "topic_type": "D"
-                            }) + "\n"
-                            yield json.dumps({"type": "status", "message": "Waiting for clarification..."}) + "\n"
-                            return  # Stop here - frontend will re-submit with clarification
-
                         # Normal flow - send research data
                         research_data = output.get("research_data", "")
                         if research_data:
@@ -383,6 +447,9 @@ async def generate_stream(
         except Exception as e:
             server_log.error(f"Generation failed: {str(e)}", exc=e)
             yield json.dumps({"type": "error", "message": str(e)}) + "\n"
+        finally:
+            if not paused:
+                release_thread(thread_id)
 
     return StreamingResponse(event_generator(), media_type="application/x-ndjson")
 
@@ -421,7 +488,7 @@ async def create_session(request: SessionCreate):
     """Create a new session"""
     session_log.start("Create session", {"topic": request.topic[:30], "mode": request.mode})
     try:
-        session = session_service.create_session(
+        session = await async_session_service.create_session(
             topic=request.topic,
             mode=request.mode,
             user_notes=request.user_notes,
@@ -442,16 +509,18 @@ async def create_session(request: SessionCreate):
 
 
 @server.get("/sessions")
-async def list_sessions(limit: int = 50):
-    """List all sessions (most recent first)"""
-    session_log.debug(f"List sessions (limit={limit})")
+async def list_sessions(limit: Optional[int] = None, cursor: Optional[str] = None):
+    """List sessions (most recent first), one page at a time - pass next_cursor back as cursor"""
+    session_log.debug(f"List sessions (limit={limit}, cursor={'yes' if cursor else 'no'})")
     try:
-        sessions = session_service.list_sessions(limit=limit)
-        session_log.info(f"Found {len(sessions)} sessions")
-        return {"sessions": sessions}
+        page = await async_session_service.list_sessions(limit=limit, cursor=cursor)
+        session_log.info(f"Found {len(page['sessions'])} sessions")
+        return page
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         session_log.error(f"List failed: {str(e)}")
-        return {"sessions": []}
+        return {"sessions": [], "next_cursor": None}
 
 
 @server.get("/sessions/{session_id}")
@@ -462,7 +531,7 @@ async def get_session(session_id: str):
         if session_id == "local-session":
             session_log.info("Returning empty local session")
             return {"id": "local-session", "topic": "", "scripts": [], "chat_history": {}}
-        session = session_service.get_session(session_id)
+        session = await async_session_service.get_session(session_id)
         if not session:
             session_log.warn(f"Session not found: {session_id[:8]}")
             raise HTTPException(status_code=404, detail="Session not found")
@@ -486,7 +555,7 @@ async def delete_session(session_id: str):
         if session_id == "local-session":
             session_log.info("Local session - nothing to delete")
             return {"status": "deleted"}
-        success = session_service.delete_session(session_id)
+        success = await async_session_service.delete_session(session_id)
         if not success:
             session_log.warn(f"Session not found: {session_id[:8]}")
             return {"status": "not_found"}
@@ -514,7 +583,7 @@ async def add_session_file(
 
     session_log.debug(f"File content extracted: {len(text)} chars")
 
-    file_data = session_service.add_file(
+    file_data = await async_session_service.add_file(
         session_id=session_id,
         file_name=file.filename,
         file_type=file.content_type or "text/plain",
@@ -542,7 +611,7 @@ async def save_script(request: ScriptSave):
         if request.session_id == "local-session":
             session_log.info("Local session - skipping DB save")
             return {"session_id": request.session_id, "script_number": request.script_number, "status": "local"}
-        script = session_service.save_script(
+        script = await async_session_service.save_script(
             session_id=request.session_id,
             script_number=request.script_number,
             script_content=request.script_content,
@@ -564,7 +633,7 @@ async def save_script(request: ScriptSave):
 async def update_session(session_id: str, updates: dict):
     """Update session fields"""
     session_log.start(f"Update session: {session_id[:8]}", {"fields": list(updates.keys())})
-    success = session_service.update_session(session_id, updates)
+    success = await async_session_service.update_session(session_id, updates)
     if not success:
         session_log.error("Update failed")
         raise HTTPException(status_code=500, detail="Failed to update session")
@@ -649,6 +718,84 @@ async def chat_local(request: LocalChatMessage):
         }
 
 
+@server.post("/chat/local/stream")
+async def chat_local_stream(request: LocalChatMessage):
+    """
+    Streaming /chat/local - NDJSON events as Claude writes:
+    message_delta / message (chat text), script_delta (script body), then done with script_changed.
+    """
+    chat_log.start("Local chat stream", {
+        "script": request.script_number,
+        "message_len": len(request.message),
+        "script_len": len(request.script_content)
+    })
+
+    if not request.script_content:
+        chat_log.error("No script content provided")
+        raise HTTPException(status_code=400, detail="Please provide script content to edit.")
+
+    angle_info = {
+        "name": request.angle_name,
+        "focus": request.angle_focus
+    } if request.angle_name else None
+
+    async def event_generator():
+        start_time = time.time()
+        first_token_ms = None
+        try:
+            async for event in script_chat_agent.stream_chat(
+                user_message=request.message,
+                current_script=request.script_content,
+                chat_history=[],  # No history in local mode
+                angle_info=angle_info
+            ):
+                if first_token_ms is None:
+                    first_token_ms = (time.time() - start_time) * 1000
+                if event["type"] == "done":
+                    chat_log.success("Claude stream finished", {
+                        "first_token_ms": f"{first_token_ms:.0f}",
+                        "duration_ms": f"{(time.time() - start_time) * 1000:.0f}",
+                        "script_changed": event["script_changed"]
+                    })
+                yield json.dumps(event) + "\n"
+        except Exception as e:
+            chat_log.error(f"Local chat stream failed: {str(e)}", exc=e)
+            yield json.dumps({"type": "error", "message": str(e)}) + "\n"
+
+    return StreamingResponse(event_generator(), media_type="application/x-ndjson")
+
+
+async def _load_chat_script(session_id: str, script_number: int):
+    """Script being chatted about: (content, angle_info, base_revision, chat_history); 404 if missing"""
+    # Only this script and its chat (cached between turns)
+    context = await async_session_service.get_script_context(session_id, script_number)
+    if not context:
+        chat_log.error("Session not found")
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    # The current script
+    script = context["script"] or {}
+    current_script = script.get("script_content", "")
+    angle_info = {
+        "name": script.get("angle_name", ""),
+        "focus": script.get("angle_focus", ""),
+        "hook_style": script.get("angle_hook_style", "")
+    }
+
+    if not current_script:
+        chat_log.error(f"Script {script_number} not found in session")
+        raise HTTPException(status_code=404, detail=f"Script {script_number} not found")
+
+    # Revision the user is looking at (0 = script has no stored revisions yet)
+    base_revision = script.get("revision") or 0
+    chat_log.info(f"Script found: {len(current_script)} chars, revision {base_revision}, Angle: {angle_info.get('name', 'unknown')}")
+
+    # Get chat history for this script
+    chat_history = context["chat_history"]
+    chat_log.debug(f"Chat history: {len(chat_history)} messages")
+    return current_script, angle_info, base_revision, chat_history
+
+
 @server.post("/chat")
 async def chat_with_script(request: ChatMessage):
     """
@@ -673,7 +820,11 @@ async def chat_with_script(request: ChatMessage):
     # Get the session and current script
     try:
         chat_log.step("Loading session")
-        session = session_service.get_session(request.session_id)
+        current_script, angle_info, base_revision, chat_history = await _load_chat_script(
+            request.session_id, request.script_number
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         chat_log.error(f"Session lookup failed: {str(e)}")
         return {
@@ -682,95 +833,157 @@ async def chat_with_script(request: ChatMessage):
             "script_changed": False
         }
 
-    if not session:
-        chat_log.error("Session not found")
-        raise HTTPException(status_code=404, detail="Session not found")
-
-    # Find the current script
-    scripts = session.get("scripts", [])
-    current_script = None
-    angle_info = None
-
-    for s in scripts:
-        if s.get("script_number") == request.script_number:
-            current_script = s.get("script_content", "")
-            angle_info = {
-                "name": s.get("angle_name", ""),
-                "focus": s.get("angle_focus", ""),
-                "hook_style": s.get("angle_hook_style", "")
-            }
-            break
-
-    if not current_script:
-        chat_log.error(f"Script {request.script_number} not found in session")
-        raise HTTPException(status_code=404, detail=f"Script {request.script_number} not found")
-
-    chat_log.info(f"Script found: {len(current_script)} chars, Angle: {angle_info.get('name', 'unknown')}")
-
-    # Get chat history for this script
-    chat_history = session.get("chat_history", {}).get(request.script_number, [])
-    chat_log.debug(f"Chat history: {len(chat_history)} messages")
-
-    # Save user message to DB
-    chat_log.step("Saving user message")
-    session_service.add_chat_message(
-        session_id=request.session_id,
-        script_number=request.script_number,
-        role="user",
-        content=request.message
-    )
-
     # Get Claude's response
     chat_log.step("Calling Claude for response")
     start_time = time.time()
-    full_response = await script_chat_agent.chat(
-        user_message=request.message,
-        current_script=current_script,
-        chat_history=chat_history,
-        angle_info=angle_info
-    )
+    try:
+        full_response = await script_chat_agent.chat(
+            user_message=request.message,
+            current_script=current_script,
+            chat_history=chat_history,
+            angle_info=angle_info
+        )
+    except Exception as e:
+        chat_log.error(f"Chat failed: {str(e)}", exc=e)
+        # Keep the user's message even when the model call fails
+        await async_session_service.record_chat_turn(
+            request.session_id, request.script_number, request.message, base_revision=base_revision
+        )
+        raise HTTPException(status_code=502, detail=f"Model call failed: {str(e)}")
     duration = (time.time() - start_time) * 1000
     chat_log.success(f"Claude response received", {"duration_ms": f"{duration:.0f}", "response_len": len(full_response)})
 
     # Extract the short chat message for display
     chat_message = script_chat_agent.extract_chat_message(full_response)
 
-    # Save assistant message to DB (save the short message, not the full response)
-    chat_log.step("Saving assistant message")
-    session_service.add_chat_message(
-        session_id=request.session_id,
-        script_number=request.script_number,
-        role="assistant",
-        content=chat_message
-    )
-
-    # Try to extract updated script and save it
+    # Extract updated script (stored as a delta against the version it was edited from)
     chat_log.step("Checking for script updates")
     updated_script = script_chat_agent.extract_updated_script(full_response, current_script)
     script_changed = updated_script != current_script
+    chat_log.info("Script was modified" if script_changed else "No script changes detected")
 
-    if script_changed:
-        chat_log.info("Script was modified - saving update")
-        session_service.update_script(
-            session_id=request.session_id,
-            script_number=request.script_number,
-            script_content=updated_script
-        )
-        chat_log.success(f"Script {request.script_number} updated")
-    else:
-        chat_log.info("No script changes detected")
+    # Both messages + the script revision are written in the background (one batched RPC)
+    chat_log.step("Queueing chat turn")
+    revision = await async_session_service.record_chat_turn(
+        session_id=request.session_id,
+        script_number=request.script_number,
+        user_message=request.message,
+        assistant_message=chat_message,
+        base_revision=base_revision,
+        previous_content=current_script if script_changed else None,
+        script_content=updated_script if script_changed else None
+    )
+    if revision is None:
+        revision = base_revision
+    # Turns of this session the writer could not save (this one if it could not be queued)
+    unsaved_turns = await async_session_service.pop_failed_chat_turns(request.session_id)
+    if unsaved_turns:
+        chat_log.warn(f"{len(unsaved_turns)} chat turn(s) were not saved")
 
     return {
         "response": chat_message,  # Short message for chat panel
         "updated_script": updated_script,  # Full script for main view
-        "script_changed": script_changed
+        "script_changed": script_changed,
+        "revision": revision,
+        "unsaved_turns": unsaved_turns
     }
 
 
+@server.post("/chat/stream")
+async def chat_with_script_stream(request: ChatMessage):
+    """
+    Streaming /chat - NDJSON events as Claude writes:
+    message_delta / message (chat text), script_delta (script body),
+    then done with script_changed and the stored revision.
+    """
+    chat_log.start("Chat stream", {
+        "session": request.session_id[:8] if len(request.session_id) > 8 else request.session_id,
+        "script": request.script_number,
+        "message_len": len(request.message)
+    })
+
+    if request.session_id == "local-session":
+        chat_log.warn("Session is local - use /chat/local/stream instead")
+        raise HTTPException(status_code=400, detail="For local mode, use /chat/local/stream with script content.")
+
+    try:
+        chat_log.step("Loading session")
+        current_script, angle_info, base_revision, chat_history = await _load_chat_script(
+            request.session_id, request.script_number
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        chat_log.error(f"Session lookup failed: {str(e)}")
+        raise HTTPException(status_code=503, detail="Could not load session. Supabase may not be configured correctly.")
+
+    async def event_generator():
+        chat_log.step("Streaming Claude response")
+        start_time = time.time()
+        first_token_ms = None
+        recorded = False
+        try:
+            async for event in script_chat_agent.stream_chat(
+                user_message=request.message,
+                current_script=current_script,
+                chat_history=chat_history,
+                angle_info=angle_info
+            ):
+                if first_token_ms is None:
+                    first_token_ms = (time.time() - start_time) * 1000
+                if event["type"] != "done":
+                    yield json.dumps(event) + "\n"
+                    continue
+
+                script_changed = event["script_changed"]
+                chat_log.success("Claude stream finished", {
+                    "first_token_ms": f"{first_token_ms:.0f}",
+                    "duration_ms": f"{(time.time() - start_time) * 1000:.0f}",
+                    "script_changed": script_changed
+                })
+                # Same write-behind turn as /chat
+                recorded = True
+                revision = await async_session_service.record_chat_turn(
+                    session_id=request.session_id,
+                    script_number=request.script_number,
+                    user_message=request.message,
+                    assistant_message=event["response"],
+                    base_revision=base_revision,
+                    previous_content=current_script if script_changed else None,
+                    script_content=event["updated_script"] if script_changed else None
+                )
+                event["revision"] = base_revision if revision is None else revision
+                event["unsaved_turns"] = await async_session_service.pop_failed_chat_turns(request.session_id)
+                yield json.dumps(event) + "\n"
+        except Exception as e:
+            chat_log.error(f"Chat stream failed: {str(e)}", exc=e)
+            if not recorded:
+                # Keep the user's message even when the model call fails
+                await async_session_service.record_chat_turn(
+                    request.session_id, request.script_number, request.message, base_revision=base_revision
+                )
+            yield json.dumps({"type": "error", "message": str(e)}) + "\n"
+
+    return StreamingResponse(event_generator(), media_type="application/x-ndjson")
+
+
+@server.get("/sessions/{session_id}/scripts/{script_number}/revisions/{revision}")
+async def get_script_revision(session_id: str, script_number: int, revision: int):
+    """A past version of a script (the revision a chat message refers to)"""
+    chat_log.debug(f"Get script revision: session={session_id[:8]}, script={script_number}, revision={revision}")
+    content = await async_session_service.get_script_revision(session_id, script_number, revision)
+    if content is None:
+        raise HTTPException(status_code=404, detail="Revision not found")
+    return {"script_number": script_number, "revision": revision, "script_content": content}
+
+
 @server.get("/sessions/{session_id}/chat/{script_number}")
-async def get_chat_history(session_id: str, script_number: int):
-    """Get chat history for a specific script"""
+async def get_chat_history(session_id: str, script_number: int, limit: Optional[int] = None, cursor: Optional[str] = None):
+    """Get chat history for a specific script - newest page first, next_cursor pages back"""
     chat_log.debug(f"Get chat history: session={session_id[:8]}, script={script_number}")
-    history = session_service.get_chat_history(session_id, script_number)
-    chat_log.info(f"Returned {len(history)} messages")
-    return {"messages": history}
+    try:
+        page = await async_session_service.get_chat_history(session_id, script_number, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    chat_log.info(f"Returned {len(page['messages'])} messages")
+    return page
@@ -0,0 +1,232 @@
+"""
+Bulk Ingestion - Stream training corpora into the vector database in batches
+Encodes many scripts per model call, upserts in sized chunks, and checkpoints
+finished scripts so an interrupted run resumes without re-embedding.
+
+Usage:
+    cd backend
+    python -m app.db.bulk_ingest                      # all sources
+    python -m app.db.bulk_ingest seed vibhay          # selected sources
+    python -m app.db.bulk_ingest --fresh              # ignore the checkpoint
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set
+
+from app.db.storage import embed_texts, build_script_records, store_records, UPSERT_CHUNK_SIZE
+from app.schemas.enums import ScriptMode, HookType
+from app.utils.skeleton_utils import generate_skeleton, extract_hook
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent.parent
+
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "64"))  # Scripts per encode call (x3 texts)
+INGEST_CHECKPOINT = os.getenv("INGEST_CHECKPOINT", str(BACKEND_DIR / ".cache" / "ingest_checkpoint.json"))
+
+# Stable ids: re-ingesting the same script upserts the same rows (Supabase and local store) instead of duplicating them
+SCRIPT_ID_NAMESPACE = uuid.UUID("6f1c2a4e-5b7d-4c1e-9a3f-2d8e0b6c7a51")
+
+
+@dataclass
+class IngestItem:
+    """One script ready to embed"""
+    source: str
+    title: str
+    content: str
+    mode: ScriptMode
+    hook_type: HookType
+    hook_text: str
+    skeleton_text: str
+
+    @property
+    def script_id(self) -> str:
+        return str(uuid.uuid5(SCRIPT_ID_NAMESPACE, f"{self.source}\0{self.title}\0{self.content}"))
+
+
+# --- SOURCES ---
+def iter_seed_scripts() -> Iterator[IngestItem]:
+    """Winning scripts bundled in seed_winning_scripts.py"""
+    from app.db.seed_winning_scripts import WINNING_SCRIPTS, MODE_MAP, HOOK_TYPE_MAP, extract_seed_hook
+
+    for script in WINNING_SCRIPTS:
+        yield IngestItem(
+            source="seed",
+            title=script["title"],
+            content=script["content"],
+            mode=MODE_MAP.get(script["mode"], ScriptMode.INFORMATIONAL),
+            hook_type=HOOK_TYPE_MAP.get(script["hook_type"], HookType.SHOCK),
+            hook_text=extract_seed_hook(script["content"]),
+            skeleton_text=generate_skeleton(script["content"]),
+        )
+
+
+def iter_vibhay_scripts() -> Iterator[IngestItem]:
+    """Style training scripts in training_data/vibhay_scripts.py"""
+    if str(BACKEND_DIR) not in sys.path:
+        sys.path.insert(0, str(BACKEND_DIR))
+    from training_data.vibhay_scripts import TRAINING_SCRIPTS
+    from app.db.seed_winning_scripts import MODE_MAP, HOOK_TYPE_MAP
+
+    for script in TRAINING_SCRIPTS:
+        yield IngestItem(
+            source="vibhay",
+            title=script["title"],
+            content=script["content"],
+            # Some scripts are tagged "story" - store them with informational ones, like the seed data
+            mode=MODE_MAP.get(script["mode"], ScriptMode.INFORMATIONAL),
+            hook_type=HOOK_TYPE_MAP.get(script["hook_type"], HookType.SHOCK),
+            hook_text=extract_hook(script["content"]),
+            skeleton_text=generate_skeleton(script["content"]),
+        )
+
+
+def iter_reference_docs_scripts() -> Iterator[IngestItem]:
+    """Winning scripts parsed from reference_docs (shared corpus snapshot)"""
+    from app.agents.training_data_loader import get_training_corpus
+
+    for script in get_training_corpus().winning_scripts:
+        hook_type = next(
+            (HookType(t) for t in script.hook_types if t in HookType._value2member_map_),
+            HookType.SHOCK
+        )
+        yield IngestItem(
+            source="reference_docs",
+            title=script.title,
+            content=script.full_text,
+            mode=ScriptMode.INFORMATIONAL,
+            hook_type=hook_type,
+            hook_text=script.hooks[0] if script.hooks else extract_hook(script.full_text),
+            skeleton_text=generate_skeleton(script.full_text),
+        )
+
+
+SOURCES: Dict[str, Callable[[], Iterator[IngestItem]]] = {
+    "seed": iter_seed_scripts,
+    "vibhay": iter_vibhay_scripts,
+    "reference_docs": iter_reference_docs_scripts,
+}
+
+
+# --- CHECKPOINT ---
+def _load_checkpoint(path: Optional[str]) -> Set[str]:
+    if not path or not Path(path).exists():
+        return set()
+    try:
+        return set(json.loads(Path(path).read_text(encoding="utf-8")).get("done", []))
+    except (OSError, ValueError) as e:
+        print(f"[Ingest] Ignoring unreadable checkpoint: {e}")
+        return set()
+
+
+def _save_checkpoint(path: Optional[str], done: Set[str]):
+    if not path:
+        return
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"done": sorted(done)}, f)
+    os.replace(tmp_path, path)
+
+
+def _batches(items: Iterable[IngestItem], size: int) -> Iterator[List[IngestItem]]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# --- PIPELINE ---
+def ingest(
+    sources: Optional[List[str]] = None,
+    batch_size: int = INGEST_BATCH_SIZE,
+    chunk_size: int = UPSERT_CHUNK_SIZE,
+    checkpoint_path: Optional[str] = INGEST_CHECKPOINT,
+    resume: bool = True,
+) -> Dict[str, int]:
+    """
+    Stream scripts from the given sources (default: all) into the vector database.
+    Per batch: one encode call for all texts, chunked upserts, then a checkpoint write.
+    """
+    sources = sources or list(SOURCES)
+    unknown = [s for s in sources if s not in SOURCES]
+    if unknown:
+        raise ValueError(f"Unknown sources: {unknown} (choose from {list(SOURCES)})")
+
+    done = _load_checkpoint(checkpoint_path) if resume else set()
+    stats = {"ingested": 0, "skipped": 0, "failed": 0, "supabase_rows": 0, "local_rows": 0}
+    start = time.time()
+
+    def pending() -> Iterator[IngestItem]:
+        seen = set()
+        for source in sources:
+            for item in SOURCES[source]():
+                script_id = item.script_id
+                if script_id in done or script_id in seen:
+                    stats["skipped"] += 1
+                    continue
+                seen.add(script_id)
+                yield item
+
+    for batch in _batches(pending(), max(1, batch_size)):
+        try:
+            texts = []
+            for item in batch:
+                texts.extend([item.content, item.hook_text, item.skeleton_text])
+            embeddings = embed_texts(texts).tolist()
+
+            records = []
+            for i, item in enumerate(batch):
+                records.extend(build_script_records(
+                    item.script_id, item.title, item.mode, item.hook_type,
+                    item.content, item.hook_text, item.skeleton_text,
+                    embeddings[i * 3:i * 3 + 3]
+                ))
+            counts = store_records(records, chunk_size)
+        except Exception as e:
+            stats["failed"] += len(batch)
+            print(f"[Ingest] Batch of {len(batch)} failed: {str(e)[:80]}")
+            continue
+
+        stats["supabase_rows"] += counts["supabase"]
+        stats["local_rows"] += counts["local"]
+        stats["ingested"] += len(batch)
+        done.update(item.script_id for item in batch)
+        _save_checkpoint(checkpoint_path, done)
+
+        elapsed = time.time() - start
+        print(f"[Ingest] {stats['ingested']} scripts ingested ({stats['skipped']} skipped) - "
+              f"{stats['ingested'] / elapsed if elapsed else 0:.1f} scripts/s")
+
+    print(f"[Ingest] Done in {time.time() - start:.1f}s", stats)
+    return stats
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Bulk ingest training scripts into the vector database")
+    parser.add_argument("sources", nargs="*", help=f"Sources to ingest (default: all of {', '.join(SOURCES)})")
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE, help="Scripts per encode call")
+    parser.add_argument("--chunk-size", type=int, default=UPSERT_CHUNK_SIZE, help="Records per upsert request")
+    parser.add_argument("--checkpoint", default=INGEST_CHECKPOINT, help="Checkpoint file ('' to disable)")
+    parser.add_argument("--fresh", action="store_true", help="Ignore the checkpoint and re-ingest everything")
+    args = parser.parse_args(argv)
+
+    ingest(
+        sources=args.sources or None,
+        batch_size=args.batch_size,
+        chunk_size=args.chunk_size,
+        checkpoint_path=args.checkpoint or None,
+        resume=not args.fresh,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Chat Writer - Write-behind persistence for chat turns
+/chat hands each finished turn (user message, assistant message, script revision)
+to one background thread. Turns queued within CHAT_WRITE_FLUSH_MS are written in a
+single transactional RPC (persist_chat_turns), in submission order - so turns of a
+session are never reordered. A full queue makes submitters wait for a slot (never jump it).
+close() flushes everything still queued.
+"""
+import os
+import time
+import queue
+import threading
+from typing import Callable, Dict, List, Optional
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+from app.utils.logger import get_logger
+
+log = get_logger("ChatWriter", "📝")
+
+CHAT_WRITE_FLUSH_MS = float(os.getenv("CHAT_WRITE_FLUSH_MS", "50"))  # Collect window per batch
+CHAT_WRITE_MAX_BATCH = int(os.getenv("CHAT_WRITE_MAX_BATCH", "100"))  # Turns per RPC
+CHAT_WRITE_QUEUE_MAX = int(os.getenv("CHAT_WRITE_QUEUE_MAX", "1000"))  # Pending turns before submitters wait
+CHAT_WRITE_QUEUE_TIMEOUT = float(os.getenv("CHAT_WRITE_QUEUE_TIMEOUT", "5"))  # Seconds to wait for a slot
+CHAT_WRITE_RETRIES = 3
+
+_STOP = object()
+
+
+class ChatTurnWriter:
+    """Single background thread that batches chat turns into one RPC per flush"""
+
+    def __init__(
+        self,
+        write_batch: Callable[[List[Dict]], List[Optional[int]]],
+        on_failed: Callable[[Dict], None],
+        flush_ms: float = CHAT_WRITE_FLUSH_MS,
+        max_batch: int = CHAT_WRITE_MAX_BATCH,
+        max_queue: int = CHAT_WRITE_QUEUE_MAX,
+    ):
+        # write_batch(turns) -> committed revision per turn; raises on failure
+        self.write_batch = write_batch
+        self.on_failed = on_failed
+        self.flush_interval = max(0.0, flush_ms) / 1000
+        self.max_batch = max(1, max_batch)
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max(1, max_queue))
+        self._pending: Dict[str, int] = {}
+        self._idle = threading.Condition()
+        self._stats = {"turns": 0, "batches": 0, "failed_turns": 0, "queue_full": 0, "sync_writes": 0}
+        self._thread = threading.Thread(target=self._run, name="chat-writer", daemon=True)
+        self._thread.start()
+
+    # --- Submission ---
+    def submit(self, turn: Dict, timeout: float = CHAT_WRITE_QUEUE_TIMEOUT) -> bool:
+        """
+        Queue a turn behind every turn already queued (keeps per-session order).
+        Waits up to timeout for a slot when the queue is full; False (turn reported failed) if none frees up.
+        Once the writer has stopped, turns are written on the caller's thread.
+        """
+        session_id = turn["session_id"]
+        with self._idle:
+            self._pending[session_id] = self._pending.get(session_id, 0) + 1
+        if not self._thread.is_alive():
+            with self._idle:
+                self._stats["sync_writes"] += 1
+            self._write([turn])
+            return True
+        try:
+            self._queue.put(turn, timeout=timeout)
+            return True
+        except queue.Full:
+            log.error(f"Chat write queue full for {timeout:g}s - dropping turn for session {session_id[:8]}")
+            with self._idle:
+                self._stats["queue_full"] += 1
+                self._stats["failed_turns"] += 1
+            self._finish([turn])
+            self.on_failed(turn)
+            return False
+
+    def wait_idle(self, session_id: str, timeout: float = 10.0) -> bool:
+        """Block until every queued turn of a session is written (read-your-writes)"""
+        deadline = time.monotonic() + timeout
+        with self._idle:
+            while self._pending.get(session_id):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+        return True
+
+    # --- Worker ---
+    def _write_one(self, turn: Dict):
+        """Single turn with retries; dropped (and reported) if it keeps failing"""
+        delay = 0.5
+        for attempt in range(CHAT_WRITE_RETRIES):
+            try:
+                self.write_batch([turn])
+                return
+            except Exception as e:
+                error = e
+                log.warn(f"Chat turn write failed (attempt {attempt + 1}): {str(e)[:100]}")
+                if attempt + 1 < CHAT_WRITE_RETRIES:
+                    time.sleep(delay)
+                    delay *= 2
+        log.error(f"Dropping chat turn for session {turn['session_id'][:8]}: {str(error)[:100]}")
+        with self._idle:
+            self._stats["failed_turns"] += 1
+        self.on_failed(turn)
+
+    def _write(self, turns: List[Dict]):
+        if len(turns) == 1:
+            self._write_one(turns[0])
+        else:
+            try:
+                self.write_batch(turns)
+            except Exception as e:
+                # One bad turn (e.g. its session was deleted) must not drop the rest
+                log.warn(f"Batch of {len(turns)} turns failed, writing them one by one: {str(e)[:100]}")
+                for turn in turns:
+                    self._write_one(turn)
+
+        with self._idle:
+            self._stats["turns"] += len(turns)
+            self._stats["batches"] += 1
+        self._finish(turns)
+
+    def _finish(self, turns: List[Dict]):
+        """Turns are no longer pending (written or given up) - wake read-your-writes waiters"""
+        with self._idle:
+            for turn in turns:
+                session_id = turn["session_id"]
+                self._pending[session_id] -= 1
+                if not self._pending[session_id]:
+                    del self._pending[session_id]
+            self._idle.notify_all()
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            batch = [first]
+            stop = False
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            self._write(batch)
+            if stop:
+                return
+
+    def close(self, timeout: float = 30.0):
+        """Flush every queued turn, then stop (server shutdown)"""
+        if not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            log.error("Chat writer did not finish flushing before shutdown timeout")
+            return
+        # Turns that raced the stop marker
+        leftovers = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                leftovers.append(item)
+        if leftovers:
+            self._write(leftovers)
+        log.info("Chat writer flushed")
+
+    def stats(self) -> Dict:
+        with self._idle:
+            counts = dict(self._stats)
+            pending = sum(self._pending.values())
+        return {**counts, "pending_turns": pending, "queue_depth": self._queue.qsize()}
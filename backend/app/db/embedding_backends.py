@@ -0,0 +1,209 @@
+"""
+Embedding Backends - Pluggable text -> vector encoders (selected with EMBEDDING_BACKEND)
+- sentence-transformers: all-MiniLM-L6-v2 on torch (default, ~300MB RSS)
+- onnx-int8: the same model exported to ONNX and int8-quantized, run on ONNX Runtime (no torch)
+  Runtime needs: pip install onnxruntime tokenizers
+
+Export the ONNX model once (needs torch + transformers + onnx + onnxruntime on that machine):
+    cd backend
+    python -m app.db.embedding_backends export
+The export is checked against sentence-transformers on the training corpus and discarded
+if any text's cosine falls below EMBEDDING_ONNX_MIN_COSINE.
+"""
+import os
+import sys
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import List, Optional
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+import numpy as np
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+HF_MODEL_ID = f"sentence-transformers/{MODEL_NAME}"
+EMBEDDING_DIM = 384
+MAX_SEQ_LENGTH = 256  # Same truncation as the sentence-transformers model
+
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "sentence-transformers")
+EMBEDDING_ONNX_DIR = os.getenv(
+    "EMBEDDING_ONNX_DIR",
+    str(Path(__file__).resolve().parent.parent.parent / ".cache" / "onnx" / MODEL_NAME)
+)
+ONNX_MODEL_FILE = "model_int8.onnx"
+ONNX_BATCH_SIZE = int(os.getenv("EMBEDDING_ONNX_BATCH_SIZE", "32"))
+ONNX_MIN_COSINE = float(os.getenv("EMBEDDING_ONNX_MIN_COSINE", "0.98"))  # Export parity gate
+
+
+class EmbeddingBackend(ABC):
+    """Interface: encode texts into L2-normalized float32 rows"""
+
+    # Identifies the vectors this backend produces (part of the embedding cache key)
+    name: str = ""
+    dimension: int = EMBEDDING_DIM
+
+    @abstractmethod
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """(len(texts), dimension) float32 rows"""
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """Reference backend - the original torch model"""
+
+    name = MODEL_NAME
+
+    def __init__(self):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(MODEL_NAME)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return np.asarray(self.model.encode(texts), dtype=np.float32)
+
+
+class OnnxInt8Backend(EmbeddingBackend):
+    """int8-quantized ONNX export of the same model (mean pooling + L2 norm, like the original)"""
+
+    name = f"{MODEL_NAME}-onnx-int8"
+
+    def __init__(self, model_dir: str = EMBEDDING_ONNX_DIR):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_dir = Path(model_dir)
+        model_path = model_dir / ONNX_MODEL_FILE
+        if not model_path.exists():
+            raise FileNotFoundError(
+                f"{model_path} not found - run `python -m app.db.embedding_backends export` first"
+            )
+
+        self.tokenizer = Tokenizer.from_file(str(model_dir / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(str(model_path), options, providers=["CPUExecutionProvider"])
+        self._input_names = {i.name for i in self.session.get_inputs()}
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.asarray([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.asarray([e.attention_mask for e in encodings], dtype=np.int64)
+
+        feed = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self._input_names:
+            feed["token_type_ids"] = np.zeros_like(input_ids)
+        token_embeddings = self.session.run(None, feed)[0]
+
+        # Mean pooling over real tokens, then L2 normalize
+        mask = attention_mask[..., None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return (pooled / np.clip(norms, 1e-12, None)).astype(np.float32)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        return np.concatenate([
+            self._encode_batch(texts[i:i + ONNX_BATCH_SIZE])
+            for i in range(0, len(texts), ONNX_BATCH_SIZE)
+        ])
+
+
+BACKENDS = {
+    "sentence-transformers": SentenceTransformerBackend,
+    "onnx-int8": OnnxInt8Backend,
+}
+
+
+def load_backend(name: Optional[str] = None) -> EmbeddingBackend:
+    """Instantiate the configured embedding backend"""
+    name = name or EMBEDDING_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown EMBEDDING_BACKEND '{name}' (choose from {list(BACKENDS)})")
+    start = time.time()
+    backend = BACKENDS[name]()
+    print(f"[Embeddings] Loaded {name} backend in {time.time() - start:.1f}s")
+    return backend
+
+
+def check_onnx_parity(model_dir: str = EMBEDDING_ONNX_DIR, min_cosine: float = ONNX_MIN_COSINE) -> dict:
+    """Compare an exported model with sentence-transformers; ValueError if any text drifts below min_cosine"""
+    from app.db.embedding_benchmark import sample_texts, cosine_agreement
+
+    texts = sample_texts()
+    parity = cosine_agreement(
+        SentenceTransformerBackend().encode(texts), OnnxInt8Backend(model_dir).encode(texts)
+    )
+    print(f"[Embeddings] Parity on {len(texts)} texts: {parity}")
+    if parity["min_cosine"] < min_cosine:
+        raise ValueError(f"ONNX export min cosine {parity['min_cosine']} is below {min_cosine}")
+    return parity
+
+
+def export_onnx_int8(output_dir: str = EMBEDDING_ONNX_DIR):
+    """Export the model to ONNX, quantize its weights to int8 (dynamic quantization) and check parity"""
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    fp32_path = output_dir / "model_fp32.onnx"
+
+    class _TokenEmbeddings(torch.nn.Module):
+        """Keyword-only call into the transformer (positional order differs across versions)"""
+
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            return self.model(
+                input_ids=input_ids, attention_mask=attention_mask, token_type_ids=token_type_ids
+            ).last_hidden_state
+
+    tokenizer = AutoTokenizer.from_pretrained(HF_MODEL_ID)
+    model = _TokenEmbeddings(AutoModel.from_pretrained(HF_MODEL_ID)).eval()
+    sample = tokenizer(["export sample"], return_tensors="pt")
+
+    print(f"[Embeddings] Exporting {HF_MODEL_ID} to ONNX...")
+    torch.onnx.export(
+        model,
+        (sample["input_ids"], sample["attention_mask"], sample["token_type_ids"]),
+        str(fp32_path),
+        input_names=["input_ids", "attention_mask", "token_type_ids"],
+        output_names=["last_hidden_state"],
+        dynamic_axes={
+            "input_ids": {0: "batch", 1: "sequence"},
+            "attention_mask": {0: "batch", 1: "sequence"},
+            "token_type_ids": {0: "batch", 1: "sequence"},
+            "last_hidden_state": {0: "batch", 1: "sequence"},
+        },
+        opset_version=14,
+        dynamo=False,  # TorchScript exporter - no onnxscript dependency
+    )
+
+    print("[Embeddings] Quantizing to int8...")
+    quantize_dynamic(str(fp32_path), str(output_dir / ONNX_MODEL_FILE), weight_type=QuantType.QInt8)
+    fp32_path.unlink()
+    tokenizer.backend_tokenizer.save(str(output_dir / "tokenizer.json"))
+
+    print("[Embeddings] Checking parity with sentence-transformers...")
+    try:
+        check_onnx_parity(str(output_dir))
+    except ValueError:
+        # Never leave a drifted model where OnnxInt8Backend would load it
+        (output_dir / ONNX_MODEL_FILE).unlink()
+        raise
+    print(f"[Embeddings] Wrote {output_dir / ONNX_MODEL_FILE}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "export":
+        export_onnx_int8(sys.argv[2] if len(sys.argv) > 2 else EMBEDDING_ONNX_DIR)
+    else:
+        print("Usage: python -m app.db.embedding_backends export [output_dir]")
@@ -0,0 +1,147 @@
+"""
+Embedding Backend Benchmark + Parity Check
+Compares every available backend against sentence-transformers on the training corpus:
+load time, peak RSS, encode throughput, and cosine agreement of the vectors.
+Each backend runs in its own subprocess so load time and memory are measured cold.
+
+Usage:
+    cd backend
+    python -m app.db.embedding_benchmark                   # all backends
+    python -m app.db.embedding_benchmark --min-cosine 0.98 # parity threshold (exit 1 below it)
+"""
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.db.embedding_backends import BACKENDS, ONNX_MIN_COSINE, load_backend
+
+REFERENCE_BACKEND = "sentence-transformers"
+DEFAULT_MIN_COSINE = ONNX_MIN_COSINE
+
+
+def _peak_rss_mb() -> Optional[float]:
+    """Peak resident memory of this process (None where resource is unavailable)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # KB on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def sample_texts(limit: int = 200) -> List[str]:
+    """Titles, hooks and bodies from the training corpus (the kind of text we embed)"""
+    from app.agents.training_data_loader import get_training_corpus
+
+    texts = []
+    for script in get_training_corpus().winning_scripts:
+        texts.append(script.title)
+        texts.extend(script.hooks[:2])
+        texts.append(script.full_text)
+    return [t for t in texts if t.strip()][:limit]
+
+
+def run_worker(backend_name: str, texts_path: str, output_path: str):
+    """Measure one backend in this (fresh) process and save its vectors"""
+    texts = json.loads(Path(texts_path).read_text(encoding="utf-8"))
+    rss_before = _peak_rss_mb()
+
+    start = time.perf_counter()
+    backend = load_backend(backend_name)
+    load_seconds = time.perf_counter() - start
+
+    backend.encode(texts[:4])  # Warm up
+    start = time.perf_counter()
+    vectors = backend.encode(texts)
+    encode_seconds = time.perf_counter() - start
+
+    np.save(output_path, np.asarray(vectors, dtype=np.float32))
+    rss_after = _peak_rss_mb()
+    print(json.dumps({
+        "backend": backend_name,
+        "load_seconds": round(load_seconds, 2),
+        "peak_rss_mb": round(rss_after, 1) if rss_after is not None else None,
+        "model_rss_mb": round(rss_after - rss_before, 1) if rss_after is not None else None,
+        "texts_per_second": round(len(texts) / encode_seconds, 1) if encode_seconds else None,
+    }))
+
+
+def cosine_agreement(reference: np.ndarray, candidate: np.ndarray) -> Dict[str, float]:
+    """Row-wise cosine between two embeddings of the same texts"""
+    ref = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+    cand = candidate / np.linalg.norm(candidate, axis=1, keepdims=True)
+    cosines = (ref * cand).sum(axis=1)
+
+    # Nearest-neighbour agreement: does each text keep the same closest other text?
+    ref_sim, cand_sim = ref @ ref.T, cand @ cand.T
+    np.fill_diagonal(ref_sim, -np.inf)
+    np.fill_diagonal(cand_sim, -np.inf)
+    nn_agreement = float((ref_sim.argmax(axis=1) == cand_sim.argmax(axis=1)).mean())
+
+    return {
+        "mean_cosine": round(float(cosines.mean()), 4),
+        "min_cosine": round(float(cosines.min()), 4),
+        "nn_agreement": round(nn_agreement, 3),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark embedding backends and check parity")
+    parser.add_argument("--backends", nargs="*", default=list(BACKENDS), help="Backends to compare")
+    parser.add_argument("--texts", type=int, default=200, help="Number of corpus texts to encode")
+    parser.add_argument("--min-cosine", type=float, default=DEFAULT_MIN_COSINE,
+                        help="Fail if any text's cosine vs the reference is below this")
+    parser.add_argument("--worker", nargs=3, metavar=("BACKEND", "TEXTS", "OUTPUT"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        run_worker(*args.worker)
+        return 0
+
+    backends = [REFERENCE_BACKEND] + [b for b in args.backends if b != REFERENCE_BACKEND]
+    workdir = Path(tempfile.mkdtemp(prefix="embedding_benchmark_"))
+    texts_path = workdir / "texts.json"
+    texts_path.write_text(json.dumps(sample_texts(args.texts)), encoding="utf-8")
+
+    results, vectors = {}, {}
+    for name in backends:
+        output_path = workdir / f"{name}.npy"
+        proc = subprocess.run(
+            [sys.executable, "-m", "app.db.embedding_benchmark", "--worker", name, str(texts_path), str(output_path)],
+            capture_output=True, text=True, cwd=Path(__file__).resolve().parent.parent.parent,
+        )
+        if proc.returncode != 0:
+            print(f"[Benchmark] {name}: unavailable ({proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'failed'})")
+            continue
+        results[name] = json.loads(proc.stdout.strip().splitlines()[-1])
+        vectors[name] = np.load(output_path)
+
+    print(f"\n{'backend':<24}{'load s':>8}{'peak MB':>10}{'texts/s':>10}{'mean cos':>10}{'min cos':>9}{'NN agree':>10}")
+    failed = False
+    for name, stats in results.items():
+        parity = {}
+        if name != REFERENCE_BACKEND and REFERENCE_BACKEND in vectors:
+            parity = cosine_agreement(vectors[REFERENCE_BACKEND], vectors[name])
+            failed = failed or parity["min_cosine"] < args.min_cosine
+        print(f"{name:<24}{stats['load_seconds']:>8}{str(stats['peak_rss_mb']):>10}{str(stats['texts_per_second']):>10}"
+              f"{str(parity.get('mean_cosine', '-')):>10}{str(parity.get('min_cosine', '-')):>9}{str(parity.get('nn_agreement', '-')):>10}")
+
+    if REFERENCE_BACKEND not in vectors:
+        print(f"\n[Benchmark] PARITY NOT CHECKED: reference backend '{REFERENCE_BACKEND}' unavailable")
+        return 1
+    if failed:
+        print(f"\n[Benchmark] PARITY FAILED: min cosine below {args.min_cosine}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
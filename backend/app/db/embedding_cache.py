@@ -0,0 +1,193 @@
+"""
+Embedding Cache - Content-addressed cache in front of the sentence-transformer
+Key = model name + sha256 of the text. Embeddings are deterministic, so entries never expire.
+Two tiers: in-memory LRU, then optional SQLite on disk (survives restarts).
+"""
+import os
+import asyncio
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+import numpy as np
+
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "4096"))
+EMBEDDING_CACHE_DISK = os.getenv("EMBEDDING_CACHE_DISK", "true").lower() in ("1", "true", "yes")
+EMBEDDING_CACHE_DB = os.getenv(
+    "EMBEDDING_CACHE_DB",
+    str(Path(__file__).resolve().parent.parent.parent / ".cache" / "embedding_cache.sqlite3")
+)
+
+
+def make_key(model_name: str, text: str) -> str:
+    """Content-addressed key for one embedding"""
+    return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Two-tier (memory LRU + SQLite) embedding cache with hit-rate counters"""
+
+    def __init__(self, max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES, db_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "encoded": 0}
+        self._db: Optional[sqlite3.Connection] = None
+
+        if db_path:
+            try:
+                Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+                self._db = sqlite3.connect(db_path, check_same_thread=False)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute("""
+                    CREATE TABLE IF NOT EXISTS embedding_cache (
+                        key TEXT PRIMARY KEY,
+                        model TEXT NOT NULL,
+                        dim INTEGER NOT NULL,
+                        vector BLOB NOT NULL
+                    )
+                """)
+                self._db.commit()
+            except Exception as e:
+                print(f"[EmbeddingCache] Disk tier disabled: {e}")
+                self._db = None
+
+    def _remember(self, key: str, vector: np.ndarray):
+        vector.setflags(write=False)  # Shared between callers
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _lookup(self, key: str) -> Optional[np.ndarray]:
+        vector = self._memory.get(key)
+        if vector is not None:
+            self._memory.move_to_end(key)
+            self._stats["memory_hits"] += 1
+            return vector
+
+        if self._db is not None:
+            try:
+                row = self._db.execute("SELECT vector FROM embedding_cache WHERE key = ?", (key,)).fetchone()
+            except sqlite3.Error as e:
+                print(f"[EmbeddingCache] Disk read failed: {e}")
+                row = None
+            if row:
+                vector = np.frombuffer(row[0], dtype=np.float32).copy()
+                self._remember(key, vector)
+                self._stats["disk_hits"] += 1
+                return vector
+
+        self._stats["misses"] += 1
+        return None
+
+    def _split(self, keys: List[str], texts: Sequence[str]):
+        """(found {key: vector}, missing {key: text}) for distinct keys"""
+        found: Dict[str, np.ndarray] = {}
+        missing: Dict[str, str] = {}
+        with self._lock:
+            for key, text in zip(keys, texts):
+                if key in found or key in missing:
+                    continue
+                vector = self._lookup(key)
+                if vector is None:
+                    missing[key] = text
+                else:
+                    found[key] = vector
+        return found, missing
+
+    def _store(self, model_name: str, missing: Dict[str, str], encoded: np.ndarray, found: Dict[str, np.ndarray]):
+        """Remember freshly encoded vectors (memory + disk) and add them to found"""
+        with self._lock:
+            self._stats["encoded"] += len(missing)
+            rows = []
+            for key, vector in zip(missing.keys(), encoded):
+                vector = vector.copy()
+                self._remember(key, vector)
+                found[key] = vector
+                rows.append((key, model_name, len(vector), vector.tobytes()))
+            if self._db is not None:
+                try:
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO embedding_cache (key, model, dim, vector) VALUES (?, ?, ?, ?)",
+                        rows
+                    )
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    print(f"[EmbeddingCache] Disk write failed: {e}")
+
+    @staticmethod
+    def _rows(keys: List[str], found: Dict[str, np.ndarray]) -> np.ndarray:
+        return np.stack([found[key] for key in keys]) if keys else np.empty((0, 0), dtype=np.float32)
+
+    def encode(
+        self,
+        texts: Sequence[str],
+        model_name: str,
+        encode_fn: Callable[[List[str]], np.ndarray]
+    ) -> np.ndarray:
+        """
+        Embeddings for texts (rows in input order).
+        Only uncached distinct texts are passed to encode_fn, in one batch.
+        """
+        keys = [make_key(model_name, t) for t in texts]
+        found, missing = self._split(keys, texts)
+        if missing:
+            encoded = np.asarray(encode_fn(list(missing.values())), dtype=np.float32)
+            self._store(model_name, missing, encoded, found)
+        return self._rows(keys, found)
+
+    async def aencode(
+        self,
+        texts: Sequence[str],
+        model_name: str,
+        encode_fn: Callable[[List[str]], Awaitable[np.ndarray]]
+    ) -> np.ndarray:
+        """encode() for async callers: SQLite lookups/writes in a thread, misses awaited on encode_fn"""
+        keys = [make_key(model_name, t) for t in texts]
+        found, missing = await asyncio.to_thread(self._split, keys, texts)
+        if missing:
+            encoded = np.asarray(await encode_fn(list(missing.values())), dtype=np.float32)
+            await asyncio.to_thread(self._store, model_name, missing, encoded, found)
+        return self._rows(keys, found)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM embedding_cache")
+                self._db.commit()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counts = dict(self._stats)
+            entries = len(self._memory)
+        hits = counts["memory_hits"] + counts["disk_hits"]
+        lookups = hits + counts["misses"]
+        return {
+            "memory_entries": entries,
+            "disk_tier": self._db is not None,
+            **counts,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+_embedding_cache: Optional[EmbeddingCache] = None
+_init_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Lazy load the process-wide embedding cache"""
+    global _embedding_cache
+    if _embedding_cache is None:
+        with _init_lock:
+            if _embedding_cache is None:
+                _embedding_cache = EmbeddingCache(db_path=EMBEDDING_CACHE_DB if EMBEDDING_CACHE_DISK else None)
+    return _embedding_cache
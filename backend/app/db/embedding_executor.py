@@ -0,0 +1,210 @@
+"""
+Embedding Executor - Micro-batches concurrent encode requests on one worker thread
+Requests arriving within EMBEDDING_BATCH_WAIT_MS of each other share one model call.
+Usable from sync (encode) and async (aencode) code; the queue is bounded and submitters
+wait when it is full (async callers in a thread, never on the event loop).
+The first model call (load / download) gets EMBEDDING_WARMUP_TIMEOUT instead of the per-call timeout.
+"""
+import os
+import math
+import time
+import queue
+import asyncio
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+import numpy as np
+
+EMBEDDING_BATCH_MAX_SIZE = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "64"))  # Texts per model call
+EMBEDDING_BATCH_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_WAIT_MS", "5"))  # Collect window after the first request
+EMBEDDING_QUEUE_MAX = int(os.getenv("EMBEDDING_QUEUE_MAX", "256"))  # Pending requests
+EMBEDDING_QUEUE_TIMEOUT = float(os.getenv("EMBEDDING_QUEUE_TIMEOUT", "30"))  # Seconds to wait for a slot / result (per batch)
+EMBEDDING_WARMUP_TIMEOUT = float(os.getenv("EMBEDDING_WARMUP_TIMEOUT", "600"))  # Until the first model call finishes
+
+
+class EmbeddingQueueFull(RuntimeError):
+    """The executor queue stayed full for EMBEDDING_QUEUE_TIMEOUT seconds"""
+
+
+_STOP = object()
+
+
+class EmbeddingExecutor:
+    """Single worker thread that coalesces concurrent encode requests into batches"""
+
+    def __init__(
+        self,
+        encode_fn: Callable[[List[str]], np.ndarray],
+        max_batch_size: int = EMBEDDING_BATCH_MAX_SIZE,
+        max_wait_ms: float = EMBEDDING_BATCH_WAIT_MS,
+        max_queue: int = EMBEDDING_QUEUE_MAX,
+        timeout: float = EMBEDDING_QUEUE_TIMEOUT,
+        warmup_timeout: float = EMBEDDING_WARMUP_TIMEOUT,
+    ):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.timeout = timeout
+        self.warmup_timeout = warmup_timeout
+        # Set once a model call has succeeded (the model is loaded)
+        self._warm = threading.Event()
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max(1, max_queue))
+        # Request (or stop marker) pulled from the queue that did not fit the previous batch
+        self._carry = None
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "requests": 0, "texts": 0, "batches": 0, "errors": 0, "rejected": 0,
+            "max_batch_texts": 0, "max_batch_requests": 0,
+            "wait_ms_total": 0.0, "max_wait_ms": 0.0, "encode_ms_total": 0.0,
+        }
+        self._thread = threading.Thread(target=self._run, name="embedding-executor", daemon=True)
+        self._thread.start()
+
+    # --- Submission ---
+    def _enqueue(self, texts: List[str], timeout: float) -> Optional[Future]:
+        """Queue a request; None if no slot frees up within timeout"""
+        future: Future = Future()
+        if not texts:
+            future.set_result(np.empty((0, 0), dtype=np.float32))
+            return future
+        try:
+            self._queue.put((texts, future, time.perf_counter()), timeout=timeout)
+        except queue.Full:
+            return None
+        return future
+
+    def submit(self, texts: Sequence[str]) -> Future:
+        """Queue texts for encoding; the future resolves to their rows (input order)"""
+        future = self._enqueue(list(texts), self.timeout)
+        if future is None:
+            with self._stats_lock:
+                self._stats["rejected"] += 1
+            raise EmbeddingQueueFull(f"Embedding queue full ({self._queue.maxsize} pending requests)")
+        return future
+
+    def _result_timeout(self, count: int) -> float:
+        """Cold start: long enough to load the model; afterwards one timeout per batch the request spans"""
+        if not self._warm.is_set():
+            return self.warmup_timeout
+        return self.timeout * math.ceil(max(1, count) / self.max_batch_size)
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        """Blocking encode"""
+        future = self.submit(texts)
+        try:
+            return future.result(timeout=self._result_timeout(len(texts)))
+        except FutureTimeoutError:
+            future.cancel()  # Skipped by the worker if not started yet
+            raise
+
+    async def aencode(self, texts: Sequence[str]) -> np.ndarray:
+        """Awaitable encode - no thread is held while waiting for the batch"""
+        texts = list(texts)
+        future = self._enqueue(texts, 0) or await asyncio.to_thread(self.submit, texts)
+        # Timing out cancels the wrapped future too (skipped by the worker if not started yet)
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout=self._result_timeout(len(texts)))
+
+    # --- Worker ---
+    def _next_request(self, timeout: Optional[float]):
+        if self._carry is not None:
+            item, self._carry = self._carry, None
+            return item
+        return self._queue.get(timeout=timeout) if timeout is not None else self._queue.get()
+
+    def _collect(self, first) -> List[Tuple[List[str], Future, float]]:
+        """First request plus whatever arrives within the wait window (up to max_batch_size texts)"""
+        batch = [first]
+        size = len(first[0])
+        deadline = time.perf_counter() + self.max_wait
+        while size < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._next_request(remaining)
+            except queue.Empty:
+                break
+            if item is _STOP or size + len(item[0]) > self.max_batch_size:
+                # Handled on the next loop (stop after finishing this batch)
+                self._carry = item
+                break
+            batch.append(item)
+            size += len(item[0])
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._next_request(None)
+            if first is _STOP:
+                return
+            batch = self._collect(first)
+            # Cancelled futures (caller timed out) are dropped
+            batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            started = time.perf_counter()
+            texts = [text for item in batch for text in item[0]]
+            try:
+                vectors = np.asarray(self.encode_fn(texts), dtype=np.float32)
+                self._warm.set()
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                with self._stats_lock:
+                    self._stats["errors"] += 1
+                continue
+            finished = time.perf_counter()
+
+            offset = 0
+            for item_texts, future, _ in batch:
+                future.set_result(vectors[offset:offset + len(item_texts)])
+                offset += len(item_texts)
+
+            waits = [(started - enqueued) * 1000 for _, _, enqueued in batch]
+            with self._stats_lock:
+                s = self._stats
+                s["requests"] += len(batch)
+                s["texts"] += len(texts)
+                s["batches"] += 1
+                s["max_batch_texts"] = max(s["max_batch_texts"], len(texts))
+                s["max_batch_requests"] = max(s["max_batch_requests"], len(batch))
+                s["wait_ms_total"] += sum(waits)
+                s["max_wait_ms"] = max(s["max_wait_ms"], max(waits))
+                s["encode_ms_total"] += (finished - started) * 1000
+
+    def close(self, timeout: float = 5.0):
+        """Finish queued requests, then stop the worker"""
+        if not self._thread.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            s = dict(self._stats)
+        batches, requests = s["batches"], s["requests"]
+        return {
+            "requests": requests,
+            "texts": s["texts"],
+            "batches": batches,
+            "errors": s["errors"],
+            "rejected": s["rejected"],
+            "warm": self._warm.is_set(),
+            "queue_depth": self._queue.qsize(),
+            "avg_batch_texts": round(s["texts"] / batches, 2) if batches else 0.0,
+            "avg_batch_requests": round(requests / batches, 2) if batches else 0.0,
+            "max_batch_texts": s["max_batch_texts"],
+            "max_batch_requests": s["max_batch_requests"],
+            "avg_wait_ms": round(s["wait_ms_total"] / requests, 2) if requests else 0.0,
+            "max_wait_ms": round(s["max_wait_ms"], 2),
+            "avg_encode_ms": round(s["encode_ms_total"] / batches, 2) if batches else 0.0,
+        }
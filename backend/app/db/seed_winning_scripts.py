@@ -7,8 +7,6 @@ Usage:
     python -m app.db.seed_winning_scripts
 """
 
-from app.db.storage import add_script_to_db
-from app.utils.skeleton_utils import generate_skeleton
 from app.schemas.enums import ScriptMode, HookType
 
 
@@ -1985,50 +1983,26 @@ Follow for more on the battle shaping our AI future."""
 ]
 
 
+def extract_seed_hook(content: str) -> str:
+    """First quoted hook under 'HOOK 1:' ("" if the script has none)"""
+    hook_start = content.find('HOOK 1:\n"') + 9
+    hook_end = content.find('"', hook_start)
+    return content[hook_start:hook_end] if hook_start > 8 else ""
+
+
 def seed_database():
-    """Seed the vector database with winning scripts."""
+    """Seed the vector database with winning scripts (batched, resumable - see bulk_ingest)."""
+    from app.db.bulk_ingest import ingest
+
     print("\n" + "="*60)
     print("   SEEDING VECTOR DATABASE WITH WINNING SCRIPTS")
     print("="*60 + "\n")
 
-    success_count = 0
-    fail_count = 0
-
-    for i, script in enumerate(WINNING_SCRIPTS, 1):
-        try:
-            # Extract hook from content
-            hook_start = script["content"].find('HOOK 1:\n"') + 9
-            if hook_start == 8:  # Not found with newline
-                hook_start = script["content"].find('HOOK 1:\n"') + 9
-            hook_end = script["content"].find('"', hook_start)
-            hook_text = script["content"][hook_start:hook_end] if hook_start > 8 else ""
-
-            # Generate skeleton
-            skeleton_text = generate_skeleton(script["content"])
-
-            # Convert strings to enums
-            mode_enum = MODE_MAP.get(script["mode"], ScriptMode.INFORMATIONAL)
-            hook_type_enum = HOOK_TYPE_MAP.get(script["hook_type"], HookType.SHOCK)
-
-            # Add to database
-            script_id = add_script_to_db(
-                title=script["title"],
-                full_text=script["content"],
-                mode=mode_enum,
-                hook_type=hook_type_enum,
-                skeleton_text=skeleton_text,
-                hook_text=hook_text
-            )
-            print(f"[{i:02d}/37] OK: {script['title']}")
-            success_count += 1
-
-        except Exception as e:
-            print(f"[{i:02d}/37] FAIL: {script['title']} - {str(e)[:50]}")
-            fail_count += 1
+    stats = ingest(["seed"])
 
     print("\n" + "="*60)
     print(f"   SEEDING COMPLETE")
-    print(f"   Success: {success_count} | Failed: {fail_count} | Total: {len(WINNING_SCRIPTS)}")
+    print(f"   Success: {stats['ingested']} | Skipped: {stats['skipped']} | Failed: {stats['failed']} | Total: {len(WINNING_SCRIPTS)}")
     print("="*60 + "\n")
 
 
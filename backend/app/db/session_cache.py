@@ -0,0 +1,128 @@
+"""
+Session Cache - In-process read-through cache for the chat path
+Holds, per session id, each chat-edited script row and its messages.
+SessionService writes update it (write-through) or drop it (invalidation).
+Entries expire after SESSION_CACHE_TTL_SECONDS to bound staleness from other processes.
+"""
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+SESSION_CACHE_MAX_ENTRIES = int(os.getenv("SESSION_CACHE_MAX_ENTRIES", "256"))  # Sessions
+SESSION_CACHE_TTL_SECONDS = float(os.getenv("SESSION_CACHE_TTL_SECONDS", "300"))
+
+
+class SessionCache:
+    """LRU of {session_id: {script_number: {"script": row, "chat_history": [messages]}}}"""
+
+    def __init__(self, max_entries: int = SESSION_CACHE_MAX_ENTRIES, ttl: float = SESSION_CACHE_TTL_SECONDS):
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        # Bumped on every write so a read that raced a write is not cached
+        self._versions: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "fills": 0, "stale_fills": 0, "invalidations": 0}
+
+    def _entry(self, session_id: str) -> Optional[Dict]:
+        entry = self._entries.get(session_id)
+        if entry is None:
+            return None
+        if entry["expires_at"] < time.time():
+            del self._entries[session_id]
+            return None
+        self._entries.move_to_end(session_id)
+        return entry
+
+    def _bump(self, session_id: str):
+        self._versions[session_id] = self._versions.get(session_id, 0) + 1
+        self._versions.move_to_end(session_id)
+        while len(self._versions) > self.max_entries * 4:
+            self._versions.popitem(last=False)
+
+    # --- Reads ---
+    def version(self, session_id: str) -> int:
+        """Take before a database read; pass to put_script"""
+        with self._lock:
+            return self._versions.get(session_id, 0)
+
+    def get_script(self, session_id: str, script_number: int) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entry(session_id)
+            cached = entry["scripts"].get(script_number) if entry else None
+            if cached is None:
+                self._stats["misses"] += 1
+                return None
+            self._stats["hits"] += 1
+            # Copies - callers may mutate what they get back
+            return {"script": dict(cached["script"]), "chat_history": list(cached["chat_history"])}
+
+    def put_script(self, session_id: str, script_number: int, script: Dict, chat_history: List[Dict], version: int):
+        with self._lock:
+            if self._versions.get(session_id, 0) != version:
+                self._stats["stale_fills"] += 1
+                return
+            entry = self._entry(session_id)
+            if entry is None:
+                entry = {"scripts": {}, "expires_at": time.time() + self.ttl}
+                self._entries[session_id] = entry
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            entry["scripts"][script_number] = {"script": dict(script), "chat_history": list(chat_history)}
+            self._stats["fills"] += 1
+
+    # --- Writes ---
+    def append_message(self, session_id: str, script_number: int, message: Dict):
+        """Write-through for a stored chat message"""
+        with self._lock:
+            self._bump(session_id)
+            entry = self._entry(session_id)
+            cached = entry["scripts"].get(script_number) if entry else None
+            if cached is not None:
+                cached["chat_history"].append(dict(message))
+
+    def update_script(self, session_id: str, script_number: int, fields: Dict):
+        """Write-through for stored script fields"""
+        with self._lock:
+            self._bump(session_id)
+            entry = self._entry(session_id)
+            cached = entry["scripts"].get(script_number) if entry else None
+            if cached is not None:
+                cached["script"].update(fields)
+
+    def invalidate(self, session_id: str):
+        with self._lock:
+            self._bump(session_id)
+            if self._entries.pop(session_id, None) is not None:
+                self._stats["invalidations"] += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counts = dict(self._stats)
+            entries = len(self._entries)
+        lookups = counts["hits"] + counts["misses"]
+        return {
+            "sessions": entries,
+            **counts,
+            "hit_rate": round(counts["hits"] / lookups, 3) if lookups else 0.0,
+        }
+
+
+_session_cache: Optional[SessionCache] = None
+_init_lock = threading.Lock()
+
+
+def get_session_cache() -> SessionCache:
+    """Lazy load the process-wide session cache"""
+    global _session_cache
+    if _session_cache is None:
+        with _init_lock:
+            if _session_cache is None:
+                _session_cache = SessionCache()
+    return _session_cache
@@ -3,13 +3,24 @@ Session Service - Manages session persistence with Supabase
 Handles sessions, scripts, files, and chat messages
 """
 import os
-from typing import List, Dict, Optional
+import json
+import base64
+import uuid
+import asyncio
+import functools
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Dict, Optional, Sequence, Tuple
 from datetime import datetime
 from dotenv import load_dotenv
 
 load_dotenv()
 
-from supabase import create_client, Client
+from supabase import create_client, Client, ClientOptions
+from app.db.session_cache import get_session_cache
+from app.db.chat_writer import ChatTurnWriter
+from app.utils.script_delta import make_delta, apply_chain
 from app.utils.logger import get_logger
 
 # Initialize logger
@@ -19,10 +30,21 @@ log = get_logger("SessionDB", "💾")
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 
+# Per-call timeout (HTTP request + wait for a worker) and max concurrent DB calls
+SESSION_DB_TIMEOUT = float(os.getenv("SESSION_DB_TIMEOUT", "10"))
+SESSION_DB_MAX_WORKERS = int(os.getenv("SESSION_DB_MAX_WORKERS", "8"))
+# Read-your-writes wait for queued chat turns - kept well inside the per-call timeout it runs under
+SESSION_SETTLE_TIMEOUT = min(float(os.getenv("SESSION_SETTLE_TIMEOUT", "3")), SESSION_DB_TIMEOUT / 2)
+
+# One client for the whole process - its HTTP connection pool is shared by all DB worker threads
 supabase: Optional[Client] = None
 if SUPABASE_URL and SUPABASE_KEY:
     try:
-        supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+        supabase = create_client(
+            SUPABASE_URL,
+            SUPABASE_KEY,
+            options=ClientOptions(postgrest_client_timeout=SESSION_DB_TIMEOUT)
+        )
         log.success("Supabase client initialized", {"url": SUPABASE_URL[:30] + "..."})
     except Exception as e:
         log.error(f"Supabase init failed: {str(e)}")
@@ -30,6 +52,178 @@ else:
     log.warn("Supabase not configured - session persistence disabled")
 
 
+# Related data get_session can embed: part name -> table
+SESSION_PARTS = {
+    "files": "session_files",
+    "scripts": "session_scripts",
+    "chat": "chat_messages",
+}
+SESSION_PARTS_ALL = tuple(SESSION_PARTS)
+
+# Keyset pagination (created_at, id): page sizes and the per-script chat window in get_session
+SESSION_PAGE_SIZE = int(os.getenv("SESSION_PAGE_SIZE", "50"))
+CHAT_PAGE_SIZE = int(os.getenv("CHAT_PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = 200
+SCRIPT_NUMBERS = (1, 2, 3)
+
+# Script revisions: a full snapshot every N revisions, deltas in between
+# (rebuilding any revision applies at most N-1 deltas)
+SCRIPT_SNAPSHOT_INTERVAL = int(os.getenv("SCRIPT_SNAPSHOT_INTERVAL", "10"))
+
+# What the chat path needs: the session id, one script and its messages (no file bodies)
+SCRIPT_CONTEXT_COLUMNS = {
+    "session": "id",
+    "scripts": "script_number, script_content, angle_name, angle_focus, angle_hook_style, revision",
+    "chat": "id, script_number, role, content, revision, created_at",
+}
+
+
+def encode_cursor(row: Dict) -> Optional[str]:
+    """Opaque cursor pointing just past a row (its created_at + id)"""
+    if not row.get("created_at") or not row.get("id"):
+        return None
+    raw = json.dumps([row["created_at"], row["id"]]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """(created_at, id) from a cursor - ValueError if it is malformed"""
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        # Both values end up inside a PostgREST filter - only accept a timestamp and a uuid
+        datetime.fromisoformat(str(created_at).replace("Z", "+00:00"))
+        row_id = str(uuid.UUID(str(row_id)))
+        return str(created_at), row_id
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def _older_than(cursor: str) -> str:
+    """PostgREST or-filter for rows after cursor in (created_at DESC, id DESC) order"""
+    created_at, row_id = decode_cursor(cursor)
+    return f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt."{row_id}")'
+
+
+def _page_size(limit: int, default: int) -> int:
+    return max(1, min(limit or default, MAX_PAGE_SIZE))
+
+
+def _chat_alias(script_number: int) -> str:
+    return f"chat_{script_number}"
+
+
+# --- Write-behind for chat turns ---
+# Set once the database turns out not to have persist_chat_turns (schema not migrated)
+_chat_turns_rpc_missing = False
+
+# Turns the writer gave up on, per session, until the session's next chat response reports them
+FAILED_TURNS_MAX_SESSIONS = 256
+FAILED_TURNS_PER_SESSION = 20
+_failed_chat_turns: "OrderedDict[str, List[Dict]]" = OrderedDict()
+_failed_chat_turns_lock = threading.Lock()
+
+
+def _is_missing_function(error: Exception) -> bool:
+    text = str(error)
+    return "PGRST202" in text or "Could not find the function" in text
+
+
+def _persist_chat_turn_legacy(turn: Dict):
+    """Pre-migration write path (what /chat did before persist_chat_turns): script overwrite + message inserts"""
+    session_id, script_number = turn["session_id"], turn["script_number"]
+    base_revision = turn["base_revision"] or None
+    revision = base_revision
+    if "script" in turn:
+        revision = SessionService.update_script(session_id, script_number, turn["script"]["script_content"])
+        if revision is None:
+            raise RuntimeError("Script update failed")
+    rows = []
+    for message in turn["messages"]:
+        row = {"session_id": session_id, "script_number": script_number, **message}
+        message_revision = base_revision if message["role"] == "user" else revision
+        if message_revision:
+            row["revision"] = message_revision
+        rows.append(row)
+    supabase.table("chat_messages").insert(rows).execute()
+    # Revision numbers may differ from the ones predicted into the cache
+    get_session_cache().invalidate(session_id)
+    return revision
+
+
+def _persist_chat_turns(turns: List[Dict]) -> List[Optional[int]]:
+    """One transactional RPC for a batch of turns (runs on the chat writer thread)"""
+    global _chat_turns_rpc_missing
+    if not _chat_turns_rpc_missing:
+        payload = [{k: v for k, v in turn.items() if k != "predicted_revision"} for turn in turns]
+        try:
+            result = supabase.rpc("persist_chat_turns", {"p_turns": payload}).execute()
+        except Exception as e:
+            if not _is_missing_function(e):
+                raise
+            log.warn("persist_chat_turns not found (run supabase_schema.sql) - writing chat turns one by one")
+            _chat_turns_rpc_missing = True
+        else:
+            revisions = result.data or []
+            for turn, revision in zip(turns, revisions):
+                predicted = turn.get("predicted_revision")
+                if predicted and revision != predicted:
+                    # Head moved under us - the cached revision number is wrong
+                    get_session_cache().invalidate(turn["session_id"])
+            log.db_result("RPC", "persist_chat_turns", len(turns))
+            return revisions
+
+    # Not transactional: a failed turn is reported here (a writer retry would duplicate the ones before it)
+    revisions = []
+    for turn in turns:
+        try:
+            revisions.append(_persist_chat_turn_legacy(turn))
+        except Exception as e:
+            log.error(f"Chat turn write failed for session {turn['session_id'][:8]}: {str(e)[:100]}")
+            _chat_turn_failed(turn)
+            revisions.append(None)
+    log.db_result("INSERT", "chat_messages", len(turns))
+    return revisions
+
+
+def _chat_turn_failed(turn: Dict):
+    """The cache already shows this turn - drop it, and keep the turn so the caller learns it was not saved"""
+    session_id = turn["session_id"]
+    get_session_cache().invalidate(session_id)
+    with _failed_chat_turns_lock:
+        failed = _failed_chat_turns.setdefault(session_id, [])
+        failed.append({"script_number": turn["script_number"], "messages": turn["messages"]})
+        del failed[:-FAILED_TURNS_PER_SESSION]
+        _failed_chat_turns.move_to_end(session_id)
+        while len(_failed_chat_turns) > FAILED_TURNS_MAX_SESSIONS:
+            _failed_chat_turns.popitem(last=False)
+
+
+_chat_writer: Optional[ChatTurnWriter] = None
+_chat_writer_lock = threading.Lock()
+
+
+def get_chat_writer() -> ChatTurnWriter:
+    """Lazy start the write-behind thread for chat turns"""
+    global _chat_writer
+    if _chat_writer is None:
+        with _chat_writer_lock:
+            if _chat_writer is None:
+                _chat_writer = ChatTurnWriter(_persist_chat_turns, _chat_turn_failed)
+    return _chat_writer
+
+
+def close_chat_writer():
+    """Flush queued chat turns (server shutdown)"""
+    if _chat_writer is not None:
+        _chat_writer.close()
+
+
+def _settle(session_id: str):
+    """Read-your-writes: wait for queued chat turns of a session before reading it from the database"""
+    if _chat_writer is not None and not _chat_writer.wait_idle(session_id, SESSION_SETTLE_TIMEOUT):
+        log.warn(f"Chat turns for {session_id[:8]} still queued - reading anyway")
+
+
 class SessionService:
     """Manages session data in Supabase"""
 
@@ -73,52 +267,94 @@ class SessionService:
             return None
 
     @staticmethod
-    def get_session(session_id: str) -> Optional[Dict]:
-        """Get a session by ID with all related data"""
+    def _session_query(
+        parts: Sequence[str] = SESSION_PARTS_ALL,
+        columns: Optional[Dict[str, str]] = None,
+        script_number: Optional[int] = None
+    ):
+        """
+        sessions select with related rows embedded (PostgREST resource embedding via the FKs).
+        columns: select list per part, plus "session" for the session row itself.
+        script_number: only that script's row and chat messages.
+        Chat is embedded once per script (aliased), each capped to the latest CHAT_PAGE_SIZE messages.
+        """
+        columns = columns or {}
+        script_numbers = SCRIPT_NUMBERS if script_number is None else (script_number,)
+        select = [columns.get("session", "*")]
+        for part in parts:
+            if part == "chat":
+                select.extend(
+                    f"{_chat_alias(n)}:chat_messages({columns.get(part, '*')})" for n in script_numbers
+                )
+            else:
+                select.append(f"{SESSION_PARTS[part]}({columns.get(part, '*')})")
+
+        query = supabase.table("sessions").select(", ".join(select))
+        if "scripts" in parts:
+            query = query.order("script_number", foreign_table="session_scripts")
+            if script_number is not None:
+                query = query.eq("session_scripts.script_number", script_number)
+        if "chat" in parts:
+            for n in script_numbers:
+                alias = _chat_alias(n)
+                query = (
+                    query.eq(f"{alias}.script_number", n)
+                    .order("created_at", desc=True, foreign_table=alias)
+                    .order("id", desc=True, foreign_table=alias)
+                    .limit(CHAT_PAGE_SIZE + 1, foreign_table=alias)
+                )
+        return query
+
+    @staticmethod
+    def _shape_session(session: Dict, parts: Sequence[str]) -> Dict:
+        """Rename embedded tables to the response keys (files, scripts, chat_history by script)"""
+        if "files" in parts:
+            session["files"] = session.pop("session_files", None) or []
+        if "scripts" in parts:
+            session["scripts"] = session.pop("session_scripts", None) or []
+        if "chat" in parts:
+            # Latest window per script, oldest first; chat_cursors pages further back via get_chat_history
+            chat_by_script = {n: [] for n in SCRIPT_NUMBERS}
+            cursors = {}
+            for n in SCRIPT_NUMBERS:
+                rows = session.pop(_chat_alias(n), None)
+                if rows is None:
+                    continue
+                window = rows[:CHAT_PAGE_SIZE]
+                cursors[n] = encode_cursor(window[-1]) if len(rows) > CHAT_PAGE_SIZE else None
+                chat_by_script[n] = window[::-1]
+            session["chat_history"] = chat_by_script
+            session["chat_cursors"] = cursors
+        return session
+
+    @staticmethod
+    def get_session(
+        session_id: str,
+        parts: Sequence[str] = SESSION_PARTS_ALL,
+        columns: Optional[Dict[str, str]] = None,
+        script_number: Optional[int] = None
+    ) -> Optional[Dict]:
+        """
+        Get a session and the requested related data (files, scripts, chat) in one request.
+        See _session_query for the projection arguments.
+        """
         if not supabase:
             return None
 
-        log.db_query("SELECT", "sessions", {"id": session_id[:8]})
+        log.db_query("SELECT", "sessions", {"id": session_id[:8], "parts": list(parts)})
 
+        _settle(session_id)
         try:
-            # Get session
-            result = supabase.table("sessions").select("*").eq("id", session_id).execute()
+            result = SessionService._session_query(parts, columns, script_number).eq("id", session_id).execute()
             if not result.data:
                 log.warn(f"Session not found: {session_id[:8]}")
                 return None
 
-            session = result.data[0]
-            log.debug(f"Session found: {session_id[:8]}")
-
-            # Get files
-            log.db_query("SELECT", "session_files", {"session_id": session_id[:8]})
-            files_result = supabase.table("session_files").select("*").eq("session_id", session_id).execute()
-            session["files"] = files_result.data or []
-            log.debug(f"Files loaded: {len(session['files'])}")
-
-            # Get scripts
-            log.db_query("SELECT", "session_scripts", {"session_id": session_id[:8]})
-            scripts_result = supabase.table("session_scripts").select("*").eq("session_id", session_id).order("script_number").execute()
-            session["scripts"] = scripts_result.data or []
-            log.debug(f"Scripts loaded: {len(session['scripts'])}")
-
-            # Get chat messages for all scripts
-            log.db_query("SELECT", "chat_messages", {"session_id": session_id[:8]})
-            chat_result = supabase.table("chat_messages").select("*").eq("session_id", session_id).order("created_at").execute()
-            # Group by script_number
-            chat_by_script = {1: [], 2: [], 3: []}
-            for msg in (chat_result.data or []):
-                script_num = msg.get("script_number", 1)
-                if script_num in chat_by_script:
-                    chat_by_script[script_num].append(msg)
-            session["chat_history"] = chat_by_script
-            total_messages = sum(len(msgs) for msgs in chat_by_script.values())
-            log.debug(f"Chat messages loaded: {total_messages}")
-
+            session = SessionService._shape_session(result.data[0], parts)
             log.success(f"Session loaded: {session_id[:8]}", {
-                "files": len(session["files"]),
-                "scripts": len(session["scripts"]),
-                "messages": total_messages
+                "files": len(session.get("files", [])),
+                "scripts": len(session.get("scripts", [])),
+                "messages": sum(len(msgs) for msgs in session.get("chat_history", {}).values())
             })
             return session
         except Exception as e:
@@ -126,21 +362,61 @@ class SessionService:
             return None
 
     @staticmethod
-    def list_sessions(limit: int = 50) -> List[Dict]:
-        """List all sessions, most recent first"""
+    def get_script_context(session_id: str, script_number: int) -> Optional[Dict]:
+        """
+        One script row and its chat messages (read-through session cache).
+        None if the session does not exist; "script" is None if it has no such script.
+        """
+        cache = get_session_cache()
+        cached = cache.get_script(session_id, script_number)
+        if cached is not None:
+            log.debug(f"Script context cache hit: {session_id[:8]}/{script_number}")
+            return cached
+
+        version = cache.version(session_id)
+        session = SessionService.get_session(
+            session_id,
+            parts=("scripts", "chat"),
+            columns=SCRIPT_CONTEXT_COLUMNS,
+            script_number=script_number
+        )
+        if not session:
+            return None
+
+        script = session["scripts"][0] if session["scripts"] else None
+        chat_history = session["chat_history"].get(script_number, [])
+        if script is not None:
+            cache.put_script(session_id, script_number, script, chat_history, version)
+        return {"script": script, "chat_history": chat_history}
+
+    @staticmethod
+    def list_sessions(limit: int = SESSION_PAGE_SIZE, cursor: Optional[str] = None) -> Dict:
+        """
+        One page of sessions, most recent first (keyset on created_at, id).
+        Returns {"sessions": [...], "next_cursor": str | None}; ValueError on a bad cursor.
+        """
+        limit = _page_size(limit, SESSION_PAGE_SIZE)
+        keyset = _older_than(cursor) if cursor else None
         if not supabase:
-            return []
+            return {"sessions": [], "next_cursor": None}
 
-        log.db_query("SELECT", "sessions", {"limit": limit})
+        log.db_query("SELECT", "sessions", {"limit": limit, "cursor": bool(cursor)})
 
         try:
-            result = supabase.table("sessions").select("id, topic, mode, created_at, updated_at").order("created_at", desc=True).limit(limit).execute()
-            sessions = result.data or []
+            query = supabase.table("sessions").select("id, topic, mode, created_at, updated_at")
+            if keyset:
+                query = query.or_(keyset)
+            result = query.order("created_at", desc=True).order("id", desc=True).limit(limit + 1).execute()
+            rows = result.data or []
+            sessions = rows[:limit]
             log.db_result("SELECT", "sessions", len(sessions))
-            return sessions
+            return {
+                "sessions": sessions,
+                "next_cursor": encode_cursor(sessions[-1]) if len(rows) > limit else None
+            }
         except Exception as e:
             log.error(f"List sessions failed: {str(e)}")
-            return []
+            return {"sessions": [], "next_cursor": None}
 
     @staticmethod
     def update_session(session_id: str, updates: Dict) -> bool:
@@ -157,6 +433,8 @@ class SessionService:
         except Exception as e:
             log.error(f"Update session failed: {str(e)}")
             return False
+        finally:
+            get_session_cache().invalidate(session_id)
 
     @staticmethod
     def delete_session(session_id: str) -> bool:
@@ -166,6 +444,7 @@ class SessionService:
 
         log.db_query("DELETE", "sessions", {"id": session_id[:8]})
 
+        _settle(session_id)
         try:
             supabase.table("sessions").delete().eq("id", session_id).execute()
             log.db_result("DELETE", "sessions")
@@ -174,6 +453,8 @@ class SessionService:
         except Exception as e:
             log.error(f"Delete session failed: {str(e)}")
             return False
+        finally:
+            get_session_cache().invalidate(session_id)
 
     @staticmethod
     def add_file(
@@ -243,42 +524,155 @@ class SessionService:
             if result.data:
                 log.db_result("UPSERT", "session_scripts")
                 log.success(f"Script {script_number} saved ({len(script_content)} chars)")
-                return result.data[0]
+                script = result.data[0]
+                # Full save starts a new snapshot in the revision chain
+                revision = SessionService._commit_revision(session_id, script_number, None, "snapshot", script_content, script_content)
+                if revision:
+                    script["revision"] = revision
+                get_session_cache().update_script(session_id, script_number, script)
+                return script
+            get_session_cache().invalidate(session_id)
             return None
         except Exception as e:
             log.error(f"Save script failed: {str(e)}")
+            get_session_cache().invalidate(session_id)
+            return None
+
+    @staticmethod
+    def _commit_revision(
+        session_id: str,
+        script_number: int,
+        base_revision: Optional[int],
+        kind: str,
+        content: str,
+        script_content: str
+    ) -> Optional[int]:
+        """Store the next revision + move the script head to it (one RPC). None if the head moved."""
+        try:
+            result = supabase.rpc("commit_script_revision", {
+                "p_session_id": session_id,
+                "p_script_number": script_number,
+                "p_base_revision": base_revision,
+                "p_kind": kind,
+                "p_content": content,
+                "p_script_content": script_content
+            }).execute()
+            return result.data
+        except Exception as e:
+            log.error(f"Commit script revision failed: {str(e)}")
             return None
 
     @staticmethod
-    def update_script(session_id: str, script_number: int, script_content: str) -> bool:
-        """Update just the script content"""
+    def update_script(
+        session_id: str,
+        script_number: int,
+        script_content: str,
+        previous_content: Optional[str] = None,
+        base_revision: int = 0
+    ) -> Optional[int]:
+        """
+        Store a new version of the script as its next revision.
+        With previous_content + base_revision (the version it was edited from), only a delta is stored.
+        Returns the new revision (0 = saved without revision tracking), None on failure.
+        """
         if not supabase:
-            return False
+            return None
 
         log.db_query("UPDATE", "session_scripts", {
             "session_id": session_id[:8],
             "script_number": script_number,
-            "content_len": len(script_content)
+            "content_len": len(script_content),
+            "base_revision": base_revision
         })
 
+        revision = None
+        if previous_content is not None and base_revision > 0 and base_revision % SCRIPT_SNAPSHOT_INTERVAL != 0:
+            delta = make_delta(previous_content, script_content)
+            revision = SessionService._commit_revision(
+                session_id, script_number, base_revision, "delta", delta, script_content
+            )
+            if revision is None:
+                log.warn(f"Script {script_number} head moved past revision {base_revision} - storing a snapshot")
+        if revision is None:
+            revision = SessionService._commit_revision(
+                session_id, script_number, None, "snapshot", script_content, script_content
+            )
+
         try:
-            supabase.table("session_scripts").update({
-                "script_content": script_content
-            }).eq("session_id", session_id).eq("script_number", script_number).execute()
+            if revision is None:
+                # No revision support (schema not migrated) - plain overwrite
+                supabase.table("session_scripts").update({
+                    "script_content": script_content
+                }).eq("session_id", session_id).eq("script_number", script_number).execute()
+                revision = 0
             log.db_result("UPDATE", "session_scripts")
-            return True
+            fields = {"script_content": script_content}
+            if revision:
+                fields["revision"] = revision
+            get_session_cache().update_script(session_id, script_number, fields)
+            return revision
         except Exception as e:
             log.error(f"Update script failed: {str(e)}")
-            return False
+            get_session_cache().invalidate(session_id)
+            return None
+
+    @staticmethod
+    def get_script_revision(session_id: str, script_number: int, revision: int) -> Optional[str]:
+        """Rebuild one stored revision of a script (nearest snapshot + the deltas after it)"""
+        if not supabase or revision < 1:
+            return None
+
+        log.db_query("SELECT", "script_revisions", {
+            "session_id": session_id[:8],
+            "script_number": script_number,
+            "revision": revision
+        })
+        _settle(session_id)
+
+        def fetch(newer_than: int) -> List[Dict]:
+            return (
+                supabase.table("script_revisions").select("revision, kind, content")
+                .eq("session_id", session_id).eq("script_number", script_number)
+                .gt("revision", newer_than).lte("revision", revision)
+                .order("revision", desc=True).execute()
+            ).data or []
+
+        try:
+            # Snapshots are written at least every SCRIPT_SNAPSHOT_INTERVAL revisions
+            rows = fetch(revision - SCRIPT_SNAPSHOT_INTERVAL)
+            if not any(r["kind"] == "snapshot" for r in rows):
+                rows = fetch(0)  # Interval changed since - walk back from the start
+
+            chain = []
+            expected = revision
+            for row in rows:
+                if row["revision"] != expected:
+                    break
+                chain.append(row)
+                if row["kind"] == "snapshot":
+                    break
+                expected -= 1
+            if not chain or chain[-1]["kind"] != "snapshot":
+                log.warn(f"Revision {revision} of script {script_number} not found")
+                return None
+
+            chain.reverse()
+            content = apply_chain(chain[0]["content"], [r["content"] for r in chain[1:]])
+            log.db_result("SELECT", "script_revisions", len(chain))
+            return content
+        except Exception as e:
+            log.error(f"Get script revision failed: {str(e)}")
+            return None
 
     @staticmethod
     def add_chat_message(
         session_id: str,
         script_number: int,
         role: str,
-        content: str
+        content: str,
+        revision: Optional[int] = None
     ) -> Optional[Dict]:
-        """Add a chat message for a specific script"""
+        """Add a chat message for a specific script (revision: the script version it refers to)"""
         if not supabase:
             return None
 
@@ -296,34 +690,132 @@ class SessionService:
                 "role": role,
                 "content": content
             }
+            if revision:
+                data["revision"] = revision
             result = supabase.table("chat_messages").insert(data).execute()
             if result.data:
                 log.db_result("INSERT", "chat_messages")
+                get_session_cache().append_message(session_id, script_number, result.data[0])
                 return result.data[0]
+            get_session_cache().invalidate(session_id)
             return None
         except Exception as e:
             log.error(f"Add chat message failed: {str(e)}")
+            get_session_cache().invalidate(session_id)
             return None
 
     @staticmethod
-    def get_chat_history(session_id: str, script_number: int) -> List[Dict]:
-        """Get chat history for a specific script"""
+    def record_chat_turn(
+        session_id: str,
+        script_number: int,
+        user_message: str,
+        assistant_message: Optional[str] = None,
+        base_revision: int = 0,
+        previous_content: Optional[str] = None,
+        script_content: Optional[str] = None
+    ) -> Optional[int]:
+        """
+        Persist a finished chat turn write-behind: the cache is updated now, the messages
+        and script revision are written by the chat writer in one batched RPC.
+        Returns the script revision the turn produces (base_revision if the script is unchanged),
+        None if the turn could not be queued. Turns that fail later show up in pop_failed_chat_turns.
+        """
+        turn = {
+            "session_id": session_id,
+            "script_number": script_number,
+            "base_revision": base_revision,
+            "messages": [{"role": "user", "content": user_message}],
+        }
+        if assistant_message is not None:
+            turn["messages"].append({"role": "assistant", "content": assistant_message})
+
+        revision = base_revision
+        if script_content is not None:
+            if previous_content is not None and base_revision > 0 and base_revision % SCRIPT_SNAPSHOT_INTERVAL != 0:
+                turn["script"] = {
+                    "base_revision": base_revision,
+                    "kind": "delta",
+                    "content": make_delta(previous_content, script_content),
+                    "script_content": script_content
+                }
+            else:
+                turn["script"] = {
+                    "base_revision": None,
+                    "kind": "snapshot",
+                    "content": script_content,
+                    "script_content": script_content
+                }
+            revision = base_revision + 1
+            turn["predicted_revision"] = revision
+
+        cache = get_session_cache()
+        cache.append_message(session_id, script_number, {
+            "script_number": script_number, "role": "user", "content": user_message, "revision": base_revision or None
+        })
+        if script_content is not None:
+            cache.update_script(session_id, script_number, {"script_content": script_content, "revision": revision})
+        if assistant_message is not None:
+            cache.append_message(session_id, script_number, {
+                "script_number": script_number, "role": "assistant", "content": assistant_message, "revision": revision or None
+            })
+
+        if not supabase:
+            return revision
+
+        log.db_query("QUEUE", "chat_turn", {
+            "session_id": session_id[:8],
+            "script_number": script_number,
+            "script": turn["script"]["kind"] if "script" in turn else "unchanged"
+        })
+        if not get_chat_writer().submit(turn):
+            return None
+        return revision
+
+    @staticmethod
+    def pop_failed_chat_turns(session_id: str) -> List[Dict]:
+        """Chat turns of a session that could not be saved since the last call ([{"script_number", "messages"}])"""
+        with _failed_chat_turns_lock:
+            return _failed_chat_turns.pop(session_id, [])
+
+    @staticmethod
+    def get_chat_history(
+        session_id: str,
+        script_number: int,
+        limit: int = CHAT_PAGE_SIZE,
+        cursor: Optional[str] = None
+    ) -> Dict:
+        """
+        One page of a script's chat, paging backwards from the newest message.
+        Messages come oldest first; next_cursor fetches the page before them.
+        Returns {"messages": [...], "next_cursor": str | None}; ValueError on a bad cursor.
+        """
+        limit = _page_size(limit, CHAT_PAGE_SIZE)
+        keyset = _older_than(cursor) if cursor else None
         if not supabase:
-            return []
+            return {"messages": [], "next_cursor": None}
 
         log.db_query("SELECT", "chat_messages", {
             "session_id": session_id[:8],
-            "script_number": script_number
+            "script_number": script_number,
+            "limit": limit
         })
 
+        _settle(session_id)
         try:
-            result = supabase.table("chat_messages").select("*").eq("session_id", session_id).eq("script_number", script_number).order("created_at").execute()
-            messages = result.data or []
-            log.db_result("SELECT", "chat_messages", len(messages))
-            return messages
+            query = supabase.table("chat_messages").select("*").eq("session_id", session_id).eq("script_number", script_number)
+            if keyset:
+                query = query.or_(keyset)
+            result = query.order("created_at", desc=True).order("id", desc=True).limit(limit + 1).execute()
+            rows = result.data or []
+            page = rows[:limit]
+            log.db_result("SELECT", "chat_messages", len(page))
+            return {
+                "messages": page[::-1],
+                "next_cursor": encode_cursor(page[-1]) if len(rows) > limit else None
+            }
         except Exception as e:
             log.error(f"Get chat history failed: {str(e)}")
-            return []
+            return {"messages": [], "next_cursor": None}
 
     @staticmethod
     def find_session_by_topic(topic: str) -> Optional[Dict]:
@@ -334,10 +826,10 @@ class SessionService:
         log.db_query("SELECT", "sessions", {"topic": topic[:30]})
 
         try:
-            result = supabase.table("sessions").select("*").eq("topic", topic).order("created_at", desc=True).limit(1).execute()
+            result = SessionService._session_query().eq("topic", topic).order("created_at", desc=True).limit(1).execute()
             if result.data:
                 log.info(f"Found session for topic: {topic[:30]}")
-                return SessionService.get_session(result.data[0]["id"])
+                return SessionService._shape_session(result.data[0], SESSION_PARTS_ALL)
             log.debug(f"No session found for topic: {topic[:30]}")
             return None
         except Exception as e:
@@ -345,5 +837,155 @@ class SessionService:
             return None
 
 
-# Singleton instance
+class AsyncSessionService:
+    """
+    Awaitable SessionService for async endpoints.
+    Blocking supabase calls run on a bounded thread pool, so a slow database
+    call never stalls the event loop (and the generation streams on it).
+    Timeouts return the same fallback values the sync methods return on errors.
+    """
+
+    def __init__(self, max_workers: int = SESSION_DB_MAX_WORKERS, timeout: float = SESSION_DB_TIMEOUT):
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="session-db")
+
+    async def _call(self, fn: Callable, *args, default: Any = None, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        try:
+            return await asyncio.wait_for(
+                loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs)),
+                timeout=self.timeout
+            )
+        except asyncio.TimeoutError:
+            log.error(f"{fn.__name__} timed out after {self.timeout:g}s")
+            return default
+
+    async def create_session(
+        self,
+        topic: str,
+        mode: str,
+        user_notes: str = "",
+        research_data: str = "",
+        research_sources: List[Dict] = None,
+        topic_type: str = "A",
+        skip_research: bool = False
+    ) -> Optional[Dict]:
+        return await self._call(
+            SessionService.create_session, topic, mode, user_notes, research_data,
+            research_sources, topic_type, skip_research
+        )
+
+    async def get_session(
+        self,
+        session_id: str,
+        parts: Sequence[str] = SESSION_PARTS_ALL,
+        columns: Optional[Dict[str, str]] = None,
+        script_number: Optional[int] = None
+    ) -> Optional[Dict]:
+        return await self._call(SessionService.get_session, session_id, parts, columns, script_number)
+
+    async def get_script_context(self, session_id: str, script_number: int) -> Optional[Dict]:
+        return await self._call(SessionService.get_script_context, session_id, script_number)
+
+    async def list_sessions(self, limit: int = SESSION_PAGE_SIZE, cursor: Optional[str] = None) -> Dict:
+        return await self._call(
+            SessionService.list_sessions, limit, cursor, default={"sessions": [], "next_cursor": None}
+        )
+
+    async def update_session(self, session_id: str, updates: Dict) -> bool:
+        return await self._call(SessionService.update_session, session_id, updates, default=False)
+
+    async def delete_session(self, session_id: str) -> bool:
+        return await self._call(SessionService.delete_session, session_id, default=False)
+
+    async def add_file(
+        self,
+        session_id: str,
+        file_name: str,
+        file_type: str,
+        file_content: str,
+        file_size: int = 0
+    ) -> Optional[Dict]:
+        return await self._call(SessionService.add_file, session_id, file_name, file_type, file_content, file_size)
+
+    async def save_script(
+        self,
+        session_id: str,
+        script_number: int,
+        script_content: str,
+        angle_name: str = "",
+        angle_focus: str = "",
+        angle_hook_style: str = ""
+    ) -> Optional[Dict]:
+        return await self._call(
+            SessionService.save_script, session_id, script_number, script_content,
+            angle_name, angle_focus, angle_hook_style
+        )
+
+    async def update_script(
+        self,
+        session_id: str,
+        script_number: int,
+        script_content: str,
+        previous_content: Optional[str] = None,
+        base_revision: int = 0
+    ) -> Optional[int]:
+        return await self._call(
+            SessionService.update_script, session_id, script_number, script_content,
+            previous_content, base_revision
+        )
+
+    async def get_script_revision(self, session_id: str, script_number: int, revision: int) -> Optional[str]:
+        return await self._call(SessionService.get_script_revision, session_id, script_number, revision)
+
+    async def add_chat_message(
+        self,
+        session_id: str,
+        script_number: int,
+        role: str,
+        content: str,
+        revision: Optional[int] = None
+    ) -> Optional[Dict]:
+        return await self._call(SessionService.add_chat_message, session_id, script_number, role, content, revision)
+
+    async def record_chat_turn(
+        self,
+        session_id: str,
+        script_number: int,
+        user_message: str,
+        assistant_message: Optional[str] = None,
+        base_revision: int = 0,
+        previous_content: Optional[str] = None,
+        script_content: Optional[str] = None
+    ) -> Optional[int]:
+        return await self._call(
+            SessionService.record_chat_turn, session_id, script_number, user_message, assistant_message,
+            base_revision, previous_content, script_content
+        )
+
+    async def pop_failed_chat_turns(self, session_id: str) -> List[Dict]:
+        return SessionService.pop_failed_chat_turns(session_id)
+
+    async def get_chat_history(
+        self,
+        session_id: str,
+        script_number: int,
+        limit: int = CHAT_PAGE_SIZE,
+        cursor: Optional[str] = None
+    ) -> Dict:
+        return await self._call(
+            SessionService.get_chat_history, session_id, script_number, limit, cursor,
+            default={"messages": [], "next_cursor": None}
+        )
+
+    async def find_session_by_topic(self, topic: str) -> Optional[Dict]:
+        return await self._call(SessionService.find_session_by_topic, topic)
+
+    def close(self):
+        """Let in-flight calls finish, refuse new ones"""
+        self._executor.shutdown(wait=False)
+
+
+# Singleton instances
 session_service = SessionService()
+async_session_service = AsyncSessionService()
@@ -1,18 +1,28 @@
 """
 Vector Storage Module - Supabase pgvector
 Stores script embeddings for style learning and retrieval.
+Without Supabase (or when a write fails) vectors go to a persistent local store.
 """
 import os
+import json
+import time
 import uuid
-from typing import List, Dict, Optional
+import zlib
+import threading
+from pathlib import Path
+from typing import List, Dict, Optional, Tuple
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+import numpy as np
 from supabase import create_client, Client
 
 from app.schemas.enums import ScriptMode, VectorType, HookType
+from app.db.embedding_cache import get_embedding_cache
+from app.db.embedding_backends import BACKENDS, EMBEDDING_BACKEND, load_backend
+from app.db.embedding_executor import EmbeddingExecutor
 
 
 # ---------------------------
@@ -29,23 +39,423 @@ if SUPABASE_URL and SUPABASE_KEY:
 
 # ---------------------------
 # Lazy Loading Embedding Model (saves ~300MB at startup)
+# Backend chosen by EMBEDDING_BACKEND (sentence-transformers | onnx-int8)
 # ---------------------------
+EMBEDDING_MODEL_NAME = BACKENDS[EMBEDDING_BACKEND].name if EMBEDDING_BACKEND in BACKENDS else EMBEDDING_BACKEND
+
 _embedding_model = None
+_embedding_model_lock = threading.Lock()
 
 
 def get_embedding_model():
-    """Lazy load the embedding model only when needed"""
+    """Lazy load the embedding backend only when needed"""
     global _embedding_model
     if _embedding_model is None:
-        from sentence_transformers import SentenceTransformer
-        _embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
+        with _embedding_model_lock:
+            if _embedding_model is None:
+                _embedding_model = load_backend()
     return _embedding_model
 
 
+_embedding_executor: Optional[EmbeddingExecutor] = None
+
+
+def get_embedding_executor() -> EmbeddingExecutor:
+    """Lazy start the micro-batching executor - the only thread that runs the model"""
+    global _embedding_executor
+    if _embedding_executor is None:
+        with _embedding_model_lock:
+            if _embedding_executor is None:
+                _embedding_executor = EmbeddingExecutor(lambda texts: get_embedding_model().encode(texts))
+    return _embedding_executor
+
+
+def close_embedding_executor():
+    """Finish queued encode requests and stop the worker (server shutdown)"""
+    if _embedding_executor is not None:
+        _embedding_executor.close()
+
+
+def embed_texts(texts: List[str]) -> np.ndarray:
+    """
+    Embed texts through the embedding cache (the model is only loaded on a miss).
+    Misses from concurrent callers are batched into one model call by the executor.
+    """
+    return get_embedding_cache().encode(
+        texts,
+        EMBEDDING_MODEL_NAME,
+        lambda missing: get_embedding_executor().encode(missing)
+    )
+
+
+async def aembed_texts(texts: List[str]) -> np.ndarray:
+    """embed_texts for async callers - awaits the executor instead of blocking a thread on it"""
+    return await get_embedding_cache().aencode(
+        texts,
+        EMBEDDING_MODEL_NAME,
+        lambda missing: get_embedding_executor().aencode(missing)
+    )
+
+
 # ---------------------------
-# Fallback: In-memory storage for local dev
+# Fallback: Local vector store for offline / dev (persisted with memmap)
 # ---------------------------
-_fallback_storage: List[Dict] = []
+FALLBACK_INITIAL_CAPACITY = 256
+
+# Directory for the persistent fallback store ("" = in-memory only, lost on restart)
+LOCAL_VECTOR_STORE_DIR = os.getenv(
+    "LOCAL_VECTOR_STORE_DIR",
+    str(Path(__file__).resolve().parent.parent.parent / ".cache" / "vector_store")
+)
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize rows so cosine similarity is a plain dot product"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class _VectorPartition:
+    """
+    Contiguous float32 matrix of normalized rows + their records (one mode/vector_type).
+    With a base path, rows live in <base>.npy (memmap, capacity rows) and records in
+    <base>.jsonl (one line per row, in row order, plus delete tombstones).
+    Rows carrying an "id" are upserted: appending an id that is already stored replaces its row.
+    A compacted .jsonl starts with {"compacted": {"rows", "crc32"}} describing the .npy it was
+    written with, so a crash between swapping the two files is detected on load.
+    """
+
+    def __init__(self, dim: int, base_path: Optional[Path] = None):
+        self.base_path = base_path
+        self.records: List[Dict] = []
+        self.deleted = 0
+        self._rows_by_script: Dict[str, List[int]] = {}
+        self._row_by_id: Dict[str, int] = {}
+        self.alive = np.ones(FALLBACK_INITIAL_CAPACITY, dtype=bool)
+        self.matrix = self._allocate(FALLBACK_INITIAL_CAPACITY, dim, self._npy_path)
+
+    @property
+    def _npy_path(self) -> Optional[Path]:
+        return self.base_path.with_suffix(".npy") if self.base_path else None
+
+    @property
+    def _meta_path(self) -> Optional[Path]:
+        return self.base_path.with_suffix(".jsonl") if self.base_path else None
+
+    @staticmethod
+    def _allocate(capacity: int, dim: int, path: Optional[Path]) -> np.ndarray:
+        if path is None:
+            return np.empty((capacity, dim), dtype=np.float32)
+        return np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(capacity, dim))
+
+    @staticmethod
+    def _checksum(matrix: np.ndarray, rows: int) -> int:
+        """CRC32 of the first rows of a matrix (chunked - memmaps are not read in one go)"""
+        crc = 0
+        for start in range(0, rows, 4096):
+            crc = zlib.crc32(np.ascontiguousarray(matrix[start:min(rows, start + 4096)]).tobytes(), crc)
+        return crc
+
+    def _check_compacted(self, header: Dict):
+        """The .npy must be the one written with this compacted .jsonl (finish an interrupted swap)"""
+        rows, crc = header["rows"], header["crc32"]
+        if self.matrix.shape[0] >= rows and self._checksum(self.matrix, rows) == crc:
+            return
+        tmp_npy = self._npy_path.with_suffix(".npy.tmp")
+        if tmp_npy.exists():
+            pending = np.lib.format.open_memmap(tmp_npy, mode="r")
+            matches = pending.shape[0] >= rows and self._checksum(pending, rows) == crc
+            del pending
+            if matches:
+                print(f"[Storage] {self.base_path.name}: finishing interrupted compaction")
+                self.matrix = None  # Release the old mapping before replacing its file
+                os.replace(tmp_npy, self._npy_path)
+                self.matrix = np.lib.format.open_memmap(self._npy_path, mode="r+")
+                return
+        raise ValueError(f"{self._npy_path.name} does not match {self._meta_path.name} (interrupted compaction)")
+
+    @classmethod
+    def load(cls, base_path: Path) -> "_VectorPartition":
+        """Open an existing partition (memmap - rows are paged in lazily)"""
+        partition = cls.__new__(cls)
+        partition.base_path = base_path
+        partition.records = []
+        partition.deleted = 0
+        partition._rows_by_script = {}
+        partition._row_by_id = {}
+        partition.matrix = np.lib.format.open_memmap(partition._npy_path, mode="r+")
+
+        # Tombstones apply in file order - they only mask rows written before them
+        alive: List[bool] = []
+        with open(partition._meta_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if "compacted" in entry:
+                    partition._check_compacted(entry["compacted"])
+                elif "deleted_script_id" in entry:
+                    for row in partition._rows_by_script.pop(entry["deleted_script_id"], []):
+                        alive[row] = False
+                elif "deleted_ids" in entry:
+                    for record_id in entry["deleted_ids"]:
+                        row = partition._row_by_id.pop(record_id, None)
+                        if row is not None:
+                            alive[row] = False
+                else:
+                    partition._remember(entry)
+                    alive.append(True)
+
+        # Rows are written before their metadata, so extra matrix rows are just unused capacity
+        capacity = partition.matrix.shape[0]
+        if len(partition.records) > capacity:
+            print(f"[Storage] {base_path.name}: metadata ahead of vectors, dropping {len(partition.records) - capacity} rows")
+            partition.records = partition.records[:capacity]
+            alive = alive[:capacity]
+            partition._rows_by_script = {}
+            partition._row_by_id = {}
+            for row, record in enumerate(partition.records):
+                if alive[row]:
+                    partition._rows_by_script.setdefault(record.get("script_id"), []).append(row)
+                    if record.get("id"):
+                        partition._row_by_id[record["id"]] = row
+
+        partition.alive = np.ones(capacity, dtype=bool)
+        partition.alive[:len(alive)] = alive
+        partition.deleted = len(alive) - sum(alive)
+        return partition
+
+    def _remember(self, record: Dict):
+        self._rows_by_script.setdefault(record.get("script_id"), []).append(len(self.records))
+        if record.get("id"):
+            self._row_by_id[record["id"]] = len(self.records)
+        self.records.append(record)
+
+    def _mark_deleted(self, script_id: str) -> int:
+        removed = 0
+        for row in self._rows_by_script.pop(script_id, []):
+            if self.alive[row]:
+                self.alive[row] = False
+                removed += 1
+        self.deleted += removed
+        return removed
+
+    def _append_meta(self, entries: List[Dict]):
+        if self._meta_path is None:
+            return
+        with open(self._meta_path, "a", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def _grow(self, needed: int):
+        """Geometric growth keeps appends amortized O(1)"""
+        count = len(self.records)
+        capacity = max(needed, self.matrix.shape[0] * 2)
+        if self._npy_path is None:
+            grown = np.empty((capacity, self.matrix.shape[1]), dtype=np.float32)
+            grown[:count] = self.matrix[:count]
+        else:
+            tmp_path = self._npy_path.with_suffix(".npy.tmp")
+            grown = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=(capacity, self.matrix.shape[1]))
+            grown[:count] = self.matrix[:count]
+            grown.flush()
+            self.matrix = grown  # Release the old mapping before replacing its file
+            os.replace(tmp_path, self._npy_path)
+        self.matrix = grown
+        alive = np.ones(capacity, dtype=bool)
+        alive[:count] = self.alive[:count]
+        self.alive = alive
+
+    def append(self, vectors: np.ndarray, records: List[Dict]):
+        count = len(self.records)
+        needed = count + len(records)
+        if needed > self.matrix.shape[0]:
+            self._grow(needed)
+        self.matrix[count:needed] = vectors
+        if isinstance(self.matrix, np.memmap):
+            self.matrix.flush()
+        self._append_meta(records)
+        for record in records:
+            self._remember(record)
+
+    def delete_ids(self, record_ids: List[str]) -> int:
+        """Tombstone the rows stored under these record ids (the replaced side of an upsert)"""
+        removed = []
+        for record_id in record_ids:
+            row = self._row_by_id.pop(record_id, None)
+            if row is not None and self.alive[row]:
+                self.alive[row] = False
+                removed.append(record_id)
+        if removed:
+            self.deleted += len(removed)
+            self._append_meta([{"deleted_ids": removed}])
+        return len(removed)
+
+    def delete_script(self, script_id: str) -> int:
+        """Tombstone every row of a script (space is reclaimed by compact)"""
+        removed = self._mark_deleted(script_id)
+        if removed:
+            self._append_meta([{"deleted_script_id": script_id}])
+        return removed
+
+    def compact(self):
+        """Rewrite the partition with live rows only (drops tombstones and spare capacity)"""
+        count = len(self.records)
+        keep = np.flatnonzero(self.alive[:count])
+        records = [self.records[i] for i in keep]
+        capacity = max(FALLBACK_INITIAL_CAPACITY, len(records))
+        dim = self.matrix.shape[1]
+
+        if self.base_path is None:
+            matrix = np.empty((capacity, dim), dtype=np.float32)
+            matrix[:len(records)] = self.matrix[keep]
+        else:
+            tmp_npy = self._npy_path.with_suffix(".npy.tmp")
+            tmp_meta = self._meta_path.with_suffix(".jsonl.tmp")
+            matrix = np.lib.format.open_memmap(tmp_npy, mode="w+", dtype=np.float32, shape=(capacity, dim))
+            matrix[:len(records)] = self.matrix[keep]
+            matrix.flush()
+            header = {"compacted": {"rows": len(records), "crc32": self._checksum(matrix, len(records))}}
+            with open(tmp_meta, "w", encoding="utf-8") as f:
+                f.write(json.dumps(header) + "\n")
+                for record in records:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self.matrix = matrix  # Release the old mapping before replacing its file
+            # Metadata first: its header identifies the new .npy, so load can finish or reject a half swap
+            os.replace(tmp_meta, self._meta_path)
+            os.replace(tmp_npy, self._npy_path)
+
+        self.matrix = matrix
+        self.records = []
+        self._rows_by_script = {}
+        self._row_by_id = {}
+        for record in records:
+            self._remember(record)
+        self.alive = np.ones(capacity, dtype=bool)
+        self.deleted = 0
+
+
+class FallbackVectorIndex:
+    """Local cosine index partitioned by (mode, vector_type), optionally persisted to disk"""
+
+    def __init__(self, store_dir: Optional[str] = None):
+        self._partitions: Dict[Tuple[str, str], _VectorPartition] = {}
+        self._lock = threading.Lock()
+        self.store_dir = Path(store_dir) if store_dir else None
+
+        if self.store_dir is not None:
+            try:
+                self.store_dir.mkdir(parents=True, exist_ok=True)
+                self._load()
+            except Exception as e:
+                print(f"[Storage] Local vector store unavailable, using memory only: {e}")
+                self.store_dir = None
+
+    def _load(self):
+        start = time.time()
+        for meta_path in sorted(self.store_dir.glob("*.jsonl")):
+            mode, _, vector_type = meta_path.stem.partition("__")
+            if not vector_type or not meta_path.with_suffix(".npy").exists():
+                continue
+            try:
+                self._partitions[(mode, vector_type)] = _VectorPartition.load(meta_path.with_suffix(""))
+            except Exception as e:
+                # One bad partition must not take persistence down for the others
+                print(f"[Storage] {meta_path.stem}: unreadable ({e}), quarantining its files")
+                self._quarantine(meta_path.with_suffix(""))
+        if self._partitions:
+            print(f"[Storage] Loaded {len(self)} local vectors in {(time.time() - start) * 1000:.0f}ms")
+
+    @staticmethod
+    def _quarantine(base_path: Path):
+        """Move a partition's files aside (kept for inspection) so the key starts empty"""
+        suffix = f".corrupt-{int(time.time())}"
+        for ext in (".jsonl", ".npy", ".jsonl.tmp", ".npy.tmp"):
+            path = base_path.with_suffix(ext)
+            if path.exists():
+                path.rename(path.with_name(path.name + suffix))
+
+    def _base_path(self, key: Tuple[str, str]) -> Optional[Path]:
+        return self.store_dir / f"{key[0]}__{key[1]}" if self.store_dir else None
+
+    def __len__(self) -> int:
+        return sum(len(p.records) - p.deleted for p in self._partitions.values())
+
+    def add(self, records: List[Dict]):
+        """
+        Upsert records (each with an "embedding"); vectors are kept only in the matrix.
+        A record whose "id" is already stored replaces that row, like the Supabase upsert.
+        """
+        groups: Dict[Tuple[str, str], List[Dict]] = {}
+        for record in records:
+            groups.setdefault((record["mode"], record["vector_type"]), []).append(record)
+        record_ids = [r["id"] for r in records if r.get("id")]
+
+        with self._lock:
+            if record_ids:
+                for partition in self._partitions.values():
+                    partition.delete_ids(record_ids)
+            for key, group in groups.items():
+                vectors = _normalize_rows(np.asarray([r["embedding"] for r in group], dtype=np.float32))
+                partition = self._partitions.get(key)
+                if partition is None:
+                    partition = _VectorPartition(vectors.shape[1], self._base_path(key))
+                    self._partitions[key] = partition
+                partition.append(vectors, [{k: v for k, v in r.items() if k != "embedding"} for r in group])
+
+    def delete_script(self, script_id: str) -> int:
+        """Remove every vector of a script; returns the number of rows removed"""
+        with self._lock:
+            return sum(p.delete_script(script_id) for p in self._partitions.values())
+
+    def compact(self):
+        """Reclaim space held by deleted rows"""
+        with self._lock:
+            for partition in self._partitions.values():
+                if partition.deleted:
+                    partition.compact()
+
+    def search(
+        self,
+        query_embedding: List[float],
+        mode: Optional[str],
+        vector_type: str,
+        limit: int
+    ) -> List[Dict]:
+        """Top-k by cosine similarity: one matrix-vector product + argpartition per partition"""
+        if limit <= 0:
+            return []
+
+        # Snapshot row counts - appends never move rows below an existing count
+        with self._lock:
+            views = [
+                (p.matrix[:len(p.records)], p.records, p.alive[:len(p.records)].copy() if p.deleted else None)
+                for (p_mode, p_type), p in self._partitions.items()
+                if p_type == vector_type and (mode is None or p_mode == mode) and len(p.records) > p.deleted
+            ]
+        if not views:
+            return []
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+
+        candidates = []
+        for matrix, records, alive in views:
+            scores = matrix @ query
+            if alive is not None:
+                scores[~alive] = -np.inf
+            k = min(limit, len(scores))
+            top = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+            candidates.extend((float(scores[i]), records[i]) for i in top if scores[i] != -np.inf)
+
+        candidates.sort(key=lambda c: c[0], reverse=True)
+        return [{**record, "similarity": score} for score, record in candidates[:limit]]
+
+
+_fallback_index = FallbackVectorIndex(LOCAL_VECTOR_STORE_DIR)
 
 
 class Collection:
@@ -59,12 +469,60 @@ class Collection:
             except Exception as e:
                 print(f"[Storage] Count error: {e}")
                 return 0
-        return len(_fallback_storage)
+        return len(_fallback_index)
 
 
 collection = Collection()
 
 
+# Records per Supabase upsert request (bulk ingestion)
+UPSERT_CHUNK_SIZE = int(os.getenv("UPSERT_CHUNK_SIZE", "300"))
+
+
+def build_script_records(
+    script_id: str,
+    title: str,
+    mode: ScriptMode,
+    hook_type: HookType,
+    full_text: str,
+    hook_text: str,
+    skeleton_text: str,
+    embeddings: List[List[float]],
+) -> List[Dict]:
+    """The 3 vector records (full / hook / skeleton) stored for one script"""
+    base = {
+        "script_id": script_id,
+        "title": title,
+        "mode": mode.value,
+        "hook_type": hook_type.value,
+    }
+    return [
+        {**base, "id": f"{script_id}_full", "vector_type": VectorType.FULL.value, "content": full_text, "embedding": embeddings[0]},
+        {**base, "id": f"{script_id}_hook", "vector_type": VectorType.HOOK.value, "content": hook_text, "embedding": embeddings[1]},
+        {**base, "id": f"{script_id}_skel", "vector_type": VectorType.SKELETON.value, "content": skeleton_text, "embedding": embeddings[2]},
+    ]
+
+
+def store_records(records: List[Dict], chunk_size: int = UPSERT_CHUNK_SIZE) -> Dict[str, int]:
+    """
+    Upsert vector records in chunks (one Supabase round trip per chunk).
+    A failed chunk (or no Supabase) goes to the local store instead.
+    """
+    counts = {"supabase": 0, "local": 0}
+    for start in range(0, len(records), max(1, chunk_size)):
+        chunk = records[start:start + chunk_size]
+        if supabase:
+            try:
+                supabase.table("script_vectors").upsert(chunk).execute()
+                counts["supabase"] += len(chunk)
+                continue
+            except Exception as e:
+                print(f"[Storage] Insert error: {e}")
+        _fallback_index.add(chunk)
+        counts["local"] += len(chunk)
+    return counts
+
+
 def add_script_to_db(
     title: str,
     full_text: str,
@@ -79,9 +537,8 @@ def add_script_to_db(
     - Hook only (Style match)
     - Skeleton (Structure match)
     """
-    # 1. Generate embeddings (lazy load model)
-    model = get_embedding_model()
-    embeddings = model.encode(
+    # 1. Generate embeddings (cached, lazy load model)
+    embeddings = embed_texts(
         [full_text, hook_text, skeleton_text]
     ).tolist()
 
@@ -89,52 +546,35 @@ def add_script_to_db(
     script_id = str(uuid.uuid4())
 
     # 3. Prepare records
-    records = [
-        {
-            "id": f"{script_id}_full",
-            "script_id": script_id,
-            "title": title,
-            "mode": mode.value,
-            "hook_type": hook_type.value,
-            "vector_type": VectorType.FULL.value,
-            "content": full_text,
-            "embedding": embeddings[0],
-        },
-        {
-            "id": f"{script_id}_hook",
-            "script_id": script_id,
-            "title": title,
-            "mode": mode.value,
-            "hook_type": hook_type.value,
-            "vector_type": VectorType.HOOK.value,
-            "content": hook_text,
-            "embedding": embeddings[1],
-        },
-        {
-            "id": f"{script_id}_skel",
-            "script_id": script_id,
-            "title": title,
-            "mode": mode.value,
-            "hook_type": hook_type.value,
-            "vector_type": VectorType.SKELETON.value,
-            "content": skeleton_text,
-            "embedding": embeddings[2],
-        },
-    ]
+    records = build_script_records(
+        script_id, title, mode, hook_type, full_text, hook_text, skeleton_text, embeddings
+    )
 
     # 4. Insert into Supabase or fallback
+    counts = store_records(records)
+    target = "Supabase" if counts["supabase"] else "fallback storage"
+    print(f"[Storage] Added script {script_id} to {target}")
+
+    return script_id
+
+
+def delete_script_from_db(script_id: str) -> int:
+    """Delete all vectors of a script (Supabase + local store). Returns local rows removed."""
     if supabase:
         try:
-            supabase.table("script_vectors").upsert(records).execute()
-            print(f"[Storage] Added script {script_id} to Supabase")
+            supabase.table("script_vectors").delete().eq("script_id", script_id).execute()
+            print(f"[Storage] Deleted script {script_id} from Supabase")
         except Exception as e:
-            print(f"[Storage] Insert error: {e}")
-            _fallback_storage.extend(records)
-    else:
-        _fallback_storage.extend(records)
-        print(f"[Storage] Added script {script_id} to fallback storage")
+            print(f"[Storage] Delete error: {e}")
+    removed = _fallback_index.delete_script(script_id)
+    if removed:
+        print(f"[Storage] Deleted {removed} local vectors for {script_id}")
+    return removed
 
-    return script_id
+
+def compact_local_store():
+    """Rewrite the local store without deleted rows"""
+    _fallback_index.compact()
 
 
 def query_similar(
@@ -146,9 +586,8 @@ def query_similar(
     """
     Query similar scripts using vector similarity.
     """
-    # Generate query embedding (lazy load model)
-    model = get_embedding_model()
-    query_embedding = model.encode([query_text])[0].tolist()
+    # Generate query embedding (cached - FULL and HOOK lookups share one encode)
+    query_embedding = embed_texts([query_text])[0].tolist()
 
     if supabase:
         try:
@@ -177,32 +616,49 @@ def _query_fallback(
     limit: int
 ) -> List[Dict]:
     """Fallback similarity search using cosine similarity"""
-    import numpy as np
-
-    if not _fallback_storage:
-        return []
+    return _fallback_index.search(
+        query_embedding,
+        mode.value if mode else None,
+        vector_type.value,
+        limit
+    )
 
-    # Filter by mode and vector type
-    filtered = [
-        r for r in _fallback_storage
-        if r["vector_type"] == vector_type.value
-        and (mode is None or r["mode"] == mode.value)
-    ]
 
-    if not filtered:
-        return []
+def query_similar_multi(
+    query_text: str,
+    mode: Optional[ScriptMode],
+    requests: List[Tuple[VectorType, int]],
+    query_embedding: Optional[List[float]] = None
+) -> Dict[VectorType, List[Dict]]:
+    """
+    Query several vector types for one text in a single round trip.
+    requests = [(VectorType.FULL, 4), (VectorType.HOOK, 4)] -> {VectorType.FULL: [...], VectorType.HOOK: [...]}
+    Pass query_embedding when the caller already embedded query_text (e.g. with aembed_texts).
+    """
+    if query_embedding is None:
+        query_embedding = embed_texts([query_text])[0].tolist()
 
-    # Calculate cosine similarity
-    query_vec = np.array(query_embedding)
-    similarities = []
+    if supabase:
+        try:
+            result = supabase.rpc(
+                "match_scripts_multi",
+                {
+                    "query_embedding": query_embedding,
+                    "requests": [{"vector_type": vt.value, "limit": limit} for vt, limit in requests],
+                    "filter_mode": mode.value if mode else None,
+                }
+            ).execute()
 
-    for record in filtered:
-        doc_vec = np.array(record["embedding"])
-        similarity = np.dot(query_vec, doc_vec) / (
-            np.linalg.norm(query_vec) * np.linalg.norm(doc_vec)
-        )
-        similarities.append((record, similarity))
+            grouped: Dict[VectorType, List[Dict]] = {vt: [] for vt, _ in requests}
+            for row in result.data or []:
+                vector_type = requests[row.pop("request_index")][0]
+                # Surface metadata fields (script_id, title, ...) like the local store records
+                grouped[vector_type].append({**(row.get("metadata") or {}), **row})
+            return grouped
+        except Exception as e:
+            print(f"[Storage] Multi query error: {e}")
 
-    # Sort by similarity and return top matches
-    similarities.sort(key=lambda x: x[1], reverse=True)
-    return [r for r, _ in similarities[:limit]]
+    return {
+        vector_type: _query_fallback(query_embedding, mode, vector_type, limit)
+        for vector_type, limit in requests
+    }
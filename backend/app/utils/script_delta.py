@@ -0,0 +1,57 @@
+"""
+Script Deltas - Compact line-level diffs between script versions
+A delta is a JSON list of ops applied in order to the previous version's lines:
+    [0, n]        keep the next n lines
+    [1, n]        drop the next n lines
+    [2, [lines]]  insert these lines
+"""
+import json
+import difflib
+from typing import List, Sequence
+
+KEEP, DROP, INSERT = 0, 1, 2
+
+
+def make_delta(old: str, new: str) -> str:
+    """Encode new as edits against old"""
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    ops: List[list] = []
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append([KEEP, i2 - i1])
+            continue
+        if i2 > i1:
+            ops.append([DROP, i2 - i1])
+        if j2 > j1:
+            ops.append([INSERT, new_lines[j1:j2]])
+    return json.dumps(ops, ensure_ascii=False, separators=(",", ":"))
+
+
+def apply_delta(old: str, delta: str) -> str:
+    """Rebuild the new version from old + delta"""
+    old_lines = old.splitlines(keepends=True)
+    out: List[str] = []
+    pos = 0
+    for op, arg in json.loads(delta):
+        if op == KEEP:
+            out.extend(old_lines[pos:pos + arg])
+            pos += arg
+        elif op == DROP:
+            pos += arg
+        elif op == INSERT:
+            out.extend(arg)
+        else:
+            raise ValueError(f"Unknown delta op: {op}")
+    if pos != len(old_lines):
+        raise ValueError("Delta does not match the base version")
+    return "".join(out)
+
+
+def apply_chain(snapshot: str, deltas: Sequence[str]) -> str:
+    """Snapshot followed by consecutive deltas -> final version"""
+    content = snapshot
+    for delta in deltas:
+        content = apply_delta(content, delta)
+    return content
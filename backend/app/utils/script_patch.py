@@ -0,0 +1,84 @@
+"""
+Script Patches - Apply search/replace edit blocks from the chat model
+The model answers small edits with blocks instead of re-writing the whole script:
+    <<<<<<< SEARCH
+    exact lines from the current script
+    =======
+    replacement lines
+    >>>>>>> REPLACE
+Each SEARCH must match exactly one place in the script (as edited by earlier blocks).
+An empty REPLACE deletes the lines, line break included.
+"""
+import re
+from typing import List, Tuple
+
+EDIT_BLOCK = re.compile(
+    r"<<<<<<< SEARCH[ \t]*\n(.*?)\n=======[ \t]*\n(.*?)>>>>>>> REPLACE",
+    re.DOTALL,
+)
+
+
+class PatchError(ValueError):
+    """Edit blocks that are malformed or do not apply to the script"""
+
+
+def parse_edit_blocks(text: str) -> List[Tuple[str, str]]:
+    """[(search, replace)] in order; PatchError if the text has no well-formed block"""
+    blocks = []
+    for match in EDIT_BLOCK.finditer(text):
+        search, replace = match.group(1), match.group(2)
+        if replace.endswith("\n"):
+            replace = replace[:-1]
+        if not search.strip():
+            raise PatchError("Edit block has an empty SEARCH section")
+        blocks.append((search, replace))
+    if not blocks:
+        raise PatchError("No edit blocks found")
+    return blocks
+
+
+def _locate(script: str, search: str) -> Tuple[int, int]:
+    """Character span of the single place search matches"""
+    count = script.count(search)
+    if count == 1:
+        start = script.find(search)
+        return start, start + len(search)
+    if count > 1:
+        raise PatchError(f"SEARCH matches {count} places: {search[:60]!r}")
+
+    # Models often drift on indentation / trailing spaces - match whole lines ignoring outer whitespace
+    lines = script.splitlines(keepends=True)
+    wanted = [line.strip() for line in search.strip("\n").splitlines()]
+    offsets = [0]
+    for line in lines:
+        offsets.append(offsets[-1] + len(line))
+    spans = []
+    for i in range(len(lines) - len(wanted) + 1):
+        window = lines[i:i + len(wanted)]
+        if [line.strip() for line in window] == wanted:
+            # Keep the last line's newline (SEARCH never includes it)
+            newline = len(window[-1]) - len(window[-1].rstrip("\r\n"))
+            spans.append((offsets[i], offsets[i + len(wanted)] - newline))
+    if len(spans) == 1:
+        return spans[0]
+    if spans:
+        raise PatchError(f"SEARCH matches {len(spans)} places: {search[:60]!r}")
+    raise PatchError(f"SEARCH not found in script: {search[:60]!r}")
+
+
+def apply_edit_blocks(script: str, blocks: List[Tuple[str, str]]) -> str:
+    """Apply blocks in order; PatchError if any does not apply or the result is empty"""
+    for search, replace in blocks:
+        start, end = _locate(script, search)
+        if not replace:
+            # Deleting lines - take their line break too (the preceding one on the last line)
+            if script.startswith("\r\n", end):
+                end += 2
+            elif script.startswith("\n", end):
+                end += 1
+            elif start and script[start - 1] == "\n":
+                start -= 2 if script[max(0, start - 2):start] == "\r\n" else 1
+        script = script[:start] + replace + script[end:]
+    if not script.strip():
+        raise PatchError("Edits removed the whole script")
+    return script
@@ -57,12 +57,135 @@ CREATE TABLE IF NOT EXISTS chat_messages (
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
+-- Script revisions: every stored version of a session script, as a chain of
+-- line deltas against the previous revision with periodic full snapshots
+-- (kind = 'snapshot': content is the script; kind = 'delta': content is the delta JSON)
+CREATE TABLE IF NOT EXISTS script_revisions (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    session_id UUID NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+    script_number INTEGER NOT NULL CHECK (script_number BETWEEN 1 AND 3),
+    revision INTEGER NOT NULL,
+    kind TEXT NOT NULL CHECK (kind IN ('snapshot', 'delta')),
+    content TEXT NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    UNIQUE(session_id, script_number, revision)
+);
+
+-- Current head revision of each script (0 = no revisions stored yet),
+-- and the script revision each chat message refers to
+ALTER TABLE session_scripts ADD COLUMN IF NOT EXISTS revision INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE chat_messages ADD COLUMN IF NOT EXISTS revision INTEGER;
+
 -- Create indexes for faster queries
 CREATE INDEX IF NOT EXISTS idx_sessions_topic ON sessions(topic);
-CREATE INDEX IF NOT EXISTS idx_sessions_created_at ON sessions(created_at DESC);
+-- Keyset pagination: (created_at, id) orderings for /sessions and per-script chat pages
+DROP INDEX IF EXISTS idx_sessions_created_at;
+CREATE INDEX IF NOT EXISTS idx_sessions_created_at_id ON sessions(created_at DESC, id DESC);
 CREATE INDEX IF NOT EXISTS idx_session_files_session_id ON session_files(session_id);
 CREATE INDEX IF NOT EXISTS idx_session_scripts_session_id ON session_scripts(session_id);
-CREATE INDEX IF NOT EXISTS idx_chat_messages_session_script ON chat_messages(session_id, script_number);
+DROP INDEX IF EXISTS idx_chat_messages_session_script;
+CREATE INDEX IF NOT EXISTS idx_chat_messages_session_script_created
+    ON chat_messages(session_id, script_number, created_at DESC, id DESC);
+-- (session_id, script_number, revision) lookups use the UNIQUE constraint's index
+
+-- Store the next revision of a script and move session_scripts to it, atomically.
+-- A delta only applies on top of p_base_revision: returns NULL if the head moved
+-- (or the script does not exist); snapshots pass p_base_revision = NULL.
+CREATE OR REPLACE FUNCTION commit_script_revision(
+    p_session_id UUID,
+    p_script_number INT,
+    p_base_revision INT,
+    p_kind TEXT,
+    p_content TEXT,
+    p_script_content TEXT
+)
+RETURNS INT
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    current_revision INT;
+BEGIN
+    SELECT revision INTO current_revision
+    FROM session_scripts
+    WHERE session_id = p_session_id AND script_number = p_script_number
+    FOR UPDATE;
+
+    IF NOT FOUND OR (p_base_revision IS NOT NULL AND current_revision <> p_base_revision) THEN
+        RETURN NULL;
+    END IF;
+
+    INSERT INTO script_revisions (session_id, script_number, revision, kind, content)
+    VALUES (p_session_id, p_script_number, current_revision + 1, p_kind, p_content);
+
+    UPDATE session_scripts
+    SET script_content = p_script_content, revision = current_revision + 1
+    WHERE session_id = p_session_id AND script_number = p_script_number;
+
+    RETURN current_revision + 1;
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION commit_script_revision TO anon, authenticated;
+
+-- Write-behind batch of chat turns, applied in order in one transaction.
+-- Turn: {session_id, script_number, base_revision, messages: [{role, content}],
+--        script?: {base_revision, kind, content, script_content}}
+-- A script delta whose base moved is stored as a snapshot instead.
+-- User messages refer to base_revision, assistant messages to the committed one.
+-- Returns the committed revision per turn.
+CREATE OR REPLACE FUNCTION persist_chat_turns(p_turns JSONB)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    turn JSONB;
+    msg JSONB;
+    t_session UUID;
+    t_script INT;
+    base_rev INT;
+    rev INT;
+    results JSONB := '[]'::JSONB;
+BEGIN
+    FOR turn IN SELECT t.value FROM jsonb_array_elements(p_turns) WITH ORDINALITY AS t(value, ord) ORDER BY t.ord LOOP
+        t_session := (turn->>'session_id')::UUID;
+        t_script := (turn->>'script_number')::INT;
+        base_rev := NULLIF((turn->>'base_revision')::INT, 0);
+        rev := base_rev;
+
+        IF turn->'script' IS NOT NULL AND jsonb_typeof(turn->'script') = 'object' THEN
+            rev := commit_script_revision(
+                t_session, t_script,
+                (turn->'script'->>'base_revision')::INT,
+                turn->'script'->>'kind',
+                turn->'script'->>'content',
+                turn->'script'->>'script_content'
+            );
+            IF rev IS NULL THEN
+                rev := commit_script_revision(
+                    t_session, t_script, NULL, 'snapshot',
+                    turn->'script'->>'script_content',
+                    turn->'script'->>'script_content'
+                );
+            END IF;
+        END IF;
+
+        FOR msg IN SELECT m.value FROM jsonb_array_elements(turn->'messages') WITH ORDINALITY AS m(value, ord) ORDER BY m.ord LOOP
+            -- clock_timestamp keeps messages of one transaction in order
+            INSERT INTO chat_messages (session_id, script_number, role, content, revision, created_at)
+            VALUES (
+                t_session, t_script, msg->>'role', msg->>'content',
+                CASE WHEN msg->>'role' = 'assistant' THEN rev ELSE base_rev END,
+                clock_timestamp()
+            );
+        END LOOP;
+
+        results := results || jsonb_build_array(rev);
+    END LOOP;
+    RETURN results;
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION persist_chat_turns TO anon, authenticated;
 
 -- Function to update updated_at timestamp
 CREATE OR REPLACE FUNCTION update_updated_at_column()
@@ -91,12 +214,14 @@ ALTER TABLE sessions ENABLE ROW LEVEL SECURITY;
 ALTER TABLE session_files ENABLE ROW LEVEL SECURITY;
 ALTER TABLE session_scripts ENABLE ROW LEVEL SECURITY;
 ALTER TABLE chat_messages ENABLE ROW LEVEL SECURITY;
+ALTER TABLE script_revisions ENABLE ROW LEVEL SECURITY;
 
 -- Allow all operations for now (public access - adjust for production)
 CREATE POLICY "Allow all on sessions" ON sessions FOR ALL USING (true) WITH CHECK (true);
 CREATE POLICY "Allow all on session_files" ON session_files FOR ALL USING (true) WITH CHECK (true);
 CREATE POLICY "Allow all on session_scripts" ON session_scripts FOR ALL USING (true) WITH CHECK (true);
 CREATE POLICY "Allow all on chat_messages" ON chat_messages FOR ALL USING (true) WITH CHECK (true);
+CREATE POLICY "Allow all on script_revisions" ON script_revisions FOR ALL USING (true) WITH CHECK (true);
 
 -- ============================================
 -- VECTOR STORAGE TABLES (Version 1.0)
@@ -151,6 +276,49 @@ $$;
 -- Grant access to the function
 GRANT EXECUTE ON FUNCTION match_scripts TO anon, authenticated;
 
+-- Multi-vector-type search: one query embedding, several (vector_type, limit) requests,
+-- all result sets in one round trip. requests = [{"vector_type": "full", "limit": 4}, ...]
+-- request_index is the 0-based position of the request each row answers.
+CREATE OR REPLACE FUNCTION match_scripts_multi(
+    query_embedding vector(384),
+    requests JSONB,
+    filter_mode TEXT DEFAULT NULL
+)
+RETURNS TABLE (
+    request_index INT,
+    id TEXT,
+    content TEXT,
+    metadata JSONB,
+    similarity FLOAT
+)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT
+        (r.ord - 1)::INT AS request_index,
+        m.id,
+        m.content,
+        m.metadata,
+        m.similarity
+    FROM jsonb_array_elements(requests) WITH ORDINALITY AS r(req, ord)
+    CROSS JOIN LATERAL (
+        SELECT
+            sv.id,
+            sv.content,
+            sv.metadata,
+            1 - (sv.embedding <=> query_embedding) AS similarity
+        FROM script_vectors sv
+        WHERE
+            (filter_mode IS NULL OR sv.metadata->>'mode' = filter_mode)
+            AND sv.metadata->>'vector_type' = r.req->>'vector_type'
+        ORDER BY sv.embedding <=> query_embedding
+        LIMIT (r.req->>'limit')::INT
+    ) m
+    ORDER BY r.ord, m.similarity DESC;
+$$;
+
+GRANT EXECUTE ON FUNCTION match_scripts_multi TO anon, authenticated;
+
 -- Create RLS policies (optional but recommended)
 ALTER TABLE script_vectors ENABLE ROW LEVEL SECURITY;
 
@@ -1171,46 +1171,21 @@ Follow for more mind blowing tech innovations.
 
 def train_all_scripts():
     """
-    Bulk train all Vibhay scripts into ChromaDB.
+    Bulk train all Vibhay scripts into the vector database (batched, resumable).
     """
     import sys
     sys.path.insert(0, str(Path(__file__).parent.parent))
 
-    from app.db.storage import add_script_to_db
-    from app.schemas.enums import ScriptMode, HookType
-    from app.utils.skeleton_utils import generate_skeleton, extract_hook
+    from app.db.bulk_ingest import ingest
 
     print("=" * 60)
     print("VIBHAY SISINTY TRAINING DATA IMPORT")
     print("=" * 60)
 
-    for i, script in enumerate(TRAINING_SCRIPTS, 1):
-        print(f"\n[{i}/{len(TRAINING_SCRIPTS)}] Training: {script['title']}")
-
-        # Convert string mode/hook to enums
-        mode = ScriptMode(script['mode'])
-        hook_type = HookType(script['hook_type'])
-
-        # Generate metadata
-        skeleton = generate_skeleton(script['content'])
-        hook_text = extract_hook(script['content'])
-
-        # Add to database
-        script_id = add_script_to_db(
-            title=script['title'],
-            full_text=script['content'],
-            mode=mode,
-            hook_type=hook_type,
-            skeleton_text=skeleton,
-            hook_text=hook_text
-        )
-
-        print(f"    [OK] Added with ID: {script_id}")
-        print(f"    [OK] Mode: {mode.value}, Hook: {hook_type.value}")
-        print(f"    [OK] Skeleton: {skeleton[:50]}...")
+    stats = ingest(["vibhay"])
 
     print("\n" + "=" * 60)
-    print(f"SUCCESS: {len(TRAINING_SCRIPTS)} scripts trained!")
+    print(f"SUCCESS: {stats['ingested']} scripts trained ({stats['skipped']} already done, {stats['failed']} failed)")
     print("=" * 60)
 
 
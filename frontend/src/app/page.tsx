@@ -79,6 +79,7 @@ export default function StudioPage() {
   const [chatInput, setChatInput] = useState("");
   const [chatMessages, setChatMessages] = useState<{ [key: number]: ChatMessage[] }>({ 1: [], 2: [], 3: [] });
   const [isChatLoading, setIsChatLoading] = useState(false);
+  const [chatStatus, setChatStatus] = useState("");
 
   // Text selection state for "Edit with Claude" popup
   const [selectedText, setSelectedText] = useState("");
@@ -88,6 +89,9 @@ export default function StudioPage() {
   const [showAngleSelection, setShowAngleSelection] = useState(false);
   const [angleOptions, setAngleOptions] = useState<string[]>([]);
   const [angleMessage, setAngleMessage] = useState("");
+  // Paused backend run (needs_input) - resumed when an angle is picked, so files aren't re-sent
+  const pausedThreadRef = useRef<string | null>(null);
+  const resumeThreadRef = useRef<string | null>(null);
 
   const researchEndRef = useRef<HTMLDivElement>(null);
   const chatEndRef = useRef<HTMLDivElement>(null);
@@ -414,12 +418,13 @@ export default function StudioPage() {
       [scriptNumber]: [...(prev[scriptNumber] || []), userMessage]
     }));
     setChatInput("");
+    setChatStatus("");
     setIsChatLoading(true);
 
     try {
       // Use local chat endpoint (works without Supabase)
       const currentAngle = angles[activeScriptTab] || {};
-      const response = await fetch(`${apiUrl}/chat/local`, {
+      const response = await fetch(`${apiUrl}/chat/local/stream`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({
@@ -431,27 +436,80 @@ export default function StudioPage() {
         })
       });
 
-      if (!response.ok) throw new Error("Chat failed");
+      if (!response.ok || !response.body) throw new Error("Chat failed");
+
+      // Assistant message is shown as soon as Claude writes it, then replaced by the clean version
+      let assistantText = "";
+      const showAssistant = (content: string) => {
+        setChatMessages(prev => {
+          const history = [...(prev[scriptNumber] || [])];
+          const last = history[history.length - 1];
+          if (last && last !== userMessage && last.role === "assistant") {
+            history[history.length - 1] = { role: "assistant", content };
+          } else {
+            history.push({ role: "assistant", content });
+          }
+          return { ...prev, [scriptNumber]: history };
+        });
+      };
 
-      const data = await response.json();
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffered = "";
+      let streamedScript = "";
 
-      // Add assistant response
-      const assistantMessage: ChatMessage = { role: "assistant", content: data.response };
-      setChatMessages(prev => ({
-        ...prev,
-        [scriptNumber]: [...(prev[scriptNumber] || []), assistantMessage]
-      }));
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
 
-      // Update script if changed
-      if (data.script_changed && data.updated_script) {
-        setScripts(prev => {
-          const updated = [...prev];
-          updated[activeScriptTab] = data.updated_script;
-          return updated;
-        });
+        buffered += decoder.decode(value, { stream: true });
+        const parts = buffered.split("\n");
+        buffered = parts.pop() || "";
+
+        for (const line of parts) {
+          if (!line.trim()) continue;
+          const json = JSON.parse(line);
+
+          if (json.type === "message_delta") {
+            assistantText += json.delta;
+            showAssistant(assistantText);
+          } else if (json.type === "message") {
+            assistantText = json.message;
+            showAssistant(assistantText);
+          } else if (json.type === "script_delta") {
+            // Live script body while Claude rewrites it
+            streamedScript += json.delta;
+            setScripts(prev => {
+              const updated = [...prev];
+              updated[activeScriptTab] = streamedScript;
+              return updated;
+            });
+          } else if (json.type === "done") {
+            showAssistant(json.response);
+            // Final script (or the original if nothing changed)
+            if (streamedScript || json.script_changed) {
+              setScripts(prev => {
+                const updated = [...prev];
+                updated[activeScriptTab] = json.script_changed ? json.updated_script : currentScriptContent;
+                return updated;
+              });
+            }
+          } else if (json.type === "status") {
+            // e.g. a patch did not apply and the full script is being rewritten
+            setChatStatus(json.message);
+          } else if (json.type === "error") {
+            throw new Error(json.message);
+          }
+        }
       }
     } catch (e) {
       console.error("Chat error", e);
+      // Drop any partially streamed script
+      setScripts(prev => {
+        const updated = [...prev];
+        updated[activeScriptTab] = currentScriptContent;
+        return updated;
+      });
       // Add error message
       setChatMessages(prev => ({
         ...prev,
@@ -459,6 +517,7 @@ export default function StudioPage() {
       }));
     } finally {
       setIsChatLoading(false);
+      setChatStatus("");
     }
   };
 
@@ -480,7 +539,9 @@ export default function StudioPage() {
     setShowAngleSelection(false);
     setAngleOptions([]);
     setAngleMessage("");
-    // Use the selected angle as the new topic
+    // Resume the paused run with the selected angle as the new topic
+    resumeThreadRef.current = pausedThreadRef.current;
+    pausedThreadRef.current = null;
     setTopic(selectedAngle);
     // Auto-generate with the new topic after a brief delay
     setTimeout(() => {
@@ -511,7 +572,12 @@ export default function StudioPage() {
     formData.append("mode", mode);
     formData.append("skip_research", useOnlyMyContent.toString());
 
-    // Append all files
+    const resumeThreadId = resumeThreadRef.current;
+    resumeThreadRef.current = null;
+    if (resumeThreadId) {
+      formData.append("thread_id", resumeThreadId);
+    }
+    // Always send the files - ignored when the run resumes, used if the paused run has expired
     files.forEach((file) => {
       formData.append("files", file);
     });
@@ -531,13 +597,17 @@ export default function StudioPage() {
 
       const reader = response.body.getReader();
       const decoder = new TextDecoder();
+      // Events can be split across reads (script_delta events are small and frequent)
+      let buffered = "";
 
       while (true) {
         const { done, value } = await reader.read();
         if (done) break;
 
-        const chunk = decoder.decode(value);
-        const lines = chunk.split("\n").filter(line => line.trim() !== "");
+        buffered += decoder.decode(value, { stream: true });
+        const parts = buffered.split("\n");
+        buffered = parts.pop() || "";
+        const lines = parts.filter(line => line.trim() !== "");
 
         for (const line of lines) {
           try {
@@ -573,6 +643,14 @@ export default function StudioPage() {
               // Multi-angle: received angle definitions
               collectedAngles = json.data || [];
               setAngles(json.data || []);
+            } else if (json.type === "script_delta") {
+              // Multi-angle: live token delta for one of the 3 scripts
+              const index = json.script_number - 1;
+              setScripts(prev => {
+                const next = prev.length >= 3 ? [...prev] : [...prev, ...Array(3 - prev.length).fill("")];
+                next[index] = (next[index] || "") + json.delta;
+                return next;
+              });
             } else if (json.type === "script_complete") {
               // Multi-angle: individual script completed
               setStatus(`Script ${json.script_number}/3 done`);
@@ -602,6 +680,7 @@ export default function StudioPage() {
             } else if (json.type === "needs_input") {
               // Generic topic detected - show angle selection
               if (json.input_type === "angle_selection" || json.input_type === "clarification") {
+                pausedThreadRef.current = json.thread_id || null;
                 setAngleMessage(json.message || "This topic needs a specific angle. Please select one:");
                 setAngleOptions(json.options || []);
                 setShowAngleSelection(true);
@@ -1060,7 +1139,7 @@ export default function StudioPage() {
                     {isChatLoading && (
                       <div style={{ padding: "12px", backgroundColor: "#ffffff", border: "1px solid #f1f5f9", borderRadius: "12px", fontSize: "12px", color: "#6366f1", display: "flex", alignItems: "center", gap: "8px" }}>
                         <Loader2 size={14} style={{ animation: "spin 1s linear infinite" }} />
-                        Editing script...
+                        {chatStatus || "Editing script..."}
                       </div>
                     )}
                     <div ref={chatEndRef} />